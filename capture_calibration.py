@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+キャプチャのキャリブレーションプロファイルの読み書き
+アプリ名とウィンドウサイズごとに、トリミング量・検出したコンテンツ領域・
+学習したページめくり遅延を保存する。次回の起動時に読み込むことで、
+フルスクリーン待機や境界の再検出、手作業のトリミング指定を省略できる
+"""
+
+import argparse
+import datetime
+import json
+import os
+import os.path as osp
+
+CALIBRATION_FILENAME = "calibration.json"
+MAX_LATENCY_SAMPLES = 50  # 保存するめくり遅延のサンプル数（新しいものを残す）
+
+
+def calibration_path(base_folder):
+    """保存先ベースフォルダからプロファイルファイルのパスを返す"""
+    return osp.join(base_folder, CALIBRATION_FILENAME)
+
+
+def calibration_key(name, size):
+    """
+    プロファイルのキーを返す
+    Args:
+        name: キャプチャ元の名前（アプリ名など）
+        size: キャプチャした画面のサイズ（幅, 高さ）ピクセル
+    """
+    return f"{name}@{int(size[0])}x{int(size[1])}"
+
+
+def load_profiles(path):
+    """
+    プロファイルファイルを読み込む
+    Returns:
+        dict: キーごとのプロファイル（ファイルが無い・壊れている場合は空）
+    """
+    if not osp.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            profiles = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"   ⚠️ 警告: キャリブレーションファイルを読み込めません（{e}）。再計測します。")
+        return {}
+    return profiles if isinstance(profiles, dict) else {}
+
+
+def load_calibration(path, key):
+    """
+    キーに対応するプロファイルを返す
+    Returns:
+        dict: crop, content_box, turn_latencies, settle_latencies など。無ければNone
+    """
+    profile = load_profiles(path).get(key)
+    return profile if isinstance(profile, dict) else None
+
+
+def save_calibration(path, key, profile):
+    """
+    プロファイルを保存（他のキーのプロファイルは残す）
+    一時ファイルに書いてから置き換えるため、途中で中断しても壊れない
+    Args:
+        path: プロファイルファイルのパス
+        key: calibration_key で作成したキー
+        profile: 保存する辞書
+    """
+    profiles = load_profiles(path)
+    profile = dict(profile)
+    for name in ("turn_latencies", "settle_latencies"):
+        if name in profile:
+            profile[name] = [round(float(v), 4) for v in profile[name][-MAX_LATENCY_SAMPLES:]]
+    profile["updated_at"] = datetime.datetime.now().isoformat(timespec="seconds")
+    profiles[key] = profile
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(profiles, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def describe_profile(key, profile):
+    """プロファイルの内容を1行で返す"""
+    crop = profile.get("crop", {})
+    box = profile.get("content_box")
+    latencies = profile.get("turn_latencies", [])
+    text = (f"{key}: トリミング 上{crop.get('top', 0)}px 下{crop.get('bottom', 0)}px "
+            f"左{crop.get('left', 0)}px 右{crop.get('right', 0)}px")
+    if box:
+        text += f", コンテンツ領域 上{box[0]} 下{box[1]} 左{box[2]} 右{box[3]}"
+    if latencies:
+        latencies = sorted(latencies)
+        text += f", めくり遅延 中央値{latencies[len(latencies) // 2]:.3f}s（{len(latencies)}件）"
+    if profile.get("updated_at"):
+        text += f", 更新 {profile['updated_at']}"
+    return text
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="キャプチャのキャリブレーションプロファイルを表示・削除します"
+    )
+    parser.add_argument(
+        "base_folder",
+        help="保存先ベースフォルダ（例: capture）",
+    )
+    parser.add_argument(
+        "--remove",
+        type=str,
+        default=None,
+        metavar="KEY",
+        help="指定したキーのプロファイルを削除する（all で全削除）",
+    )
+    args = parser.parse_args()
+
+    path = calibration_path(args.base_folder)
+    profiles = load_profiles(path)
+    if args.remove:
+        keys = list(profiles) if args.remove == "all" else [args.remove]
+        removed = [k for k in keys if profiles.pop(k, None) is not None]
+        if removed:
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(profiles, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+        print(f"🗑️  削除したプロファイル: {len(removed)}件")
+    print(f"📐 キャリブレーションプロファイル: {path}")
+    if not profiles:
+        print("  プロファイルはありません")
+    for key, profile in profiles.items():
+        print(f"  {describe_profile(key, profile)}")
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+キャプチャジャーナル（JSONLマニフェスト）の読み書き
+step1 が保存したページごとに1行（ページ番号、ファイル名、サイズ、内容ハッシュ、
+フィンガープリント、時間）を追記する。再開時は末尾だけを読み、
+後続のステップは画像をデコードせずに欠番や重複を検出できる
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import os.path as osp
+import threading
+import time
+
+import numpy as np
+
+JOURNAL_FILENAME = "capture_journal.jsonl"
+
+
+def journal_path(target_folder):
+    """キャプチャフォルダ（images/ の親）からジャーナルのパスを返す"""
+    return osp.join(target_folder, JOURNAL_FILENAME)
+
+
+def content_hash(data):
+    """ファイル内容（バイト列）のハッシュを返す"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def encode_fingerprint(fp):
+    """
+    フィンガープリントをJSONに保存できる文字列に変換
+    輝度を8bitに丸めるため、閾値判定への影響は0.5以下
+    """
+    fp = np.clip(np.rint(fp), 0, 255).astype(np.uint8)
+    return {
+        "size": [int(fp.shape[1]), int(fp.shape[0])],
+        "data": base64.b64encode(fp.tobytes()).decode("ascii"),
+    }
+
+
+def decode_fingerprint(value):
+    """encode_fingerprint で変換した文字列をフィンガープリントに戻す"""
+    width, height = value["size"]
+    data = np.frombuffer(base64.b64decode(value["data"]), dtype=np.uint8)
+    return data.reshape(height, width).astype(np.float32)
+
+
+class CaptureJournal:
+    """
+    キャプチャジャーナルへの追記を行うクラス（複数スレッドから呼び出し可能）
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: ジャーナルファイルのパス（存在すれば追記）
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def append(self, record):
+        """
+        レコードを1行追記
+        Args:
+            record: 保存する辞書（page, file は必須）
+        """
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def sync(self):
+        """追記した内容をディスクに書き出す"""
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        """ジャーナルを閉じる"""
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+
+
+def _parse_lines(lines):
+    """JSONL行を辞書のリストに変換（途中で途切れた行は無視）"""
+    records = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict) and "page" in record and "file" in record:
+            records.append(record)
+    return records
+
+
+def read_journal(path):
+    """
+    ジャーナルを全件読み込む
+    同じページが複数回記録されている場合（再キャプチャ）は最後のものを採用
+    Returns:
+        list: ページ番号順のレコード
+    """
+    if not osp.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        records = _parse_lines(f)
+    latest = {}
+    for record in records:
+        latest[record["page"]] = record
+    return [latest[page] for page in sorted(latest)]
+
+
+def read_last_record(path, tail_bytes=65536, min_records=32):
+    """
+    ジャーナルの末尾だけを読み、再開に使うページのレコードを返す
+    末尾のレコードのうち最も小さいページ番号から欠番なく続く範囲の最後のページを返す。
+    書き込みスレッドは完了順に追記するため、書き込みに失敗したページの後のページが
+    記録されていても、欠番の手前から再開する
+    Args:
+        path: ジャーナルのパス
+        tail_bytes: 最初に読み込む末尾のバイト数（レコードが min_records 未満なら広げて読み直す）
+        min_records: 末尾から読むレコード数の目安（書き込み待ちのページ数より多くする）
+    Returns:
+        dict: 再開に使うページのレコード、なければNone
+    """
+    if not osp.exists(path):
+        return None
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        while True:
+            f.seek(max(0, size - tail_bytes))
+            data = f.read()
+            lines = data.decode("utf-8", errors="ignore").splitlines()
+            if size > tail_bytes:
+                # 先頭行は途中から読んでいるので捨てる
+                lines = lines[1:]
+            records = _parse_lines(lines)
+            if len(records) >= min_records or size <= tail_bytes:
+                break
+            tail_bytes *= 4
+    if not records:
+        return None
+    latest = {}
+    for record in records:
+        latest[record["page"]] = record
+    page = min(latest)
+    while page + 1 in latest:
+        page += 1
+    return latest[page]
+
+
+def rotate_journal(path):
+    """
+    ジャーナルを退避して空にする（1ページ目から撮り直すとき、古いページの記録で再開しないように）
+    Returns:
+        str: 退避先のパス（ジャーナルが無ければNone）
+    """
+    if not osp.exists(path):
+        return None
+    stem, ext = osp.splitext(path)
+    suffix = time.strftime("%Y%m%d%H%M%S")
+    backup = f"{stem}.{suffix}{ext}"
+    os.replace(path, backup)
+    return backup
+
+
+def check_journal(target_folder, verify_hash=False):
+    """
+    ジャーナルとimagesフォルダを突き合わせて、欠番・重複・欠損を検出
+    画像はデコードしない（verify_hash=True の場合のみファイル内容を読んでハッシュを照合）
+    Args:
+        target_folder: キャプチャフォルダ（images/ の親）
+        verify_hash: ファイル内容のハッシュも照合するか
+    Returns:
+        dict: pages（記録ページ数）, gaps（欠番）, duplicates（同一内容のページ組）,
+              missing（ファイルが無いページ）, corrupted（サイズ・ハッシュ不一致のページ）,
+              unrecorded（ジャーナルに無い画像ファイル）。ジャーナルが無ければNone
+    """
+    path = journal_path(target_folder)
+    if not osp.exists(path):
+        return None
+    records = read_journal(path)
+    images_dir = osp.join(target_folder, "images")
+
+    image_files = []
+    if osp.isdir(images_dir):
+        image_files = sorted(
+            f for f in os.listdir(images_dir)
+            if osp.splitext(f)[1].lower() in (".png", ".jpg", ".jpeg", ".webp")
+        )
+
+    # ジャーナルにもimagesフォルダにも無いページを欠番とする
+    # （ジャーナル導入前に保存された画像は unrecorded として別に報告）
+    pages = [r["page"] for r in records]
+    gaps = []
+    if pages:
+        present = set(pages)
+        for f in image_files:
+            stem = osp.splitext(f)[0]
+            if stem.isdigit():
+                present.add(int(stem))
+        gaps = [p for p in range(1, max(pages) + 1) if p not in present]
+
+    duplicates = []
+    first_by_hash = {}
+    missing = []
+    corrupted = []
+    for record in records:
+        digest = record.get("sha256")
+        if digest:
+            if digest in first_by_hash:
+                duplicates.append((first_by_hash[digest], record["page"]))
+            else:
+                first_by_hash[digest] = record["page"]
+
+        file_path = osp.join(images_dir, record["file"])
+        if not osp.exists(file_path):
+            missing.append(record["page"])
+            continue
+        if "bytes" in record and osp.getsize(file_path) != record["bytes"]:
+            corrupted.append(record["page"])
+            continue
+        if verify_hash and digest:
+            with open(file_path, "rb") as f:
+                if content_hash(f.read()) != digest:
+                    corrupted.append(record["page"])
+
+    recorded_files = {r["file"] for r in records}
+    unrecorded = [f for f in image_files if f not in recorded_files]
+
+    return {
+        "pages": len(records),
+        "gaps": gaps,
+        "duplicates": duplicates,
+        "missing": missing,
+        "corrupted": corrupted,
+        "unrecorded": unrecorded,
+    }
+
+
+def print_check_report(report, log=print):
+    """check_journal の結果を表示"""
+    if report is None:
+        log("  キャプチャジャーナルがありません（整合性チェックをスキップ）")
+        return
+    log(f"  ジャーナル記録: {report['pages']}ページ")
+    if report["gaps"]:
+        log(f"  ⚠️ 欠番: {report['gaps']}")
+    if report["duplicates"]:
+        pairs = ", ".join(f"{a}={b}" for a, b in report["duplicates"])
+        log(f"  ⚠️ 同一内容のページ: {pairs}")
+    if report["missing"]:
+        log(f"  ⚠️ ファイルが無いページ: {report['missing']}")
+    if report["corrupted"]:
+        log(f"  ⚠️ サイズ・ハッシュが一致しないページ: {report['corrupted']}")
+    if report["unrecorded"]:
+        log(f"  ⚠️ ジャーナルに記録されていない画像: {len(report['unrecorded'])}ファイル")
+    if not any(report[k] for k in ("gaps", "duplicates", "missing", "corrupted", "unrecorded")):
+        log("  ✓ 欠番・重複・欠損はありません")
+
+
+TIMING_PHASES = ("wait", "grab", "convert", "compare", "submit", "encode")
+TIMING_LABELS = {
+    "wait": "待機",
+    "grab": "取得",
+    "convert": "変換",
+    "compare": "比較",
+    "submit": "投入",
+    "encode": "エンコード",
+}
+
+
+def print_timing_summary(records, wall_time=None):
+    """
+    ページごとの計測レコードから、フェーズ別のパーセンタイルとページ/分を表示
+    Args:
+        records: timing, polls, retries, elapsed を含むレコードのリスト
+        wall_time: キャプチャ全体の経過時間(秒)。省略時は elapsed の合計を使う
+    """
+    records = [r for r in records if "timing" in r]
+    if not records:
+        return
+    elapsed = np.array([r.get("elapsed", 0.0) for r in records])
+    if wall_time is None:
+        wall_time = float(elapsed.sum())
+
+    def pct(values):
+        values = np.asarray(values, dtype=float)
+        return (f"中央値 {np.percentile(values, 50):.3f}s / 90% {np.percentile(values, 90):.3f}s / "
+                f"99% {np.percentile(values, 99):.3f}s / 合計 {values.sum():.1f}s")
+
+    print("\n📊 ページごとの処理時間")
+    print(f"  ページ数: {len(records)}ページ / 経過時間: {wall_time:.1f}s / "
+          f"{len(records) / max(wall_time, 1e-9) * 60:.1f} ページ/分")
+    print(f"  1ページ合計: {pct(elapsed)}")
+    for phase in TIMING_PHASES:
+        values = [r["timing"].get(phase, 0.0) for r in records]
+        note = "（書き込みスレッド）" if phase == "encode" else ""
+        print(f"  {TIMING_LABELS[phase]}{note}: {pct(values)}")
+    polls = np.array([r.get("polls", 0) for r in records])
+    retries = int(sum(r.get("retries", 0) for r in records))
+    print(f"  取得回数: 平均 {polls.mean():.1f}回 / 最大 {polls.max()}回, やり直し: {retries}回")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="キャプチャジャーナルとimagesフォルダの整合性をチェックします"
+    )
+    parser.add_argument(
+        "target_folder",
+        help="キャプチャフォルダ（例: capture/20260207181042）",
+    )
+    parser.add_argument(
+        "--verify-hash",
+        action="store_true",
+        help="ファイル内容のハッシュも照合する（画像のデコードはしない）",
+    )
+    parser.add_argument(
+        "--timing",
+        action="store_true",
+        help="記録されたページごとの処理時間のサマリーも表示する",
+    )
+    args = parser.parse_args()
+
+    print(f"📒 キャプチャジャーナルのチェック: {args.target_folder}")
+    print_check_report(check_journal(args.target_folder, verify_hash=args.verify_hash))
+    if args.timing:
+        print_timing_summary(read_journal(journal_path(args.target_folder)))
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+図の画像の保存先（内容のハッシュで重複を除く）
+ページから切り出した図を、画素のハッシュをファイル名にして共有フォルダに1回だけ保存する。
+ロゴや飾り罫など何度も出てくる図は1つのファイルを参照する。
+写真のような図は非可逆（JPEG/WebP）、線画や図表のような色数の少ない図は可逆（PNG）で保存し、
+長辺とファイルサイズに上限を設けてHTML・PDFを小さくする
+"""
+
+import hashlib
+import io
+import os
+import threading
+
+import numpy as np
+from PIL import Image
+
+FIGURE_ASSET_DIR = "assets"
+FIGURE_FORMATS = ("auto", "png", "jpeg", "webp")
+DEFAULT_FIGURE_MAX_SIDE = 1600
+DEFAULT_FIGURE_QUALITY = 85
+DEFAULT_FIGURE_MAX_KB = 300
+
+_EXTENSIONS = {"png": ".png", "jpeg": ".jpg", "webp": ".webp"}
+_MIN_QUALITY = 40  # ファイルサイズの上限に収めるときに下げる画質の下限
+
+
+def is_flat_image(img, top_colors=16, coverage=0.9):
+    """
+    色数の少ない（線画・図表のような）画像か判定
+    多い順に top_colors 色で画素の coverage 以上を占めていれば True
+    """
+    sample = img[::2, ::2].reshape(-1, img.shape[2]) if img.ndim == 3 else img[::2, ::2].reshape(-1, 1)
+    if len(sample) == 0:
+        return True
+    packed = np.zeros(len(sample), np.uint32)
+    for c in range(sample.shape[1]):
+        packed = (packed << 8) | sample[:, c]
+    _, counts = np.unique(packed, return_counts=True)
+    counts.sort()
+    return counts[-top_colors:].sum() >= coverage * len(sample)
+
+
+class FigureAssetStore:
+    """
+    図の画像を内容のハッシュで保存するフォルダ（複数スレッドから使用可能）
+    """
+
+    def __init__(self, asset_dir, image_format="auto", max_side=DEFAULT_FIGURE_MAX_SIDE,
+                 quality=DEFAULT_FIGURE_QUALITY, max_kb=DEFAULT_FIGURE_MAX_KB):
+        """
+        Args:
+            asset_dir: 保存先フォルダ（HTMLの出力ディレクトリの assets/）
+            image_format: auto（図の内容で選ぶ）, png, jpeg, webp
+            max_side: 長辺の上限（ピクセル）。超える図は縮小する
+            quality: 非可逆圧縮の画質
+            max_kb: 1ファイルのサイズの上限（KB）。超える場合は画質を下げる（0なら上限なし）
+        """
+        self.asset_dir = str(asset_dir)
+        self.dir_name = os.path.basename(os.path.normpath(self.asset_dir))
+        self.image_format = image_format
+        self.max_side = max_side
+        self.quality = quality
+        self.max_bytes = max_kb * 1024
+        self._settings = f"{image_format}:{max_side}:{quality}:{max_kb}".encode("ascii")
+        os.makedirs(self.asset_dir, exist_ok=True)
+        # 保存済みの図（ハッシュ → ファイル名）
+        self._known = {os.path.splitext(name)[0]: name for name in os.listdir(self.asset_dir)
+                       if not name.endswith(".tmp")}
+        self._lock = threading.Lock()
+        self.saved = 0
+        self.reused = 0
+        self.raw_bytes = 0  # 切り出した図の画素のバイト数（重複を含む）
+        self.saved_bytes = 0  # 新しく書き込んだファイルのバイト数
+
+    def save(self, crop):
+        """
+        図を保存してファイル名を返す（同じ画素の図が保存済みならそのファイル名）
+        Args:
+            crop: ページ画像から切り出した図（NumPy配列）
+        Returns:
+            str: asset_dir 内のファイル名
+        """
+        crop = np.ascontiguousarray(crop)
+        digest = hashlib.sha256(self._settings)
+        digest.update(repr(crop.shape).encode("ascii"))
+        digest.update(crop.data)
+        key = digest.hexdigest()[:32]
+        with self._lock:
+            self.raw_bytes += crop.nbytes
+            name = self._known.get(key)
+            if name is not None:
+                self.reused += 1
+                return name
+
+        data, image_format = self._encode(crop)
+        name = key + _EXTENSIONS[image_format]
+        path = os.path.join(self.asset_dir, name)
+        # OCRのワーカープロセスも同じフォルダに書き込むため、一時ファイル名にプロセスIDを含める
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._known[key] = name
+            self.saved += 1
+            self.saved_bytes += len(data)
+        return name
+
+    def _encode(self, crop):
+        """図を符号化して (バイト列, 形式) を返す"""
+        image = Image.fromarray(crop)
+        if crop.ndim == 3 and (crop[..., 0] == crop[..., 1]).all() and (crop[..., 1] == crop[..., 2]).all():
+            # 白黒の図は1チャンネルにする
+            image = image.convert("L")
+        if max(image.size) > self.max_side:
+            image.thumbnail((self.max_side, self.max_side), Image.LANCZOS)
+
+        image_format = self.image_format
+        if image_format == "auto":
+            image_format = "png" if is_flat_image(crop) else "jpeg"
+        if image_format == "png":
+            data = self._save(image, "png")
+            if not self.max_bytes or len(data) <= self.max_bytes or self.image_format != "auto":
+                return data, "png"
+            # 上限を超える可逆の図は非可逆で保存し直す
+            image_format = "jpeg"
+
+        quality = self.quality
+        data = self._save(image, image_format, quality)
+        while self.max_bytes and len(data) > self.max_bytes and quality > _MIN_QUALITY:
+            quality = max(_MIN_QUALITY, quality - 10)
+            data = self._save(image, image_format, quality)
+        return data, image_format
+
+    @staticmethod
+    def _save(image, image_format, quality=None):
+        buffer = io.BytesIO()
+        if image_format == "png":
+            image.save(buffer, format="PNG", optimize=True)
+        elif image_format == "webp":
+            image.save(buffer, format="WEBP", quality=quality, method=4)
+        else:
+            image.save(buffer, format="JPEG", quality=quality, optimize=True)
+        return buffer.getvalue()
+
+    def print_stats(self, log=print):
+        """保存・再利用した図の件数とサイズを表示"""
+        if not self.saved and not self.reused:
+            return
+        log(f"\n🖼️  図: 保存 {self.saved}件, 重複のため再利用 {self.reused}件, "
+            f"書き込み {self.saved_bytes / 1024 / 1024:.1f} MB"
+            f"（切り出した画素 {self.raw_bytes / 1024 / 1024:.1f} MB）→ {self.asset_dir}")
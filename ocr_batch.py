@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+YomiTokuのDocumentAnalyzerで複数ページをまとめて推論する
+DocumentAnalyzer は1ページずつ検出・レイアウト・認識のモデルを呼び出すため、
+CPUでは呼び出しごとのオーバーヘッドが大きい。ここではページ単位の入力を
+1回の順伝播にまとめ（テキスト検出・レイアウト解析）、行画像はページをまたいで
+認識モデルのバッチサイズまで詰めてから推論する。後処理・集約は DocumentAnalyzer と
+同じ関数をページごとに呼び出すため、出力は1ページずつ処理した場合と同じになる
+"""
+
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+from yomitoku.document_analyzer import _split_text_across_cells
+from yomitoku.ocr import OCRSchema, ocr_aggregate
+from yomitoku.schemas import (
+    DocumentAnalyzerSchema,
+    LayoutAnalyzerSchema,
+    TextDetectorSchema,
+    TextRecognizerSchema,
+)
+
+
+def _slice_preds(preds, index):
+    """バッチの推論結果から1ページ分（バッチ次元を残したまま）を取り出す"""
+    return {key: value[index:index + 1] for key, value in preds.items()}
+
+
+def _text_direction(point):
+    """TextRecognizer.postprocess と同じ基準で行の向きを判定"""
+    point = np.array(point)
+    w = np.linalg.norm(point[0] - point[1])
+    h = np.linalg.norm(point[1] - point[2])
+    return "vertical" if h > w * 2 else "horizontal"
+
+
+class BatchDocumentAnalyzer:
+    """
+    DocumentAnalyzer のモデルを使って複数ページをまとめて解析するクラス
+    """
+
+    def __init__(self, model, batch_size=4):
+        """
+        Args:
+            model: 初期化済みの DocumentAnalyzer
+            batch_size: まとめて推論するページ数
+        """
+        self.model = model
+        self.batch_size = max(1, batch_size)
+        self.batches = 0  # 推論したバッチ数（OCRサーバーの status で表示）
+        self.batched_pages = 0  # バッチで推論したページ数
+
+    def __call__(self, images):
+        """
+        複数ページを解析
+        Args:
+            images: ページ画像（NumPy配列）のリスト。batch_size を超える場合は分割して推論
+        Returns:
+            list: ページごとの DocumentAnalyzerSchema（入力と同じ順）
+        """
+        results = []
+        for i in range(0, len(images), self.batch_size):
+            results.extend(self._analyze(images[i:i + self.batch_size]))
+        return results
+
+    def _analyze(self, images):
+        """1バッチ分のページを解析"""
+        self.batches += 1
+        self.batched_pages += len(images)
+        # DocumentAnalyzer.run と同じく、テキスト検出とレイアウト解析は並列に実行
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            det_future = executor.submit(self._detect, images)
+            layout_future = executor.submit(self._layout, images)
+            det_results = det_future.result()
+            layout_results = layout_future.result()
+
+        if self.model.split_text_across_cells:
+            det_results = [
+                _split_text_across_cells(det, layout)
+                for det, layout in zip(det_results, layout_results)
+            ]
+
+        rec_results = self._recognize(images, det_results)
+
+        results = []
+        for img, det, rec, layout in zip(images, det_results, rec_results, layout_results):
+            ocr = OCRSchema(words=ocr_aggregate(det, rec))
+            # aggregate は読み順の推定に self.img を参照する
+            self.model.img = img
+            results.append(DocumentAnalyzerSchema(**self.model.aggregate(ocr, layout)))
+        return results
+
+    def _detect(self, images):
+        """テキスト検出（前処理後のサイズが同じページをまとめて1回で推論）"""
+        detector = self.model.text_detector
+        tensors = [detector.preprocess(img) for img in images]
+        groups = {}
+        for i, tensor in enumerate(tensors):
+            groups.setdefault(tuple(tensor.shape), []).append(i)
+
+        results = [None] * len(images)
+        for indices in groups.values():
+            batch = torch.cat([tensors[i] for i in indices], 0)
+            if detector.infer_onnx:
+                output = detector.sess.run(["output"], {"input": batch.numpy()})
+                preds = {"binary": torch.tensor(output[0])}
+            else:
+                with torch.inference_mode():
+                    preds = detector.model(batch.to(detector.device))
+            for k, i in enumerate(indices):
+                height, width = images[i].shape[:2]
+                quads, scores = detector.postprocess(_slice_preds(preds, k), (height, width))
+                results[i] = TextDetectorSchema(points=quads, scores=scores)
+        return results
+
+    def _layout(self, images):
+        """レイアウト解析（入力は固定サイズに縮小されるため全ページを1回で推論）"""
+        parser = self.model.layout.layout_parser
+        table_recognizer = self.model.layout.table_structure_recognizer
+        batch = torch.cat([parser.preprocess(img) for img in images], 0)
+        if parser.infer_onnx:
+            output = parser.sess.run(None, {"input": batch.numpy()})
+            preds = {
+                "pred_logits": torch.tensor(output[0]).to(parser.device),
+                "pred_boxes": torch.tensor(output[1]).to(parser.device),
+            }
+        else:
+            with torch.inference_mode():
+                preds = parser.model(batch.to(parser.device))
+
+        results = []
+        for k, img in enumerate(images):
+            layout = parser.postprocess(_slice_preds(preds, k), img.shape[:2])
+            # 表の構造認識は表がある場合のみ（ページごと）
+            table_boxes = [table.box for table in layout.tables]
+            tables, _ = table_recognizer(img, table_boxes)
+            results.append(LayoutAnalyzerSchema(
+                paragraphs=layout.paragraphs,
+                tables=tables,
+                figures=layout.figures,
+            ))
+        return results
+
+    def _recognize(self, images, det_results):
+        """文字認識（全ページの行画像を認識モデルのバッチサイズごとにまとめて推論）"""
+        recognizer = self.model.text_recognizer
+        crops = []
+        counts = []
+        for img, det in zip(images, det_results):
+            mini_batches, _ = recognizer.preprocess(img, det.points)
+            counts.append(sum(len(batch) for batch in mini_batches))
+            crops.extend(mini_batches)
+
+        contents, scores = [], []
+        if crops:
+            crops = torch.cat(crops, 0)
+            batch_size = recognizer._cfg.data.batch_size
+            for start in range(0, len(crops), batch_size):
+                data = crops[start:start + batch_size]
+                if recognizer.infer_onnx:
+                    output = recognizer.sess.run(["output"], {"input": data.numpy()})
+                    p = torch.tensor(output[0])
+                else:
+                    with torch.inference_mode():
+                        p = recognizer.model(data.to(recognizer.device)).softmax(-1)
+                pred, score = recognizer.tokenizer.decode(p)
+                contents.extend(unicodedata.normalize("NFKC", x) for x in pred)
+                scores.extend(score)
+
+        # ページごとに分配
+        results = []
+        offset = 0
+        for det, count in zip(det_results, counts):
+            results.append(TextRecognizerSchema(
+                contents=contents[offset:offset + count],
+                scores=scores[offset:offset + count],
+                points=det.points,
+                directions=[_text_direction(point) for point in det.points],
+            ))
+            offset += count
+        return results
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+OCR結果のキャッシュ（画像の内容で引く）
+デコードした画素とモデル・設定のバージョンからキーを作り、YomiTokuの解析結果
+（DocumentAnalyzerSchema.model_dump()）を gzip したJSONとして保存する。
+同じ画素のページは撮り直し・再実行でもOCRを省略できる。
+ディスク使用量が上限を超えたら、最後に使われた時刻が古いものから削除する（LRU）
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import os.path as osp
+import threading
+from importlib import metadata
+
+DEFAULT_CACHE_DIR = osp.join(osp.expanduser("~"), ".cache", "kindle-capture", "ocr")
+DEFAULT_CACHE_SIZE_MB = 1024
+# 上限を超えたらこの割合まで削除する（上限ちょうどまでだと、以降の保存のたびにフォルダ全体を走査し直す）
+EVICT_LOW_WATER = 0.9
+
+
+def cache_version(settings=None):
+    """
+    キャッシュのバージョン文字列を返す
+    YomiTokuのバージョンやOCRの設定が変わると別のキーになる
+    Args:
+        settings: 結果に影響するOCRの設定（辞書）
+    """
+    try:
+        version = metadata.version("yomitoku")
+    except metadata.PackageNotFoundError:
+        version = "unknown"
+    return f"yomitoku-{version}:" + json.dumps(settings or {}, sort_keys=True)
+
+
+class OCRCache:
+    """
+    OCR結果のディスクキャッシュ（複数スレッド・プロセスから読み書き可能）
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None, version=None):
+        """
+        Args:
+            cache_dir: キャッシュフォルダ（省略時は ~/.cache/kindle-capture/ocr）
+            max_bytes: ディスク使用量の上限（Noneなら削除しない。ワーカープロセス用）
+            version: cache_version で作成したバージョン文字列
+        """
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self.version = version or cache_version()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._size = self._scan_size() if max_bytes is not None else 0
+
+    def key(self, image_array):
+        """画素・画像サイズ・バージョンからキーを作成"""
+        digest = hashlib.sha256()
+        digest.update(self.version.encode("utf-8"))
+        digest.update(repr(image_array.shape).encode("ascii"))
+        digest.update(image_array.data if image_array.flags.c_contiguous else image_array.tobytes())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return osp.join(self.cache_dir, key[:2], f"{key}.json.gz")
+
+    def get(self, key):
+        """
+        キャッシュされた解析結果を返す（使用時刻を更新）
+        Returns:
+            dict: model_dump() した解析結果、無ければNone
+        """
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rb") as f:
+                data = json.loads(f.read().decode("utf-8"))
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        """
+        解析結果を保存（一時ファイルに書いてから置き換える）
+        Args:
+            key: key() で作成したキー
+            data: model_dump() した解析結果
+        """
+        path = self._path(key)
+        os.makedirs(osp.dirname(path), exist_ok=True)
+        payload = gzip.compress(json.dumps(data, ensure_ascii=False).encode("utf-8"), compresslevel=6)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        # 同じキーを書き直す場合は、置き換えられるファイルの分を使用量から引く
+        try:
+            replaced = os.stat(path).st_size
+        except OSError:
+            replaced = 0
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.stores += 1
+            self._size += len(payload) - replaced
+            over = self.max_bytes is not None and self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def _entries(self):
+        """キャッシュファイルの (使用時刻, サイズ, パス) のリスト"""
+        entries = []
+        for sub in os.scandir(self.cache_dir):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith(".json.gz"):
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """
+        使用量が上限を超えていれば、使用時刻の古いものから上限の EVICT_LOW_WATER 倍まで削除
+        （フォルダを走査し直すため、put からは上限を超えたときだけ呼ぶ）
+        """
+        if self.max_bytes is None:
+            return
+        with self._lock:
+            entries = sorted(self._entries())
+            size = sum(s for _, s, _ in entries)
+            target = self.max_bytes * EVICT_LOW_WATER if size > self.max_bytes else self.max_bytes
+            for _, entry_size, path in entries:
+                if size <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                size -= entry_size
+                self.evictions += 1
+            self._size = size
+
+    @property
+    def size(self):
+        """現在のディスク使用量（バイト）"""
+        return self._size
+
+    def print_stats(self, log=print):
+        """ヒット・ミスなどの統計を表示"""
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups * 100 if lookups else 0.0
+        log(f"\n🗃️  OCRキャッシュ: ヒット {self.hits} / ミス {self.misses}（ヒット率 {rate:.0f}%）, "
+            f"保存 {self.stores}, 削除 {self.evictions}")
+        if self.max_bytes is not None:
+            log(f"  使用量: {self._size / 1024 / 1024:.1f} MB / {self.max_bytes / 1024 / 1024:.0f} MB "
+                f"（{self.cache_dir}）")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OCR結果のキャッシュを表示・整理します")
+    parser.add_argument(
+        "--cache-dir",
+        default=DEFAULT_CACHE_DIR,
+        help=f"キャッシュフォルダ（デフォルト: {DEFAULT_CACHE_DIR}）",
+    )
+    parser.add_argument(
+        "--size-mb",
+        type=int,
+        default=DEFAULT_CACHE_SIZE_MB,
+        help=f"この容量（MB）まで古いものから削除する（デフォルト: {DEFAULT_CACHE_SIZE_MB}）",
+    )
+    args = parser.parse_args()
+
+    cache = OCRCache(args.cache_dir, max_bytes=args.size_mb * 1024 * 1024)
+    before = cache.size
+    cache.evict()
+    print(f"🗃️  OCRキャッシュ: {args.cache_dir}")
+    print(f"  件数: {len(cache._entries())}件, 使用量: {cache.size / 1024 / 1024:.1f} MB "
+          f"（削除 {cache.evictions}件, {(before - cache.size) / 1024 / 1024:.1f} MB）")
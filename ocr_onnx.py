@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+OCRのテキスト検出・文字認識をONNX Runtimeで推論する（GPUの無いLinux等のCPU向け）
+YomiTokuのモデルをONNXに書き出し（int8 では重みを動的量子化し）、DocumentAnalyzer の
+テキスト検出・文字認識を ONNX Runtime のセッションに差し替える。
+レイアウト解析・表の構造認識はPyTorchのまま（YomiTokuもCPUではこの2つをONNXにしない）。
+書き出したモデルは ~/.cache/kindle-capture/onnx に保存し、2回目からは読み込むだけになる
+
+使用例:
+    uv run python ocr_onnx.py export                                  # ONNXモデルを書き出す
+    uv run python ocr_onnx.py verify capture/20260207181042 --backend onnx-int8  # PyTorchとの比較と速度
+"""
+
+import argparse
+import difflib
+import os
+import os.path as osp
+import time
+from importlib import metadata
+
+OCR_BACKENDS = ("torch", "onnx", "onnx-int8")
+DEFAULT_ONNX_DIR = osp.join(osp.expanduser("~"), ".cache", "kindle-capture", "onnx")
+
+# 動的量子化する演算（テキスト検出は畳み込み、文字認識はTransformerの行列積が大半を占める）
+_QUANTIZE_OPS = {
+    "text_detector": ["Conv", "MatMul"],
+    "text_recognizer": ["MatMul", "Gemm", "Attention"],
+}
+
+
+def model_dir(onnx_dir=DEFAULT_ONNX_DIR):
+    """YomiTokuのバージョンごとのONNXモデルの保存先"""
+    try:
+        version = metadata.version("yomitoku")
+    except metadata.PackageNotFoundError:
+        version = "unknown"
+    return osp.join(onnx_dir, f"yomitoku-{version}")
+
+
+def _onnx_path(module, onnx_dir, quantize):
+    name = module._cfg.hf_hub_repo.split("/")[-1]
+    return osp.join(model_dir(onnx_dir), f"{name}{'.int8' if quantize else ''}.onnx")
+
+
+def export_module(module, key, onnx_dir=DEFAULT_ONNX_DIR, quantize=False):
+    """
+    テキスト検出・文字認識のモデルをONNXに書き出す（書き出し済みならそのパスを返す）
+    Args:
+        module: model.text_detector または model.text_recognizer（PyTorchのモデルを持つもの）
+        key: "text_detector" または "text_recognizer"
+        onnx_dir: 保存先
+        quantize: Trueなら重みをint8に動的量子化したモデルも作る
+    Returns:
+        str: ONNXモデルのパス
+    """
+    path = _onnx_path(module, onnx_dir, quantize=False)
+    os.makedirs(osp.dirname(path), exist_ok=True)
+    if not osp.exists(path):
+        print(f"  ONNXに書き出しています: {osp.basename(path)}")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        # YomiTokuの書き出し処理（入力の形・動的な軸・opset）をそのまま使う
+        module.model.to("cpu")
+        module.convert_onnx(tmp_path)
+        if hasattr(module.model, "export_onnx"):
+            module.model.export_onnx = False
+        module.model.to(module.device)
+        os.replace(tmp_path, path)
+    if not quantize:
+        return path
+
+    int8_path = _onnx_path(module, onnx_dir, quantize=True)
+    if not osp.exists(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        print(f"  int8に量子化しています: {osp.basename(int8_path)}")
+        tmp_path = f"{int8_path}.{os.getpid()}.tmp"
+        quantize_dynamic(path, tmp_path, weight_type=QuantType.QInt8,
+                         op_types_to_quantize=_QUANTIZE_OPS[key])
+        os.replace(tmp_path, int8_path)
+    return int8_path
+
+
+def use_onnx_backend(model, backend, onnx_dir=DEFAULT_ONNX_DIR, threads=None):
+    """
+    DocumentAnalyzer のテキスト検出・文字認識をONNX Runtimeに差し替える（その場で書き換える）
+    Args:
+        model: CPUで読み込んだ DocumentAnalyzer
+        backend: "onnx" または "onnx-int8"（"torch" なら何もしない）
+        onnx_dir: ONNXモデルの保存先
+        threads: ONNX Runtime のスレッド数（Noneなら ONNX Runtime の既定値）
+    Returns:
+        dict: 部品ごとのONNXモデルのパス
+    """
+    if backend == "torch":
+        return {}
+    if backend not in OCR_BACKENDS:
+        raise ValueError(f"不明なOCRバックエンド: {backend}")
+    import onnxruntime
+
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if threads:
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+
+    paths = {}
+    for key in ("text_detector", "text_recognizer"):
+        module = getattr(model, key)
+        path = export_module(module, key, onnx_dir, quantize=backend == "onnx-int8")
+        module.sess = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        module.infer_onnx = True
+        module.model = None
+        paths[key] = path
+    return paths
+
+
+def _char_agreement(reference, text):
+    if not reference and not text:
+        return 1.0
+    return difflib.SequenceMatcher(None, reference, text, autojunk=False).ratio()
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def verify(input_dir, backend="onnx-int8", pages=8, onnx_dir=DEFAULT_ONNX_DIR, threads=None):
+    """
+    ONNX Runtime の結果をPyTorchと比較し、速度を表示
+    - テキスト検出: 同じ入力に対する確率マップの差と、しきい値で二値化した領域のIoU
+    - 文字認識: PyTorchで検出した同じ行に対する認識結果の一致率
+    - ページ全体: 本文テキストの文字単位の一致率とページ/秒
+    """
+    from pathlib import Path
+
+    import numpy as np
+    import torch
+
+    from yomitoku import DocumentAnalyzer
+
+    from ocr_store import page_text
+    from step2 import ANALYZER_OPTIONS, IMAGE_EXTENSIONS, load_page_image
+
+    images_dir = Path(input_dir) / "images"
+    if not images_dir.exists():
+        images_dir = Path(input_dir)
+    image_files = sorted(
+        f for f in images_dir.iterdir()
+        if f.suffix.lower() in IMAGE_EXTENSIONS and not f.name.startswith(".")
+    )[:pages]
+    if not image_files:
+        print(f"エラー: 画像ファイルが見つかりません: {images_dir}")
+        return
+    images = [load_page_image(f) for f in image_files]
+    if threads:
+        torch.set_num_threads(threads)
+
+    print("=" * 60)
+    print(f"🔬 ONNX Runtime（{backend}）とPyTorchの比較: {len(images)}ページ ({images_dir})")
+    print("=" * 60)
+    reference = DocumentAnalyzer(device="cpu", **ANALYZER_OPTIONS)
+    model = DocumentAnalyzer(device="cpu", **ANALYZER_OPTIONS)
+    paths = use_onnx_backend(model, backend, onnx_dir, threads=threads)
+    for key, path in paths.items():
+        print(f"  {key}: {path}（{osp.getsize(path) / 1024 / 1024:.1f} MB）")
+    print()
+
+    # 初回呼び出しの初期化コストを計測から除く
+    reference(images[0])
+    model(images[0])
+
+    detector = reference.text_detector
+    thresh = detector._cfg.post_process.thresh
+    times = {"torch": {"det": 0.0, "rec": 0.0, "page": 0.0}, backend: {"det": 0.0, "rec": 0.0, "page": 0.0}}
+    map_diffs, ious, line_matches, line_total, scores = [], [], 0, 0, []
+    for image_file, img in zip(image_files, images):
+        # テキスト検出（同じ前処理の入力で確率マップを比べる）
+        tensor = detector.preprocess(img)
+        with torch.inference_mode():
+            expected, elapsed = _timed(lambda: detector.model(tensor)["binary"].numpy())
+        times["torch"]["det"] += elapsed
+        actual, elapsed = _timed(lambda: model.text_detector.sess.run(["output"], {"input": tensor.numpy()})[0])
+        times[backend]["det"] += elapsed
+        map_diffs.append(float(np.abs(expected - actual).max()))
+        mask_a, mask_b = expected > thresh, actual > thresh
+        union = np.count_nonzero(mask_a | mask_b)
+        ious.append(np.count_nonzero(mask_a & mask_b) / union if union else 1.0)
+
+        # 文字認識（PyTorchで検出した行を両方で認識する）
+        points = detector(img)[0].points
+        if points:
+            (expected_lines, _), elapsed = _timed(reference.text_recognizer, img, points)
+            times["torch"]["rec"] += elapsed
+            (actual_lines, _), elapsed = _timed(model.text_recognizer, img, points)
+            times[backend]["rec"] += elapsed
+            line_total += len(points)
+            line_matches += sum(a == b for a, b in zip(expected_lines.contents, actual_lines.contents))
+
+        # ページ全体
+        (expected_page, *_), elapsed = _timed(reference, img)
+        times["torch"]["page"] += elapsed
+        (actual_page, *_), elapsed = _timed(model, img)
+        times[backend]["page"] += elapsed
+        score = _char_agreement(page_text(expected_page.model_dump()), page_text(actual_page.model_dump()))
+        scores.append(score)
+        print(f"  {image_file.name}: 確率マップの最大差 {map_diffs[-1]:.4f}, IoU {ious[-1]:.4f}, "
+              f"文字の一致率 {score * 100:.2f}%")
+
+    worst = min(range(len(scores)), key=scores.__getitem__)
+    print("\n📊 精度（PyTorchとの比較）")
+    print(f"  テキスト検出: 確率マップの最大差 {max(map_diffs):.4f}, 領域のIoU 平均 {sum(ious) / len(ious):.4f}")
+    if line_total:
+        print(f"  文字認識: 行の完全一致 {line_matches}/{line_total}行（{line_matches / line_total * 100:.2f}%）")
+    print(f"  ページ全体: 文字の一致率 平均 {sum(scores) / len(scores) * 100:.2f}% / "
+          f"最低 {scores[worst] * 100:.2f}%（{image_files[worst].name}）")
+
+    print("\n⏱️  速度（ページ/秒, 括弧内は合計秒）")
+    for name, stage in times.items():
+        print(f"  {name:>9}: ページ全体 {len(images) / stage['page']:5.2f}（{stage['page']:.2f}秒）, "
+              f"テキスト検出 {len(images) / stage['det']:5.2f}（{stage['det']:.2f}秒）, "
+              f"文字認識 {stage['rec']:.2f}秒")
+    speedup = times["torch"]["page"] / times[backend]["page"]
+    print(f"  → {backend} はPyTorchの {speedup:.2f} 倍")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OCRのテキスト検出・文字認識をONNX Runtimeで推論します")
+    parser.add_argument(
+        "--onnx-dir",
+        default=DEFAULT_ONNX_DIR,
+        help=f"ONNXモデルの保存先（デフォルト: {DEFAULT_ONNX_DIR}）",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="ONNXモデル（とint8に量子化したモデル）を書き出す")
+    export_parser.add_argument("--no-int8", action="store_true", help="int8に量子化したモデルを作らない")
+
+    verify_parser = subparsers.add_parser("verify", help="PyTorchとの結果の比較と速度の計測")
+    verify_parser.add_argument("input_dir", help="入力ディレクトリ（例: capture/20260207181042）")
+    verify_parser.add_argument("--backend", choices=OCR_BACKENDS[1:], default="onnx-int8",
+                               help="比較するバックエンド（デフォルト: onnx-int8）")
+    verify_parser.add_argument("--pages", type=int, default=8, help="比較に使うページ数（デフォルト: 8）")
+    verify_parser.add_argument("--threads", type=int, default=None,
+                               help="PyTorch・ONNX Runtime のスレッド数（省略時は既定値）")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        from yomitoku import DocumentAnalyzer
+
+        from step2 import ANALYZER_OPTIONS
+
+        model = DocumentAnalyzer(device="cpu", **ANALYZER_OPTIONS)
+        for key in ("text_detector", "text_recognizer"):
+            path = export_module(getattr(model, key), key, args.onnx_dir, quantize=not args.no_int8)
+            print(f"✓ {key}: {path}")
+    else:
+        verify(args.input_dir, args.backend, max(1, args.pages), args.onnx_dir, args.threads)
@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+OCRサーバー（YomiTokuを読み込んだまま常駐するプロセス）
+step2 を実行するたびに torch・yomitoku を読み込み DocumentAnalyzer を作り直すと、
+最初のページまでに数十秒かかる。サーバーを起動しておくとモデルの読み込みは1回で済み、
+step2 は起動中のサーバーを自動で使う（ページ画像を送ってOCR結果を受け取る）。
+複数の本・複数の step2 からのジョブはキューに入れて順に処理する
+
+使用例:
+    uv run python ocr_server.py start                       # サーバーを起動（Ctrl+Cで停止）
+    uv run python ocr_server.py status                      # 状態を表示
+    uv run python ocr_server.py submit capture/20260207181042  # 本のフォルダをまとめて変換
+    uv run python ocr_server.py stop                        # サーバーを停止
+
+通信はUnixソケット上のメッセージ（4バイトの長さ + JSONのヘッダー + 画像などのバイナリ）で行う
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import os.path as osp
+import queue
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+
+from ocr_onnx import OCR_BACKENDS
+
+DEFAULT_SOCKET_PATH = osp.join(osp.expanduser("~"), ".cache", "kindle-capture", "ocr.sock")
+
+_HEADER = struct.Struct(">I")
+
+
+def _recv_exact(sock, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:], size - received)
+        if n == 0:
+            raise ConnectionError("接続が切断されました")
+        received += n
+    return buffer
+
+
+def send_message(sock, header, blobs=()):
+    """
+    メッセージを送信
+    Args:
+        sock: ソケット
+        header: JSONにできる辞書（blobs の長さは自動で "blobs" に入る）
+        blobs: 続けて送るバイナリ（画像の画素など）のリスト
+    """
+    blobs = [memoryview(blob).cast("B") for blob in blobs]
+    header = dict(header, blobs=[len(blob) for blob in blobs])
+    data = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(data)) + data)
+    for blob in blobs:
+        sock.sendall(blob)
+
+
+def recv_message(sock):
+    """
+    メッセージを受信
+    Returns:
+        (header, blobs): ヘッダーの辞書とバイナリのリスト
+    """
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    header = json.loads(_recv_exact(sock, size).decode("utf-8"))
+    blobs = [_recv_exact(sock, n) for n in header.pop("blobs", [])]
+    return header, blobs
+
+
+class OCRClient:
+    """
+    OCRサーバーのクライアント
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, timeout=None):
+        """
+        Args:
+            socket_path: サーバーのソケットのパス
+            timeout: 応答を待つ時間（秒）。Noneなら待ち続ける
+        """
+        self.socket_path = socket_path
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        self._sock.connect(socket_path)
+
+    @classmethod
+    def connect(cls, socket_path=DEFAULT_SOCKET_PATH):
+        """
+        サーバーが起動していれば接続したクライアントを返す（起動していなければNone）
+        """
+        if not socket_path or not osp.exists(socket_path):
+            return None
+        try:
+            client = cls(socket_path, timeout=2.0)
+            client.status()
+        except OSError:
+            return None
+        client._sock.settimeout(None)
+        return client
+
+    def _request(self, header, blobs=()):
+        send_message(self._sock, header, blobs)
+        response, response_blobs = recv_message(self._sock)
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response, response_blobs
+
+    def status(self):
+        """
+        サーバーの状態
+        Returns:
+            dict: version（cache_version）, device, queue（待ちジョブ数）, current（処理中のジョブ）など
+        """
+        return self._request({"op": "status"})[0]
+
+    def analyze(self, images):
+        """
+        ページ画像をOCR（他のジョブの後にキューで順番を待つ）
+        Args:
+            images: ページ画像（NumPy配列, uint8）のリスト
+        Returns:
+            list: ページごとの model_dump() の辞書（失敗したページは {"error": メッセージ}）
+        """
+        images = [np.ascontiguousarray(img, dtype=np.uint8) for img in images]
+        header = {"op": "analyze", "shapes": [list(img.shape) for img in images]}
+        response, _ = self._request(header, images)
+        return response["results"]
+
+    def submit(self, book_dir, options=None, log=None):
+        """
+        本のフォルダをサーバーで step2 と同じようにHTMLへ変換（終わるまで待つ）
+        Args:
+            book_dir: 本のフォルダ（サーバーから見えるパス）
+            options: process_kindle_captures_to_html に渡す引数
+            log: サーバーの出力を受け取る関数（省略時は標準出力に表示）
+        Returns:
+            dict: 結果（ok, elapsed）
+        """
+        log = log or (lambda text: print(text, end="", flush=True))
+        send_message(self._sock, {"op": "book", "book_dir": osp.abspath(book_dir), "options": options or {}})
+        while True:
+            response, _ = recv_message(self._sock)
+            if "log" in response:
+                log(response["log"])
+                continue
+            if "error" in response:
+                raise RuntimeError(response["error"])
+            return response
+
+    def shutdown(self):
+        """サーバーを停止（処理中のジョブが終わってから止まる）"""
+        return self._request({"op": "shutdown"})[0]
+
+    def close(self):
+        with contextlib.suppress(OSError):
+            self._sock.close()
+
+
+class RemoteAnalyzer:
+    """
+    OCRサーバーで解析する（step2 の batcher と同じ呼び出し方）
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def __call__(self, images):
+        """
+        Returns:
+            list: ページごとの model_dump() の辞書（失敗したページは例外オブジェクト）。
+            yomitoku を読み込まないよう DocumentAnalyzerSchema には戻さない
+        """
+        return [RuntimeError(data["error"]) if "error" in data else data for data in self.client.analyze(images)]
+
+
+class _Job:
+    """キューに入れるジョブ"""
+
+    def __init__(self, kind, payload, log=None):
+        self.kind = kind
+        self.payload = payload
+        self.log = log
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+        self.submitted = time.time()
+
+
+class OCRServer(socketserver.ThreadingUnixStreamServer):
+    """
+    モデルを1つだけ読み込み、ジョブを1つのスレッドで順に処理するサーバー
+    接続ごとのスレッドはジョブをキューに入れて終わるのを待つ
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, batch_size=1, ocr_backend="torch"):
+        # step2 は ocr_server を読み込むため、サーバーを起動するときに読み込む
+        import step2
+        from ocr_cache import cache_version
+
+        self.step2 = step2
+        self.jobs = queue.Queue()
+        self.current = None
+        self.completed = 0
+        self.started = time.time()
+
+        log("YomiTokuを初期化しています...")
+        self.ocr_backend = ocr_backend
+        if ocr_backend == "torch":
+            self.device = step2.select_device()
+        else:
+            self.device = "cpu"
+            log(f"  デバイス: CPU（ONNX Runtime, {ocr_backend}）")
+        self.model = step2.load_analyzer(self.device, ocr_backend)
+        self.batcher = None
+        if batch_size > 1:
+            from ocr_batch import BatchDocumentAnalyzer
+            self.batcher = BatchDocumentAnalyzer(self.model, batch_size=batch_size)
+        self.version = cache_version(step2.analyzer_settings(ocr_backend))
+        log("✓ YomiToku準備完了")
+
+        os.makedirs(osp.dirname(socket_path) or ".", exist_ok=True)
+        super().__init__(socket_path, _Handler)
+        os.chmod(socket_path, 0o600)
+        self.worker = threading.Thread(target=self._run_jobs, name="ocr-server-jobs", daemon=True)
+        self.worker.start()
+
+    def submit(self, job):
+        """ジョブをキューに入れて終わるまで待つ"""
+        self.jobs.put(job)
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def _run_jobs(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            self.current = job
+            try:
+                if job.kind == "analyze":
+                    job.result = self._analyze(job.payload)
+                else:
+                    job.result = self._convert_book(job)
+            except Exception as e:
+                job.error = e
+            finally:
+                self.current = None
+                self.completed += 1
+                job.done.set()
+
+    def _analyze(self, images):
+        results = self.step2.analyze_pages(self.model, self.batcher, images)
+        return [{"error": str(r)} if isinstance(r, Exception) else r.model_dump() for r in results]
+
+    def _convert_book(self, job):
+        book_dir = job.payload["book_dir"]
+        log(f"📚 本の変換: {book_dir}")
+        start = time.perf_counter()
+        # ジョブの出力（パイプラインのスレッドの出力を含む）は log で依頼したクライアントへ送る
+        # （標準出力はプロセス全体で共有されるため書き換えない）
+        # --batch-size を本の変換にも使う（batch_size が1のままだと1ページずつしかOCRしない）
+        self.step2.process_kindle_captures_to_html(
+            book_dir, model=self.model, batcher=self.batcher, ocr_server=None, ocr_backend=self.ocr_backend,
+            batch_size=self.batcher.batch_size if self.batcher else 1, log=job.log, **job.payload["options"],
+        )
+        elapsed = time.perf_counter() - start
+        log(f"✓ 本の変換完了: {book_dir}（{elapsed:.1f}秒）")
+        return {"ok": True, "elapsed": elapsed}
+
+    def status(self):
+        current = None
+        if self.current is not None:
+            current = {"kind": self.current.kind, "since": round(time.time() - self.current.submitted, 1)}
+            if self.current.kind == "book":
+                current["book_dir"] = self.current.payload["book_dir"]
+        return {
+            "version": self.version,
+            "device": self.device,
+            "backend": self.ocr_backend,
+            "batch_size": self.batcher.batch_size if self.batcher else 1,
+            "batches": self.batcher.batches if self.batcher else 0,
+            "batched_pages": self.batcher.batched_pages if self.batcher else 0,
+            "pid": os.getpid(),
+            "uptime": round(time.time() - self.started, 1),
+            "queue": self.jobs.qsize(),
+            "current": current,
+            "completed": self.completed,
+        }
+
+    def stop(self):
+        self.jobs.put(None)
+        threading.Thread(target=self.shutdown, daemon=True).start()
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    """1つの接続からのリクエストを順に処理"""
+
+    def handle(self):
+        server = self.server
+        sock = self.request
+        while True:
+            try:
+                header, blobs = recv_message(sock)
+            except (ConnectionError, OSError):
+                return
+            op = header.get("op")
+            try:
+                if op == "status":
+                    send_message(sock, server.status())
+                elif op == "analyze":
+                    images = [
+                        np.frombuffer(blob, np.uint8).reshape(shape)
+                        for blob, shape in zip(blobs, header["shapes"])
+                    ]
+                    results = server.submit(_Job("analyze", images))
+                    send_message(sock, {"op": "analyze", "results": results})
+                elif op == "book":
+                    lock = threading.Lock()
+                    disconnected = threading.Event()
+
+                    def send_log(text):
+                        # クライアントが切断しても変換は最後まで続ける（以降の出力は捨てる）
+                        if disconnected.is_set():
+                            return
+                        with lock:
+                            try:
+                                send_message(sock, {"log": text + "\n"})
+                            except OSError:
+                                disconnected.set()
+                                log(f"⚠️ クライアントが切断しました。変換は続けます: {header['book_dir']}")
+
+                    result = server.submit(_Job("book", header, log=send_log))
+                    send_message(sock, result)
+                elif op == "shutdown":
+                    send_message(sock, {"ok": True})
+                    log("🛑 停止の要求を受け付けました")
+                    server.stop()
+                    return
+                else:
+                    send_message(sock, {"error": f"不明なリクエスト: {op}"})
+            except OSError:
+                return
+            except Exception as e:
+                with contextlib.suppress(OSError):
+                    send_message(sock, {"op": op, "error": str(e)})
+
+
+def log(text):
+    """サーバー自身のメッセージ（本の変換ジョブの出力とは別にサーバーの端末へ表示）"""
+    print(text, flush=True)
+
+
+def serve(socket_path=DEFAULT_SOCKET_PATH, batch_size=1, ocr_backend="torch"):
+    """サーバーを起動（Ctrl+C か stop で停止）"""
+    if osp.exists(socket_path):
+        client = OCRClient.connect(socket_path)
+        if client is not None:
+            client.close()
+            print(f"エラー: OCRサーバーは既に起動しています: {socket_path}")
+            return
+        # 前回異常終了したときのソケットファイル
+        os.remove(socket_path)
+
+    server = OCRServer(socket_path, batch_size=batch_size, ocr_backend=ocr_backend)
+    print("=" * 60)
+    print(f"🛰️  OCRサーバーを起動しました: {socket_path}（PID {os.getpid()}）")
+    print("   step2.py は自動でこのサーバーを使います。Ctrl+C で停止します。")
+    print("=" * 60)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        with contextlib.suppress(OSError):
+            os.remove(socket_path)
+        print("\n🛑 OCRサーバーを停止しました")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="YomiTokuを読み込んだまま常駐するOCRサーバー")
+    parser.add_argument(
+        "--socket",
+        default=DEFAULT_SOCKET_PATH,
+        help=f"ソケットのパス（デフォルト: {DEFAULT_SOCKET_PATH}）",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    start_parser = subparsers.add_parser("start", help="サーバーを起動")
+    start_parser.add_argument("--batch-size", type=int, default=1, help="まとめてOCRするページ数（デフォルト: 1）")
+    start_parser.add_argument("--ocr-backend", choices=OCR_BACKENDS, default="torch",
+                              help="推論のバックエンド（step2.py と同じ。デフォルト: torch）")
+    subparsers.add_parser("status", help="サーバーの状態を表示")
+    subparsers.add_parser("stop", help="サーバーを停止")
+    submit_parser = subparsers.add_parser("submit", help="本のフォルダをサーバーでHTMLに変換")
+    submit_parser.add_argument("book_dir", help="本のフォルダ（例: capture/20260207181042）")
+    submit_parser.add_argument("--output-dir", default=None, help="出力ディレクトリ（省略時は book_dir/html）")
+    submit_parser.add_argument("--ocr-max-side", default=None, help="step2.py の --ocr-max-side と同じ")
+    submit_parser.add_argument("--page-classifier", action="store_true", help="step2.py と同じ")
+    args = parser.parse_args()
+
+    if args.command == "start":
+        serve(args.socket, batch_size=max(1, args.batch_size), ocr_backend=args.ocr_backend)
+        sys.exit(0)
+
+    client = OCRClient.connect(args.socket)
+    if client is None:
+        print(f"OCRサーバーは起動していません: {args.socket}")
+        sys.exit(1)
+    try:
+        if args.command == "status":
+            info = client.status()
+            print(f"🛰️  OCRサーバー: {args.socket}（PID {info['pid']}, デバイス {info['device']}, {info['backend']}, "
+                  f"起動から {info['uptime']:.0f}秒）")
+            print(f"  バージョン: {info['version']}")
+            print(f"  処理済みジョブ: {info['completed']}件, 待ち: {info['queue']}件")
+            if info["batches"]:
+                print(f"  バッチ推論: {info['batches']}回, 平均 {info['batched_pages'] / info['batches']:.1f}ページ"
+                      f"（バッチサイズ {info['batch_size']}）")
+            if info["current"]:
+                current = info["current"]
+                target = current.get("book_dir", "ページ")
+                print(f"  処理中: {target}（{current['since']:.0f}秒前から）")
+        elif args.command == "stop":
+            client.shutdown()
+            print("🛑 OCRサーバーに停止を要求しました")
+        else:
+            from ocr_scaling import parse_max_side
+
+            options = {
+                "output_dir": osp.abspath(args.output_dir) if args.output_dir else None,
+                "ocr_max_side": parse_max_side(args.ocr_max_side),
+                "classify": args.page_classifier,
+            }
+            result = client.submit(args.book_dir, options)
+            print(f"✅ サーバーでの変換完了: {result['elapsed']:.1f}秒")
+    finally:
+        client.close()
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+本ごとのOCR結果の保存先（構造化データ）
+step2 の解析結果（DocumentAnalyzerSchema.model_dump()）を、ページ索引付きの
+1つのSQLiteファイル（本のフォルダの ocr_results.db）にページごとに圧縮して保存する。
+render コマンドでモデルを読み込まずにHTML（step3の入力）やテキストを再生成できる。
+ページごとに元画像・モデルのバージョン・出力HTMLのハッシュも記録し、
+step2 の再実行時には変わったページだけを処理する
+
+使用例:
+    uv run python ocr_store.py info capture/20260207181042
+    uv run python ocr_store.py render capture/20260207181042
+    uv run python ocr_store.py render capture/20260207181042 --format text
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import os.path as osp
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+
+from page_classifier import format_counts, format_kind_pages
+
+OCR_STORE_FILENAME = "ocr_results.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    stem TEXT PRIMARY KEY,  -- 画像ファイル名（拡張子なし）。ページ順の索引を兼ねる
+    image TEXT NOT NULL,    -- 画像ファイル名
+    width INTEGER,
+    height INTEGER,
+    version TEXT,           -- 解析したYomiTokuのバージョン・設定（cache_version）
+    result BLOB NOT NULL,   -- model_dump() したJSONをzlibで圧縮したもの
+    updated_at TEXT
+)
+"""
+
+# ページの状態（後から追加した列。古いファイルには ALTER TABLE で追加する）
+_STATE_COLUMNS = {
+    "source_hash": "TEXT",      # 元画像ファイルのSHA-256
+    "source_size": "INTEGER",   # 元画像ファイルのサイズ（変わっていなければハッシュを再計算しない）
+    "source_mtime": "INTEGER",  # 元画像ファイルの更新時刻（ナノ秒）
+    "output_hash": "TEXT",      # 出力したHTMLファイルのSHA-256
+    "page_kind": "TEXT",        # OCR前の分類（ocr / figure / skip。page_classifier.py）
+}
+
+# stale_pages が返す再処理の理由
+STALE_REASONS = {
+    "new": "新規",
+    "source": "画像が変更",
+    "version": "モデル・設定が変更",
+    "output": "HTMLが無い・変更",
+}
+
+
+def store_path(book_dir):
+    """本のフォルダから保存先ファイルのパスを返す"""
+    return osp.join(book_dir, OCR_STORE_FILENAME)
+
+
+def file_hash(path):
+    """ファイルの内容のSHA-256を返す（無ければNone）"""
+    try:
+        with open(path, "rb") as f:
+            return hashlib.file_digest(f, "sha256").hexdigest()
+    except OSError:
+        return None
+
+
+class OCRStore:
+    """
+    本1冊分のOCR結果を保存するSQLiteファイル（複数スレッドから書き込み可能）
+    """
+
+    def __init__(self, path, version=None):
+        """
+        Args:
+            path: 保存先ファイルのパス（store_path で作成）
+            version: 保存する結果のバージョン文字列（cache_version）
+        """
+        self.path = str(path)
+        self.version = version
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        # 書き込みごとにコミットしても遅くならないようにWALを使う
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(pages)")}
+        for name, column_type in _STATE_COLUMNS.items():
+            if name not in columns:
+                self._conn.execute(f"ALTER TABLE pages ADD COLUMN {name} {column_type}")
+        self._conn.commit()
+        self._sources = {}  # stale_pages で調べた元画像の (ハッシュ, サイズ, 更新時刻)
+
+    def _source_state(self, image_file, record=None):
+        """
+        元画像の (ハッシュ, サイズ, 更新時刻) を返す
+        サイズと更新時刻が記録と同じなら、ファイルを読まずに記録のハッシュを使う
+        """
+        st = os.stat(image_file)
+        if record is not None and record[1] == st.st_size and record[2] == st.st_mtime_ns and record[0]:
+            return record[0], st.st_size, st.st_mtime_ns
+        return file_hash(image_file), st.st_size, st.st_mtime_ns
+
+    def stale_pages(self, image_files, output_path):
+        """
+        再処理が必要なページを調べる
+        記録が無い・元画像が変わった・バージョンが変わった・HTMLが無いか記録と違う
+        （書き込み途中で中断した場合を含む）ページを返す
+        Args:
+            image_files: 元画像のパスのリスト
+            output_path: HTMLの出力ディレクトリ
+        Returns:
+            dict: 再処理が必要なページの {画像ファイル: 理由（STALE_REASONS のキー）}
+        """
+        with self._lock:
+            records = {
+                row[0]: row[1:]
+                for row in self._conn.execute(
+                    "SELECT stem, source_hash, source_size, source_mtime, version, output_hash FROM pages"
+                )
+            }
+        stale = {}
+        for image_file in image_files:
+            image_file = Path(image_file)
+            record = records.get(image_file.stem)
+            source = self._source_state(image_file, record[:3] if record else None)
+            self._sources[image_file.stem] = source
+            if record is None:
+                stale[image_file] = "new"
+            elif record[0] != source[0]:
+                stale[image_file] = "source"
+            elif record[3] != self.version:
+                stale[image_file] = "version"
+            elif record[4] is None or file_hash(Path(output_path) / f"{image_file.stem}.html") != record[4]:
+                stale[image_file] = "output"
+        return stale
+
+    def put(self, image_file, shape, data, output_file=None, page_kind="ocr"):
+        """
+        1ページ分の解析結果と状態を保存（同じページは置き換える）
+        HTMLを書き終えてから呼ぶこと。1つのトランザクションで書き込むため、
+        中断しても記録が中途半端に残ることはない
+        Args:
+            image_file: 元の画像ファイルのパス
+            shape: 画像の形状（高さ, 幅, ...）
+            data: model_dump() した解析結果
+            output_file: 書き込んだHTMLファイル（ハッシュを記録する）
+            page_kind: OCR前の分類（ocr / figure / skip）
+        """
+        image_file = Path(image_file)
+        payload = zlib.compress(
+            json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6
+        )
+        source = self._sources.get(image_file.stem) or self._source_state(image_file)
+        output_hash = file_hash(output_file) if output_file is not None else None
+        now = datetime.datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (stem, image, width, height, version, result, updated_at, "
+                "source_hash, source_size, source_mtime, output_hash, page_kind) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (image_file.stem, image_file.name, int(shape[1]), int(shape[0]),
+                 self.version, payload, now, *source, output_hash, page_kind),
+            )
+            self._conn.commit()
+
+    def set_output(self, stem, output_file):
+        """HTMLを書き直したときに出力のハッシュだけを更新"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE pages SET output_hash = ? WHERE stem = ?", (file_hash(output_file), stem)
+            )
+            self._conn.commit()
+
+    def kind_counts(self):
+        """
+        OCR前の分類ごとのページ数
+        Returns:
+            dict: {分類: ページ数}（分類の記録が無いページは ocr として数える）
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT COALESCE(page_kind, 'ocr'), COUNT(*) FROM pages GROUP BY 1"
+            ).fetchall()
+        return dict(rows)
+
+    def kind_pages(self):
+        """
+        OCRしなかったページ（分類が ocr 以外）の一覧
+        Returns:
+            dict: {分類: stem のリスト（ファイル名順）}
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT page_kind, stem FROM pages WHERE COALESCE(page_kind, 'ocr') != 'ocr' ORDER BY stem"
+            ).fetchall()
+        pages = {}
+        for kind, stem in rows:
+            pages.setdefault(kind, []).append(stem)
+        return pages
+
+    def remove_missing(self, image_files):
+        """
+        元画像が無くなったページの記録を削除
+        Returns:
+            list: 削除したページの stem
+        """
+        stems = {Path(f).stem for f in image_files}
+        with self._lock:
+            missing = [
+                (stem,) for (stem,) in self._conn.execute("SELECT stem FROM pages") if stem not in stems
+            ]
+            self._conn.executemany("DELETE FROM pages WHERE stem = ?", missing)
+            self._conn.commit()
+        return [stem for (stem,) in missing]
+
+    def get(self, stem):
+        """
+        1ページ分の解析結果を返す
+        Returns:
+            dict: model_dump() した解析結果、無ければNone
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT result FROM pages WHERE stem = ?", (stem,)).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    def pages(self):
+        """
+        ページ索引（ファイル名順）
+        Returns:
+            list: (stem, 画像ファイル名, 幅, 高さ, バージョン, 更新日時) のリスト
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT stem, image, width, height, version, updated_at FROM pages ORDER BY stem"
+            ).fetchall()
+
+    def __iter__(self):
+        """ファイル名順に (stem, 画像ファイル名, 解析結果) を返す"""
+        for stem, image, *_ in self.pages():
+            yield stem, image, self.get(stem)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def page_elements(data):
+    """
+    解析結果の段落・表・図中の文字を読み順に並べる
+    Returns:
+        list: (読み順, 役割, テキスト) のリスト
+    """
+    elements = []
+    for paragraph in data.get("paragraphs", []):
+        elements.append((paragraph.get("order"), paragraph.get("role"), paragraph.get("contents") or ""))
+    for table in data.get("tables", []):
+        rows = {}
+        for cell in table.get("cells", []):
+            rows.setdefault(cell["row"], []).append(cell.get("contents") or "")
+        text = "\n".join("\t".join(cells) for _, cells in sorted(rows.items()))
+        elements.append((table.get("order"), "table", text))
+    for figure in data.get("figures", []):
+        for paragraph in sorted(figure.get("paragraphs", []), key=lambda p: p.get("order") or 0):
+            elements.append((figure.get("order"), "figure", paragraph.get("contents") or ""))
+    # 読み順が無い要素は最後に回す（sortedは安定なので同じ順位は元の順のまま）
+    return sorted(elements, key=lambda e: (e[0] is None, e[0] or 0))
+
+
+def page_text(data):
+    """1ページ分の解析結果をプレーンテキストにする"""
+    return "\n\n".join(text for _, _, text in page_elements(data) if text.strip())
+
+
+def render_text(store, output_file):
+    """全ページのテキストを1つのファイルに書き出す（ページの区切りに画像ファイル名を入れる）"""
+    count = 0
+    with open(output_file, "w", encoding="utf-8") as f:
+        for stem, _, data in store:
+            f.write(f"===== {stem} =====\n")
+            f.write(page_text(data))
+            f.write("\n\n")
+            count += 1
+    return count
+
+
+def render_html(store, book_dir, output_path):
+    """
+    全ページのHTML（step3 の入力）を再生成
+    図の切り出しにだけ元の画像を読み込む（モデルは読み込まない）
+    """
+    from figure_assets import FIGURE_ASSET_DIR, FigureAssetStore
+    from page_html import load_page_image, write_index_html, write_page_html
+
+    book_dir = Path(book_dir)
+    images_dir = book_dir / "images"
+    if not images_dir.exists():
+        images_dir = book_dir
+    output_path.mkdir(parents=True, exist_ok=True)
+    assets = FigureAssetStore(output_path / FIGURE_ASSET_DIR)
+
+    count = 0
+    for stem, image, data in store:
+        image_file = images_dir / image
+        image_array = None
+        if data["figures"]:
+            if image_file.exists():
+                image_array = load_page_image(image_file)
+            else:
+                print(f"  ⚠️ 画像が無いため図を省略します: {image}")
+        try:
+            output_file = write_page_html(data, image_array, image_file, output_path, assets)
+            store.set_output(stem, output_file)
+            count += 1
+        except Exception as e:
+            print(f"  ✗ エラー（{image}）: {e}")
+    write_index_html(output_path)
+    assets.print_stats()
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="本ごとに保存したOCR結果を表示・再出力します"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    info_parser = subparsers.add_parser("info", help="保存されているページの一覧を表示")
+    info_parser.add_argument("book_dir", help="本のフォルダ（例: capture/20260207181042）")
+
+    render_parser = subparsers.add_parser("render", help="OCRせずにHTML・テキストを再生成")
+    render_parser.add_argument("book_dir", help="本のフォルダ（例: capture/20260207181042）")
+    render_parser.add_argument(
+        "--format",
+        choices=["html", "text"],
+        default="html",
+        help="出力形式（html: step3の入力になるページごとのHTML, text: 1つのテキストファイル）（デフォルト: html）",
+    )
+    render_parser.add_argument(
+        "--output",
+        default=None,
+        help="出力先（省略時は html なら book_dir/html, text なら book_dir/book.txt）",
+    )
+    args = parser.parse_args()
+
+    path = store_path(args.book_dir)
+    if not osp.exists(path):
+        print(f"エラー: OCR結果が見つかりません: {path}（step2 を実行してください）")
+        raise SystemExit(1)
+    store = OCRStore(path)
+    try:
+        if args.command == "info":
+            pages = store.pages()
+            print(f"🗂️  OCR結果: {path}（{osp.getsize(path) / 1024 / 1024:.1f} MB）")
+            print(f"  ページ数: {len(pages)}ページ")
+            print(f"  分類: {format_counts(store.kind_counts())}")
+            for line in format_kind_pages(store.kind_pages()):
+                print(f"    {line}")
+            for version in sorted({row[4] or "" for row in pages}):
+                print(f"  バージョン: {version}")
+            if pages:
+                print(f"  最初: {pages[0][1]}, 最後: {pages[-1][1]}, 最終更新: {max(row[5] or '' for row in pages)}")
+        else:
+            start = time.perf_counter()
+            if args.format == "text":
+                output = args.output or osp.join(args.book_dir, "book.txt")
+                count = render_text(store, output)
+            else:
+                output = args.output or osp.join(args.book_dir, "html")
+                count = render_html(store, args.book_dir, Path(output))
+            print(f"✅ 再生成完了: {count}ページ, {time.perf_counter() - start:.1f}秒")
+            print(f"📁 出力先: {output}")
+    finally:
+        store.close()
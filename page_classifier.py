@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+OCRの前にページを分類する（NumPy/OpenCVのみで数ミリ秒）
+インクの密度と連結成分の統計から、ページを次の3つに振り分ける
+- skip: 空白ページ（文字らしい成分が1つも無い。OCRしない）
+- figure: 文字の無い挿絵・表紙などの画像だけのページ（ページ全体を図として出力し、OCRしない）
+- ocr: それ以外（通常どおりOCR。1文字だけの章扉や、キャプション・本文のある図のページもここに入る）
+文字を取りこぼさないよう、迷う場合は ocr に倒す（step2 では --page-classifier を指定したときだけ使う）
+"""
+
+import cv2
+import numpy as np
+
+PAGE_KINDS = ("ocr", "figure", "skip")
+PAGE_KIND_LABELS = {"ocr": "OCR", "figure": "図のみ", "skip": "空白"}
+
+INK_TOLERANCE = 24  # 背景色とみなす最大の差（G チャンネル）
+MIN_COMPONENT_AREA = 3  # 文字らしい成分とみなす最小の画素数（半分の解像度。これ未満はゴミ・汚れ）
+FIGURE_MIN_AREA = 0.2  # 大きな成分の外接矩形がページに占める割合がこれ以上なら図の候補
+FIGURE_MIN_INK = 0.6  # 大きな成分のインクが全インクに占める割合がこれ以上なら図の候補
+FIGURE_MAX_TEXT_COMPONENTS = 40  # 文字らしい成分がこれ以上あれば文字のあるページとしてOCR
+# 図の候補でも、大きな成分の範囲の外（キャプション・本文）に文字らしい成分がこれ以上あればOCR
+FIGURE_MAX_OUTSIDE_TEXT = 1
+
+
+def _background_level(gray):
+    """ページの外周の画素の中央値を背景の明るさとする"""
+    border = np.concatenate([gray[:4].ravel(), gray[-4:].ravel(), gray[:, :4].ravel(), gray[:, -4:].ravel()])
+    return int(np.median(border))
+
+
+def classify_page(image_array):
+    """
+    ページを分類
+    Args:
+        image_array: ページ画像（RGB）
+    Returns:
+        (kind, stats): kind は "ocr" / "figure" / "skip"、stats は判定に使った値の辞書
+        （figure の場合は stats["box"] に元の解像度での図の範囲 [x1, y1, x2, y2]）
+    """
+    # 半分の解像度のGチャンネルで調べる
+    gray = image_array[::2, ::2, 1] if image_array.ndim == 3 else image_array[::2, ::2]
+    height, width = gray.shape
+    diff = cv2.absdiff(gray, np.full_like(gray, _background_level(gray)))
+    ink = (diff > INK_TOLERANCE).astype(np.uint8)
+    stats = {"ink_density": round(float(ink.mean()), 5)}
+    if not ink.any():
+        return "skip", stats
+
+    count, _, cc, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    cc = cc[1:]
+    sizes = np.maximum(cc[:, cv2.CC_STAT_WIDTH], cc[:, cv2.CC_STAT_HEIGHT])
+    areas = cc[:, cv2.CC_STAT_AREA]
+    limit = min(height, width) / 8
+    large = sizes >= limit
+    text_like = (areas >= MIN_COMPONENT_AREA) & ~large
+    text_components = int(np.count_nonzero(text_like))
+    large_ink = float(areas[large].sum() / max(areas.sum(), 1))
+    stats.update(components=int(count - 1), text_components=text_components, large_ink=round(large_ink, 3))
+
+    if not large.any():
+        # 1文字だけの章扉も取りこぼさないよう、文字らしい成分が1つでもあればOCR
+        return ("ocr" if text_components else "skip"), stats
+
+    x1 = int(cc[large, cv2.CC_STAT_LEFT].min())
+    y1 = int(cc[large, cv2.CC_STAT_TOP].min())
+    x2 = int((cc[large, cv2.CC_STAT_LEFT] + cc[large, cv2.CC_STAT_WIDTH]).max())
+    y2 = int((cc[large, cv2.CC_STAT_TOP] + cc[large, cv2.CC_STAT_HEIGHT]).max())
+    large_area = (x2 - x1) * (y2 - y1) / (height * width)
+    left, top = cc[:, cv2.CC_STAT_LEFT], cc[:, cv2.CC_STAT_TOP]
+    outside = ((left + cc[:, cv2.CC_STAT_WIDTH] <= x1) | (left >= x2)
+               | (top + cc[:, cv2.CC_STAT_HEIGHT] <= y1) | (top >= y2))
+    outside_text = int(np.count_nonzero(text_like & outside))
+    stats.update(large_area=round(large_area, 3), outside_text=outside_text)
+    if (large_area >= FIGURE_MIN_AREA and large_ink >= FIGURE_MIN_INK
+            and text_components < FIGURE_MAX_TEXT_COMPONENTS
+            and outside_text < FIGURE_MAX_OUTSIDE_TEXT):
+        full_height, full_width = image_array.shape[:2]
+        stats["box"] = [x1 * 2, y1 * 2, min(x2 * 2, full_width), min(y2 * 2, full_height)]
+        return "figure", stats
+    return "ocr", stats
+
+
+def classified_result(kind, stats):
+    """
+    OCRしないページの解析結果（DocumentAnalyzerSchema.model_dump() と同じ形）を作成
+    skip は空、figure はページの図の範囲を1つの図とする
+    """
+    figures = []
+    if kind == "figure":
+        figures.append({"box": stats["box"], "order": 0, "paragraphs": [], "direction": None})
+    return {"paragraphs": [], "tables": [], "words": [], "figures": figures}
+
+
+def format_counts(counts):
+    """分類ごとのページ数を1行で返す"""
+    return " / ".join(f"{PAGE_KIND_LABELS[kind]} {counts.get(kind, 0)}" for kind in PAGE_KINDS)
+
+
+def format_kind_pages(pages):
+    """OCRしなかったページを分類ごとに1行ずつ返す（pages は OCRStore.kind_pages() の値）"""
+    return [f"{PAGE_KIND_LABELS[kind]}（OCR省略）: {', '.join(pages[kind])}"
+            for kind in PAGE_KINDS if pages.get(kind)]
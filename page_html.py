@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+解析結果（DocumentAnalyzerSchema.model_dump() の辞書）からページごとのHTMLを作成
+yomitoku（torch）を読み込まないため、ocr_store.py render はモデル無しで数秒でHTMLを再生成できる。
+段落・表のHTMLは yomitoku の export_html（convert_html）と同じ出力にしている
+"""
+
+import os
+import re
+import shutil
+from html import escape
+from pathlib import Path
+
+import numpy as np
+from lxml import etree, html as lxml_html
+from PIL import Image
+
+from figure_assets import FIGURE_ASSET_DIR, FigureAssetStore
+
+
+def load_page_image(image_file):
+    """画像を読み込んでnumpy配列に変換（グレースケール保存のページもRGBにそろえる）"""
+    with Image.open(image_file) as image:
+        return np.array(image.convert("RGB"))
+
+
+# ページHTMLの前後（タイトル以外は全ページ共通）
+_PAGE_HEAD = """<!DOCTYPE html>
+<html lang="ja">
+<head>
+  <meta charset="UTF-8">
+  <meta name="viewport" content="width=device-width, initial-scale=1.0">
+  <title>Kindle - {title}</title>
+  <script src="https://cdn.tailwindcss.com"></script>
+  <style>
+    body {{ font-family: "Hiragino Sans", "Yu Gothic", "Meiryo", sans-serif; }}
+  </style>
+</head>
+<body class="bg-gradient-to-br from-slate-50 to-slate-100 min-h-screen py-8">
+  <div class="max-w-4xl mx-auto px-4">
+    <div class="bg-white rounded-xl shadow-lg p-8 mb-4">
+      <div class="prose prose-slate max-w-none">
+"""
+_PAGE_TAIL = """      </div>
+    </div>
+  </div>
+</body>
+</html>
+"""
+
+# YomiTokuのHTMLのタグに付けるTailwindクラス（lxmlが複数要素をまとめた<div>は外す）
+_STYLED_TAGS = {
+    "<div>": "",
+    "</div>": "",
+    "<h1>": '<h1 class="text-2xl font-bold text-slate-800 mt-8 mb-4 pb-2 border-b-2 border-blue-500">',
+    "<p>": '<p class="text-slate-700 leading-relaxed mb-3">',
+    "<table": '<div class="overflow-x-auto my-6"><table class="min-w-full border border-slate-300 rounded-lg overflow-hidden"',
+    "</table>": "</table></div>",
+    "<td": '<td class="border border-slate-300 px-4 py-3 text-sm"',
+    "<th": '<th class="border border-slate-300 px-4 py-3 text-sm font-semibold bg-slate-100"',
+    "<img ": '<img class="rounded-lg shadow-md my-4 mx-auto" ',
+}
+_STYLED_TAGS_PATTERN = re.compile("(" + "|".join(re.escape(tag) for tag in _STYLED_TAGS) + ")")
+
+
+def style_page_body(body_content):
+    """YomiTokuのHTML本文にTailwindクラスを付ける（1回の走査で置き換え）"""
+    # split の奇数番目が一致したタグになる（re.sub のコールバックより速い）
+    parts = _STYLED_TAGS_PATTERN.split(body_content)
+    parts[1::2] = [_STYLED_TAGS[tag] for tag in parts[1::2]]
+    return "".join(parts)
+
+
+_URL_PATTERN = re.compile(r"https?://[^\s<>]")
+
+
+def _text_to_html(text):
+    """テキストをHTMLエスケープし、改行を<br>にする（yomitoku の convert_text_to_html と同じ）"""
+    text = _URL_PATTERN.sub(lambda m: escape(m.group(0)), escape(text))
+    return text.replace("\n", "<br>")
+
+
+def table_to_html(table):
+    """表の辞書からHTMLの要素を作成（yomitoku の table_to_html と同じ出力）"""
+    rows = []
+    row = []
+    pre_row = 1
+    for cell in table["cells"]:
+        if cell["row"] != pre_row:
+            rows.append(f"<tr>{''.join(row)}</tr>")
+            row = []
+        contents = _text_to_html(cell["contents"] or "")
+        row.append(f'<td rowspan="{cell["row_span"]}" colspan="{cell["col_span"]}">{contents}</td>')
+        pre_row = cell["row"]
+    rows.append(f"<tr>{''.join(row)}</tr>")
+    return {
+        "order": table["order"],
+        "html": f'<table border="1" style="border-collapse: collapse">{"".join(rows)}</table>',
+    }
+
+
+def paragraph_to_html(paragraph):
+    """段落の辞書からHTMLの要素を作成（yomitoku の paragraph_to_html と同じ出力）"""
+    contents = _text_to_html(paragraph["contents"])
+    if paragraph.get("role") == "section_headings":
+        contents = f"<h1>{contents}</h1>"
+    return {"order": paragraph["order"], "html": f"<p>{contents}</p>"}
+
+
+def page_body_html(data, image_array, assets):
+    """
+    解析結果からHTMLの本文を作成（yomitoku の convert_html と同じ出力で、図だけ assets に保存）
+    Args:
+        data: model_dump() した解析結果
+        image_array: ページ画像（Noneなら図を出力しない）
+        assets: 図を保存する FigureAssetStore
+    """
+    elements = [table_to_html(table) for table in data["tables"]]
+    elements.extend(paragraph_to_html(paragraph) for paragraph in data["paragraphs"])
+    if image_array is not None:
+        for figure in data["figures"]:
+            x1, y1, x2, y2 = map(int, figure["box"])
+            crop = image_array[max(y1, 0):y2, max(x1, 0):x2]
+            if crop.size == 0:
+                continue
+            name = assets.save(crop)
+            elements.append({
+                "order": figure["order"],
+                "html": f'<img src="{assets.dir_name}/{name}" width="200"><br>',
+            })
+    elements.sort(key=lambda x: x["order"])
+
+    html_string = "".join(element["html"] for element in elements)
+    if not html_string:
+        return ""
+    return etree.tostring(lxml_html.fromstring(html_string), pretty_print=True, encoding="unicode")
+
+
+def write_page_html(data, image_array, image_file, output_path, assets=None):
+    """
+    解析結果を1ページ分のHTMLファイルとして保存
+    HTMLはメモリ上で組み立て、一時ファイルに1回で書き込んでから置き換える
+    （中断しても書きかけのHTMLが残らない）
+    Args:
+        data: model_dump() した解析結果
+        image_array: ページ画像（図の切り出しに使用。Noneなら図を出力しない）
+        image_file: 元の画像ファイルのパス
+        output_path: 出力ディレクトリ
+        assets: 図を保存する FigureAssetStore（省略時は output_path/assets に既定の設定で保存）
+    Returns:
+        Path: 保存したHTMLファイル
+    """
+    if assets is None and image_array is not None and data["figures"]:
+        assets = FigureAssetStore(output_path / FIGURE_ASSET_DIR)
+    return write_page_file(page_body_html(data, image_array, assets), image_file, output_path)
+
+
+def write_page_file(body_content, image_file, output_path):
+    """
+    作成済みのHTMLの本文（page_body_html の戻り値）を1ページ分のHTMLファイルとして保存
+    Returns:
+        Path: 保存したHTMLファイル
+    """
+    output_file = output_path / f"{image_file.stem}.html"
+    page = _PAGE_HEAD.format(title=image_file.stem) + style_page_body(body_content) + _PAGE_TAIL
+
+    temp_file = output_path / f"{output_file.name}.tmp"
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        f.write(page)
+    os.replace(temp_file, output_file)
+    return output_file
+
+
+def write_index_html(output_path, log=print):
+    """HTMLの出力ディレクトリにプレビュー用の index.html と server.py を配置"""
+    html_files = sorted([f.name for f in output_path.glob("*.html") if "temp" not in f.name and f.name != "index.html"])
+
+    if html_files:
+        index_file = output_path / "index.html"
+        template_src = Path(__file__).parent / "templates" / "index_template.html"
+        template_dst = output_path / "index.template.html"
+        server_src = Path(__file__).parent / "templates" / "server_template.py"
+        server_dst = output_path / "server.py"
+        log(f"\n📑 index.htmlを生成しています...")
+
+        if not template_src.exists():
+            log(f"  ✗ テンプレートが見つかりません: {template_src}")
+        else:
+            shutil.copyfile(template_src, template_dst)
+            template = template_dst.read_text(encoding="utf-8")
+            rendered = template.replace("__TOTAL_PAGES__", str(len(html_files)))
+            index_file.write_text(rendered, encoding="utf-8")
+            log(f"  ✓ index.html生成完了: {index_file}")
+            log(f"  ✓ テンプレート配置: {template_dst}")
+
+        if not server_src.exists():
+            log(f"  ✗ サーバーテンプレートが見つかりません: {server_src}")
+        else:
+            shutil.copyfile(server_src, server_dst)
+            log(f"  ✓ server.py配置: {server_dst}")
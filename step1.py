@@ -1,19 +1,47 @@
 # 必要なライブラリのインポート
-import pyautogui as pag
 import os, os.path as osp
 import datetime, time
-from PIL import ImageGrab
+import random
+from collections import deque
+from PIL import Image, ImageGrab
 import cv2
 import numpy as np
-from Quartz import (
-    CGWindowListCopyWindowInfo,
-    kCGWindowListOptionAll,
-    kCGNullWindowID,
-)
-from AppKit import NSWorkspace, NSRunningApplication, NSScreen
 import subprocess
 import sys
 import argparse
+import queue
+import threading
+from contextlib import contextmanager
+from capture_journal import (
+    CaptureJournal,
+    content_hash,
+    decode_fingerprint,
+    encode_fingerprint,
+    journal_path,
+    print_timing_summary,
+    read_last_record,
+    rotate_journal,
+)
+from capture_calibration import (
+    calibration_key,
+    calibration_path,
+    load_calibration,
+    save_calibration,
+)
+
+# macOS専用ライブラリ（Linux等ではリプレイキャプチャのみ使用可能）
+try:
+    import pyautogui as pag
+    from Quartz import (
+        CGWindowListCopyWindowInfo,
+        CGWindowListCreateDescriptionFromArray,
+        kCGWindowListOptionAll,
+        kCGNullWindowID,
+    )
+    from AppKit import NSWorkspace, NSRunningApplication, NSScreen
+    MACOS_CAPTURE_AVAILABLE = True
+except Exception:
+    MACOS_CAPTURE_AVAILABLE = False
 
 # グローバル変数の設定
 kindle_window_title = "Kindle"  # キャプチャ対象のアプリケーション名（コマンドライン引数で上書き）
@@ -21,6 +49,9 @@ page_change_key = "right"  # 次のページへ移動するキー（コマンド
 kindle_fullscreen_wait = 5  # フルスクリーン後の待機時間(秒)
 l_margin = 1  # 左側マージン
 r_margin = 1  # 右側マージン
+boundary_tolerance = 16  # コンテンツ境界検出で背景色とみなす最大の色差
+boundary_min_fraction = 0.02  # コンテンツとみなす列・行に含まれる非背景画素の最小割合
+auto_crop = False  # Trueならコンテンツ境界の上下も自動でトリミング
 waitsec = 1.0  # キー押下後の待機時間(秒)
 
 # ページ数設定（コマンドライン引数で上書き）
@@ -32,10 +63,61 @@ crop_bottom = 0  # 下部トリミング（ピクセル）
 crop_left = 0  # 左部トリミング（ピクセル）
 crop_right = 0  # 右部トリミング（ピクセル）
 
+# キャプチャ元（get_capture_source で作成）
+capture_source = None
+
+# リプレイキャプチャ設定（コマンドライン引数で上書き）
+replay_dir = None  # 指定するとKindleの代わりにこのフォルダの画像を再生する
+replay_latency = 0.3  # 再生時のページめくり遅延(秒)
+replay_jitter = 0.0  # ページめくり遅延のゆらぎ(秒)
+replay_duplicate_every = 0  # N枚ごとに同じ画像を2回表示する（0なら無効）
+
 # 出力設定（コマンドライン引数で上書き）
 output_dir = None  # 保存先ベースフォルダ
 output_title = None  # 保存先フォルダ名
 
+# ページ変化検出設定（コマンドライン引数で上書き）
+change_roi = (0.0, 0.05, 1.0, 0.95)  # 比較領域（左, 上, 右, 下）の割合。時計や進捗バーを除外する
+change_threshold = 1.5  # フィンガープリントの平均輝度差がこれを超えたらページが変わったと判定（補助）
+change_cell_threshold = 8.0  # フィンガープリントの1セルの輝度差がこれを超えたら変化したセルとみなす
+change_min_cells = 2  # 変化したセルがこの数以上あればページが変わったと判定
+fingerprint_size = (64, 64)  # フィンガープリントの縮小サイズ（幅, 高さ）
+fingerprint_history = 8  # 保持するフィンガープリントの数
+
+# ポーリング設定（コマンドライン引数で上書き）
+adaptive_wait = True  # Trueならめくり遅延を学習して適応ポーリング、Falseなら固定の waitsec 待機
+poll_interval = 0.05  # 適応ポーリングの取得間隔(秒)
+settle_frames = 2  # 連続して同じフレームがこの回数続いたら描画完了とみなす
+page_timeout = 10.0  # ページが変化しない場合のタイムアウト(秒)
+
+# 重複・空白ページ・本の終わりの検出設定（コマンドライン引数で上書き）
+end_detection = True  # 重複・空白ページ・本の終わりを検出する
+blank_std_threshold = 2.0  # フィンガープリントの標準偏差がこれ未満なら空白（読み込み中）画面
+end_wait_min = 1.5  # 本の終わりと判定するまでの最短待機(秒)
+end_confirm_presses = 2  # 画面が変化しないとき、本の終わりと判定する前にページ送りキーを押し直す回数
+
+# 画像書き込み設定（コマンドライン引数で上書き）
+writer_threads = 2  # PNGエンコード・書き込みを行うスレッド数
+writer_queue_size = 8  # 書き込み待ちフレームの最大数（超えるとキャプチャ側が待つ）
+
+# 保存形式設定（コマンドライン引数で上書き）
+image_format = "png"  # 保存形式（png: PNG, webp: ロスレスWebP）
+png_compression = 3  # PNGの圧縮レベル（0-9、大きいほど小さく遅い）
+grayscale_mode = "auto"  # グレースケール保存（auto: 色が無いページのみ, always: 常に, never: しない）
+grayscale_tolerance = 8  # 色が無いとみなすチャンネル間の最大差
+grayscale_max_color_pixels = 16  # 色のある画素がこの数以下なら色が無いとみなす（アンチエイリアスのにじみだけを許容）
+
+# 見開き設定（コマンドライン引数で上書き）
+spread_mode = "off"  # off: 分割しない, auto: 綴じ目が見つかった画面のみ2ページに分割, on: 常に分割
+spread_search = 0.15  # 綴じ目を探す範囲（中央から左右に幅の割合）
+spread_min_gap = 0.005  # 綴じ目とみなす空白列の最小幅（幅の割合）
+
+# キャリブレーション設定（コマンドライン引数で上書き）
+use_calibration = True  # アプリ名・画面サイズごとのプロファイルを読み込み・保存する
+recalibrate = False  # Trueなら保存済みのプロファイルを使わずに計測し直す
+calibration_file = None  # プロファイルファイル（省略時は保存先ベースフォルダの calibration.json）
+calibrated_startup_wait = 0.5  # プロファイルがある場合の開始前の待機時間(秒)
+
 
 def find_kindle_window():
     """
@@ -71,13 +153,13 @@ def setup_kindle_window(app):
     time.sleep(1)
 
 
-def get_kindle_window_bounds(app):
+def get_kindle_window_info(app):
     """
-    Kindleウィンドウの位置とサイズを取得
+    Kindleウィンドウのウィンドウ番号と位置・サイズを取得
     Args:
         app: Kindleアプリケーションオブジェクト
     Returns:
-        (x, y, width, height): ウィンドウの位置とサイズ、取得失敗時はNone
+        (window_id, (x, y, width, height)): ウィンドウ番号と位置・サイズ、取得失敗時はNone
     """
     pid = app.processIdentifier()
     windows = CGWindowListCopyWindowInfo(kCGWindowListOptionAll, kCGNullWindowID)
@@ -95,11 +177,197 @@ def get_kindle_window_bounds(app):
                 # 面積が大きいウィンドウを保持（ただし最小サイズは指定）
                 if area > largest_area and bounds["Width"] > 100 and bounds["Height"] > 100:
                     largest_area = area
-                    largest_window = (bounds["X"], bounds["Y"], bounds["Width"], bounds["Height"])
+                    largest_window = (
+                        window.get("kCGWindowNumber"),
+                        (bounds["X"], bounds["Y"], bounds["Width"], bounds["Height"]),
+                    )
     
     return largest_window
 
 
+def get_kindle_window_bounds(app):
+    """
+    Kindleウィンドウの位置とサイズを取得
+    Args:
+        app: Kindleアプリケーションオブジェクト
+    Returns:
+        (x, y, width, height): ウィンドウの位置とサイズ、取得失敗時はNone
+    """
+    info = get_kindle_window_info(app)
+    return info[1] if info else None
+
+
+class CaptureSource:
+    """
+    キャプチャ元のインターフェース
+    capture_and_save_pages は grab() と press() だけを使うため、
+    これを実装すればKindle以外（画像の再生など）からもキャプチャできる
+    """
+
+    def prepare(self):
+        """
+        キャプチャ開始前の準備（対象ウィンドウを前面に出す等）
+        Returns:
+            bool: 準備できればTrue
+        """
+        return True
+
+    @property
+    def startup_wait(self):
+        """準備後、最初のキャプチャまでの待機時間(秒)"""
+        return 0
+
+    @property
+    def name(self):
+        """キャリブレーションプロファイルのキーに使う名前"""
+        return type(self).__name__
+
+    def grab(self):
+        """
+        現在の画面をキャプチャ
+        Returns:
+            PILImage: キャプチャした画像（RGB）、失敗時はNone
+        """
+        raise NotImplementedError
+
+    def press(self, key):
+        """ページ送りキーを押す"""
+        raise NotImplementedError
+
+
+class CaptureSession(CaptureSource):
+    """
+    キャプチャ対象のアプリ・ウィンドウ・スクリーン情報をキャッシュするクラス
+    アプリの検索、全ウィンドウの列挙、アクティブ化、スクリーンの走査は最初の1回だけ行い、
+    以降は対象ウィンドウ1つの位置だけを問い合わせる。取得失敗時や位置・サイズが
+    変わった場合のみ再解決する
+    """
+
+    def __init__(self):
+        self.app = None  # 対象アプリケーション
+        self.window_id = None  # 対象ウィンドウ番号
+        self.bounds = None  # (x, y, width, height)
+        self.screen_offset_y = 0  # ウィンドウが表示されているスクリーンの原点Y
+        self.resolve_count = 0  # 再解決した回数
+
+    def prepare(self):
+        """Kindleアプリを探してウィンドウを前面に表示"""
+        app = find_kindle_window()
+        if app is None:
+            print(
+                "エラー: Kindleアプリケーションが見つかりません。Kindle for Macが起動していることを確認してください。",
+                file=sys.stderr,
+            )
+            return False
+        setup_kindle_window(app)
+        return True
+
+    @property
+    def startup_wait(self):
+        return kindle_fullscreen_wait
+
+    @property
+    def name(self):
+        return kindle_window_title
+
+    def press(self, key):
+        """pyautoguiでキーを押す"""
+        pag.press(key)
+
+    def invalidate(self):
+        """キャッシュを破棄（次回の取得時に再解決する）"""
+        self.app = None
+        self.window_id = None
+        self.bounds = None
+
+    def resolve(self):
+        """
+        アプリ・ウィンドウ・スクリーンを検索してキャッシュする
+        Returns:
+            bool: 解決できればTrue
+        """
+        self.invalidate()
+        app = find_kindle_window()
+        if not app:
+            return False
+        
+        # Kindleウィンドウを前面に
+        app.activateWithOptions_(1 << 1)
+        time.sleep(0.2)
+        
+        # ウィンドウの位置とサイズを取得
+        info = get_kindle_window_info(app)
+        if not info:
+            return False
+        
+        self.app = app
+        self.window_id, self.bounds = info
+        self.screen_offset_y = self._find_screen_offset_y(self.bounds)
+        self.resolve_count += 1
+        return True
+
+    @staticmethod
+    def _find_screen_offset_y(bounds):
+        """
+        ウィンドウが表示されているスクリーンの原点Yを返す（マルチモニター対応）
+        """
+        x, y, width, height = bounds
+        for screen in NSScreen.screens():
+            screen_frame = screen.frame()
+            # このスクリーンがウィンドウを含んでいるか確認
+            if (screen_frame.origin.x <= x < screen_frame.origin.x + screen_frame.size.width or
+                screen_frame.origin.x <= x + width <= screen_frame.origin.x + screen_frame.size.width):
+                return screen_frame.origin.y
+        return 0
+
+    def current_bounds(self):
+        """
+        キャッシュしたウィンドウ1つだけの現在位置を問い合わせる
+        Returns:
+            (x, y, width, height): 位置とサイズ、ウィンドウが無くなっていればNone
+        """
+        if self.window_id is None:
+            return None
+        windows = CGWindowListCreateDescriptionFromArray([self.window_id])
+        for window in windows or []:
+            bounds = window.get("kCGWindowBounds")
+            if bounds:
+                return (bounds["X"], bounds["Y"], bounds["Width"], bounds["Height"])
+        return None
+
+    def region(self):
+        """キャプチャ領域（left, top, right, bottom）を返す"""
+        x, y, width, height = self.bounds
+        # PIL/ImageGrabは仮想スクリーン座標系を使用するため、直接使用
+        return (int(x), int(y), int(x + width), int(y + height))
+
+    def grab(self):
+        """
+        ウィンドウ領域をキャプチャ
+        Returns:
+            PILImage: キャプチャした画像、失敗時はNone
+        """
+        if self.bounds is None and not self.resolve():
+            return None
+        
+        # ウィンドウが移動・リサイズ・消失した場合のみ再解決
+        if self.current_bounds() != self.bounds and not self.resolve():
+            return None
+        
+        try:
+            return ImageGrab.grab(bbox=self.region())
+        except Exception as e:
+            print(f"警告: ImageGrab失敗（{e}）、ウィンドウ情報を再取得して再試行中...")
+        
+        if self.resolve():
+            try:
+                return ImageGrab.grab(bbox=self.region())
+            except Exception as e:
+                print(f"警告: ImageGrab再試行失敗（{e}）、代替方法を試行中...")
+        # 失敗時は全画面キャプチャにフォールバック
+        return ImageGrab.grab()
+
+
 def crop_image(img):
     """
     画像をトリミング
@@ -129,63 +397,147 @@ def crop_image(img):
     return img[top:bottom, left:right]
 
 
+class ReplayCaptureSource(CaptureSource):
+    """
+    フォルダ内の画像をページとして再生するキャプチャ元
+    ページめくり遅延や重複フレームを模擬できるため、macOS以外でも
+    capture_and_save_pages のループ全体（変化検出・トリミング・再開・保存）を
+    ベンチマーク・検証できる
+    """
+
+    def __init__(self, frames_dir, latency=None, jitter=None, duplicate_every=None, seed=0):
+        """
+        Args:
+            frames_dir: 再生する画像のフォルダ（ファイル名順に再生）
+            latency: キー押下から次の画像が表示されるまでの時間(秒)。省略時は replay_latency
+            jitter: 遅延のゆらぎ(秒)。省略時は replay_jitter
+            duplicate_every: N枚ごとに同じ画像を2回表示する。省略時は replay_duplicate_every
+            seed: 遅延のゆらぎに使う乱数シード
+        """
+        self.frames = sorted(
+            osp.join(frames_dir, f) for f in os.listdir(frames_dir)
+            if osp.splitext(f)[1].lower() in (".png", ".jpg", ".jpeg", ".webp")
+        )
+        if not self.frames:
+            raise FileNotFoundError(f"再生する画像が見つかりません: {frames_dir}")
+        self.frames_dir = frames_dir
+        self.latency = latency if latency is not None else replay_latency
+        self.jitter = jitter if jitter is not None else replay_jitter
+        duplicate_every = duplicate_every if duplicate_every is not None else replay_duplicate_every
+
+        # 表示順（重複フレームを含む）を作成
+        self.sequence = []
+        for i in range(len(self.frames)):
+            self.sequence.append(i)
+            if duplicate_every and (i + 1) % duplicate_every == 0:
+                self.sequence.append(i)
+
+        self.position = 0  # 現在表示中の sequence の位置
+        self.pending_position = None  # ページめくり中の移動先
+        self.pending_until = 0.0  # 移動先が表示される時刻
+        self.grab_count = 0
+        self.press_count = 0
+        self._rng = random.Random(seed)
+        self._cache = {}
+
+    @property
+    def name(self):
+        return f"replay:{osp.basename(osp.normpath(self.frames_dir))}"
+
+    def _load(self, index):
+        """画像を読み込む（一度読んだ画像はキャッシュ）"""
+        if index not in self._cache:
+            with Image.open(self.frames[index]) as img:
+                self._cache[index] = img.convert("RGB")
+        return self._cache[index]
+
+    def grab(self):
+        """現在表示中の画像を返す（ページめくり中は前の画像）"""
+        self.grab_count += 1
+        if self.pending_position is not None and time.perf_counter() >= self.pending_until:
+            self.position = self.pending_position
+            self.pending_position = None
+        # 実際のキャプチャと同様に毎回新しいバッファを返す必要はない（呼び出し側は変更しない）
+        return self._load(self.sequence[self.position])
+
+    def press(self, key):
+        """次の画像へ進む（最後の画像では何も変わらない）"""
+        self.press_count += 1
+        base = self.pending_position if self.pending_position is not None else self.position
+        if base + 1 >= len(self.sequence):
+            return
+        delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+        self.pending_position = base + 1
+        self.pending_until = time.perf_counter() + delay
+
+
+def get_capture_source():
+    """共有のキャプチャ元を返す（初回呼び出し時に作成）"""
+    global capture_source
+    if capture_source is None:
+        if replay_dir:
+            capture_source = ReplayCaptureSource(replay_dir)
+        else:
+            capture_source = CaptureSession()
+    return capture_source
+
+
+def press_page_key():
+    """キャプチャ元にページ送りキーを送る"""
+    get_capture_source().press(page_change_key)
+
+
 def capture_kindle_screenshot():
     """
     Kindleウィンドウのスクリーンショットのみをキャプチャ
     Returns:
         PILImage: キャプチャした画像、失敗時はNone
     """
-    app = find_kindle_window()
-    if not app:
+    screenshot = get_capture_source().grab()
+    if screenshot is None:
         return None
     
-    # Kindleウィンドウを前面に
-    app.activateWithOptions_(1 << 1)
-    time.sleep(0.2)
-    
-    # ウィンドウの位置とサイズを取得
-    bounds = get_kindle_window_bounds(app)
-    if not bounds:
+    # トリミング処理を適用
+    if crop_top > 0 or crop_bottom > 0 or crop_left > 0 or crop_right > 0:
+        screenshot_array = crop_image(screenshot)
+        # NumPy配列をPIL Imageに戻す
+        screenshot = Image.fromarray(screenshot_array)
+    return screenshot
+
+
+def capture_frame(top=0, bottom=None, lft=0, rht=None, timer=None):
+    """
+    スクリーンショットを取得し、トリミング済みのBGRフレームとして返す
+    グラブしたバッファをNumPy配列として1回だけ取り出し、トリミング（--crop-* と
+    コンテンツ領域）はビューで行い、色変換は切り出した範囲に1回だけ適用する。
+    変化検出とPNGエンコードはこの戻り値を共有する
+    Args:
+        top: 上端の位置（--crop-* 適用後の座標）
+        bottom: 下端の位置（Noneなら画像の下端）
+        lft: 左端の位置
+        rht: 右端の位置（Noneなら画像の右端）
+        timer: 取得・変換時間を記録する PageTimer（省略可）
+    Returns:
+        NumPy配列: BGRのフレーム（C連続）、失敗時はNone
+    """
+    t0 = time.perf_counter()
+    screenshot = get_capture_source().grab()
+    if screenshot is None:
         return None
-    
-    x, y, width, height = bounds
-    
-    # すべてのスクリーンを確認して、ウィンドウが表示されているスクリーンを特定
-    screens = NSScreen.screens()
-    main_screen = screens[0]
-    main_frame = main_screen.frame()
-    
-    # マルチモニター対応：全体の座標をメインスクリーン相対に変換
-    # ウィンドウのプライマリスクリーン高さを使用
-    screen_height = main_frame.size.height
-    
-    # ウィンドウが他のモニターにある場合も対応
-    # 各スクリーンの相対座標を計算
-    offset_y = 0
-    for screen in screens:
-        screen_frame = screen.frame()
-        # このスクリーンがウィンドウを含んでいるか確認
-        if (screen_frame.origin.x <= x < screen_frame.origin.x + screen_frame.size.width or
-            screen_frame.origin.x <= x + width <= screen_frame.origin.x + screen_frame.size.width):
-            offset_y = screen_frame.origin.y
-            break
-    
-    # 指定した領域をキャプチャ（座標を整数に変換）
-    # PIL/ImageGrabは仮想スクリーン座標系を使用するため、直接使用
-    region = (int(x), int(y), int(x + width), int(y + height))
-    try:
-        screenshot = ImageGrab.grab(bbox=region)
-        # トリミング処理を適用
-        if crop_top > 0 or crop_bottom > 0 or crop_left > 0 or crop_right > 0:
-            screenshot_array = crop_image(screenshot)
-            # NumPy配列をPIL Imageに戻す
-            from PIL import Image
-            screenshot = Image.fromarray(screenshot_array)
-        return screenshot
-    except Exception as e:
-        print(f"警告: ImageGrab失敗（{e}）、代替方法を試行中...")
-        # 失敗時は全画面キャプチャにフォールバック
-        return ImageGrab.grab()
+    t1 = time.perf_counter()
+    # PILのバッファをNumPy配列として取り出す（ここで1回コピー）
+    rgb = np.asarray(screenshot)
+    if rgb.ndim == 3 and rgb.shape[2] == 4:
+        rgb = rgb[:, :, :3]
+    # トリミングはすべてビュー（コピーなし）
+    view = crop_image(rgb)[top:bottom, lft:rht]
+    # 唯一の色変換（ここで2回目のコピー、切り出した範囲のみ）
+    frame = cv2.cvtColor(view, cv2.COLOR_RGB2BGR)
+    if timer is not None:
+        timer.phases["grab"] += t1 - t0
+        timer.phases["convert"] += time.perf_counter() - t1
+        timer.polls += 1
+    return frame
 
 
 def get_title(custom_title=None):
@@ -213,6 +565,116 @@ def get_save_folder(custom_folder=None):
     return folder
 
 
+def content_mask(img, tolerance=None):
+    """
+    背景色と異なる画素のマスクを返す
+    四隅の色の中央値を背景色とし、いずれかのチャンネルの差が tolerance を超える画素をTrueとする
+    Args:
+        img: 画像データ（NumPy配列、BGRまたはグレースケール）
+        tolerance: 背景色とみなす最大の色差（省略時は boundary_tolerance）
+    Returns:
+        ndarray: (高さ, 幅) の bool 配列
+    """
+    tolerance = boundary_tolerance if tolerance is None else tolerance
+    height, width = img.shape[:2]
+    if img.ndim == 2:
+        img = img[:, :, np.newaxis]
+
+    # 四隅の画素から背景色を推定（ノイズに強いよう中央値を使う）
+    corners = np.stack([img[0, 0], img[0, -1], img[-1, 0], img[-1, -1]])
+    background = np.median(corners, axis=0).astype(np.uint8)
+    diff = cv2.absdiff(img, np.broadcast_to(background, img.shape).copy())
+    return (diff.reshape(height, width, -1) > tolerance).any(axis=2)
+
+
+def find_content_box(img, tolerance=None, min_fraction=None):
+    """
+    画像内のコンテンツ領域（上下左右の境界）を1回の走査で検出
+    四隅の色の中央値を背景色とし、背景色との差が tolerance を超える画素の割合を
+    列ごと・行ごとに集計して、min_fraction を超える範囲をコンテンツとみなす
+    Args:
+        img: 画像データ（NumPy配列、BGR）
+        tolerance: 背景色とみなす最大の色差（省略時は boundary_tolerance）
+        min_fraction: コンテンツとみなす列・行の最小割合（省略時は boundary_min_fraction）
+    Returns:
+        (top, bottom, left, right): 画像のスライス範囲 img[top:bottom, left:right]。
+        コンテンツが見つからない（一様な画面）場合は画像全体
+    """
+    min_fraction = boundary_min_fraction if min_fraction is None else min_fraction
+    height, width = img.shape[:2]
+    lo, hi = l_margin, max(width - r_margin, l_margin + 1)
+
+    mask = content_mask(img, tolerance)[:, lo:hi]
+    col_content = np.flatnonzero(np.count_nonzero(mask, axis=0) > min_fraction * mask.shape[0]) + lo
+    row_content = np.flatnonzero(np.count_nonzero(mask, axis=1) > min_fraction * mask.shape[1])
+    if col_content.size == 0 or row_content.size == 0:
+        return 0, height, lo, hi
+    # right は従来の find_content_boundaries と同じく最後のコンテンツ列の位置
+    # （既存キャプチャとの画像サイズの互換性のため）
+    return int(row_content[0]), int(row_content[-1]) + 1, int(col_content[0]), int(col_content[-1])
+
+
+def find_spread_gutter(img, search=None, min_gap=None, min_fraction=None):
+    """
+    見開き（2ページ表示）の画面から、左右のページの間の綴じ目（ノド）の位置を検出
+    行を間引いた画像で列ごとの非背景画素の割合を求め、中央付近で最も広い空白列の
+    連続区間を綴じ目とみなす。左右どちらかにコンテンツが無い場合（表紙など1ページのみの
+    画面）や、見開きの図版で空白列が無い場合はNone
+    Args:
+        img: 画像データ（NumPy配列、BGR）
+        search: 綴じ目を探す範囲（中央から左右に幅の割合）。省略時は spread_search
+        min_gap: 綴じ目とみなす空白列の最小幅（幅の割合）。省略時は spread_min_gap
+        min_fraction: コンテンツとみなす列の最小割合。省略時は boundary_min_fraction
+    Returns:
+        int: 綴じ目の列の位置（左ページは img[:, :x]、右ページは img[:, x:]）、見つからなければNone
+    """
+    search = spread_search if search is None else search
+    min_gap = spread_min_gap if min_gap is None else min_gap
+    min_fraction = boundary_min_fraction if min_fraction is None else min_fraction
+    height, width = img.shape[:2]
+
+    # 列のプロファイルだけが必要なので、行を間引き、Gチャンネルだけで計算量を減らす
+    step = max(1, height // 256)
+    sample = img[::step, :, 1] if img.ndim == 3 else img[::step]
+    mask = content_mask(sample)
+    empty = np.count_nonzero(mask, axis=0) <= min_fraction * mask.shape[0]
+
+    # 中央付近の空白列の連続区間を列挙
+    lo = max(1, int(width * (0.5 - search)))
+    hi = min(width - 1, int(width * (0.5 + search)))
+    edges = np.diff(np.concatenate(([0], empty[lo:hi].astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    widths = ends - starts
+    if widths.size == 0 or widths.max() < max(1, min_gap * width):
+        return None
+    best = int(np.argmax(widths))
+    gutter = lo + (int(starts[best]) + int(ends[best])) // 2
+
+    # 左右の両方にコンテンツがある場合のみ見開きとみなす
+    min_content = max(1, int(width * 0.05))
+    if (np.count_nonzero(~empty[:gutter]) < min_content or
+            np.count_nonzero(~empty[gutter:]) < min_content):
+        return None
+    return gutter
+
+
+def split_spread(img, gutter):
+    """
+    見開きの画面を綴じ目で2ページに分割し、読む順に返す
+    縦書き（ページ送りキーが left）の本は右ページが先
+    Args:
+        img: 画像データ（NumPy配列）
+        gutter: find_spread_gutter で検出した綴じ目の位置
+    Returns:
+        list: [(side, 画像), ...]。side は "left" または "right"（画像はビュー）
+    """
+    pages = [("left", img[:, :gutter]), ("right", img[:, gutter:])]
+    if page_change_key == "left":
+        pages.reverse()
+    return pages
+
+
 def find_content_boundaries(img):
     """
     画像内のコンテンツ境界を検出
@@ -222,19 +684,470 @@ def find_content_boundaries(img):
         lft: 左端の位置
         rht: 右端の位置
     """
+    _, _, lft, rht = find_content_box(img)
+    return lft, rht
+
+
+class PageChangeDetector:
+    """
+    縮小フィンガープリントでページめくりを検出するクラス
+    フル解像度の np.array_equal の代わりに、比較領域（ROI）を縮小した
+    グレースケール画像同士をセルごとに比べる。
+    章扉や数行だけのページは平均差分が小さくなるため、輝度差が cell_threshold を超えた
+    セルの数で判定し、平均差分は全体がうっすら変わる場合の補助に使う
+    """
 
-    def cmps(img, rng):
-        """ピクセルの色を比較して境界を検出"""
-        for i in rng:
-            if np.all(img[20][i] != img[19][0]):
-                return i
+    def __init__(self, roi=None, threshold=None, size=None, history=None,
+                 cell_threshold=None, min_cells=None):
+        """
+        Args:
+            roi: 比較領域（左, 上, 右, 下）の割合。省略時は change_roi
+            threshold: 平均輝度差の閾値。省略時は change_threshold
+            size: フィンガープリントのサイズ（幅, 高さ）。省略時は fingerprint_size
+            history: 保持するフィンガープリント数。省略時は fingerprint_history
+            cell_threshold: 変化したセルとみなす輝度差。省略時は change_cell_threshold
+            min_cells: ページが変わったと判定する変化したセルの数。省略時は change_min_cells
+        """
+        self.roi = roi if roi is not None else change_roi
+        self.threshold = threshold if threshold is not None else change_threshold
+        self.cell_threshold = cell_threshold if cell_threshold is not None else change_cell_threshold
+        self.min_cells = min_cells if min_cells is not None else change_min_cells
+        self.size = size if size is not None else fingerprint_size
+        self.history = deque(maxlen=history if history is not None else fingerprint_history)
 
-    lft = cmps(img, range(l_margin, img.shape[1] - r_margin))
-    rht = cmps(img, reversed(range(l_margin, img.shape[1] - r_margin)))
-    return lft, rht
+    def fingerprint(self, img):
+        """
+        画像からフィンガープリントを作成
+        Args:
+            img: 画像データ（NumPy配列、BGR/RGB/グレースケール）
+        Returns:
+            フィンガープリント（float32のNumPy配列、サイズは self.size）
+        """
+        height, width = img.shape[:2]
+        rl, rt, rr, rb = self.roi
+        x0, x1 = int(width * rl), max(int(width * rr), int(width * rl) + 1)
+        y0, y1 = int(height * rt), max(int(height * rb), int(height * rt) + 1)
+        fw, fh = self.size
+
+        # フル解像度の縮小を避けるため、先に間引いてから面積平均で縮小する
+        step_y = max(1, (y1 - y0) // (fh * 4))
+        step_x = max(1, (x1 - x0) // (fw * 4))
+        sampled = img[y0:y1:step_y, x0:x1:step_x]
+        if sampled.ndim == 3:
+            # 輝度の近似としてGチャンネルのみ使用（BGR/RGBどちらでも同じ位置）
+            sampled = sampled[:, :, 1]
+        sampled = sampled.astype(np.float32)
+        return cv2.resize(sampled, (fw, fh), interpolation=cv2.INTER_AREA)
+
+    @staticmethod
+    def distance(fp_a, fp_b):
+        """2つのフィンガープリントの平均輝度差を返す"""
+        return float(np.mean(np.abs(fp_a - fp_b)))
+
+    def differs(self, fp_a, fp_b):
+        """
+        2つのフィンガープリントが別の画面か判定
+        変化したセルが min_cells 以上、または平均輝度差が threshold を超えればTrue
+        """
+        diff = np.abs(fp_a - fp_b)
+        if np.count_nonzero(diff > self.cell_threshold) >= self.min_cells:
+            return True
+        return float(diff.mean()) > self.threshold
+
+    @property
+    def last(self):
+        """最後に保存したページのフィンガープリント（なければNone）"""
+        return self.history[-1] if self.history else None
+
+    def is_changed(self, fp):
+        """
+        最後に保存したページからフィンガープリントが変化したか判定
+        Args:
+            fp: 現在のフレームのフィンガープリント
+        Returns:
+            bool: 変化していればTrue（履歴が空の場合もTrue）
+        """
+        if self.last is None:
+            return True
+        return self.differs(self.last, fp)
+
+    def push(self, fp):
+        """保存したページのフィンガープリントを履歴に追加"""
+        self.history.append(fp)
+
+    def matches(self, fp_a, fp_b):
+        """2つのフィンガープリントが同じページとみなせるか（どちらかがNoneならFalse）"""
+        if fp_a is None or fp_b is None:
+            return False
+        return not self.differs(fp_a, fp_b)
+
+    @staticmethod
+    def is_blank(fp):
+        """空白・読み込み中の画面か（輝度のばらつきがほとんど無い）"""
+        return float(fp.std()) < blank_std_threshold
+
+    def find_revisit(self, fp):
+        """
+        最後のページより前に保存したページと同じか調べる
+        Returns:
+            int: 何ページ前と一致したか（2以上）、一致しなければNone
+        """
+        older = list(self.history)[:-1]
+        for back, past in enumerate(reversed(older), 2):
+            if self.matches(past, fp):
+                return back
+        return None
+
+    def classify(self, fp):
+        """
+        描画が安定したフレームを分類
+        Returns:
+            str: "same"（最後のページと同じ）, "blank"（空白・読み込み中）,
+                 "revisit"（以前のページに戻った）, "new"（新しいページ）
+        """
+        if self.last is not None and self.matches(self.last, fp):
+            return "same"
+        if self.is_blank(fp):
+            return "blank"
+        if self.find_revisit(fp) is not None:
+            return "revisit"
+        return "new"
+
+
+def is_grayscale_image(img, tolerance=None, max_color_pixels=None):
+    """
+    画像に色が無いか（チャンネル間の差がほとんど無いか）を判定
+    小さなアイコンや細い色線も見落とさないよう、間引かずに全画素で判定する
+    （グレースケールで保存すると色は戻せないため、迷う場合はカラーに倒す）
+    Args:
+        img: 画像データ（NumPy配列、BGR）
+        tolerance: 色が無いとみなすチャンネル間の最大差（省略時は grayscale_tolerance）
+        max_color_pixels: 許容する色のある画素の数（省略時は grayscale_max_color_pixels）
+    Returns:
+        bool: 色が無ければTrue
+    """
+    if img.ndim == 2 or img.shape[2] == 1:
+        return True
+    tolerance = grayscale_tolerance if tolerance is None else tolerance
+    max_color_pixels = grayscale_max_color_pixels if max_color_pixels is None else max_color_pixels
+    b, g, r = cv2.split(img[:, :, :3])
+    spread = cv2.absdiff(cv2.max(cv2.max(b, g), r), cv2.min(cv2.min(b, g), r))
+    # 割合ではなく画素数で許容する（割合だと大きなページほど小さな色の図形を見落とす）
+    return cv2.countNonZero(cv2.compare(spread, tolerance, cv2.CMP_GT)) <= max_color_pixels
+
+
+def encode_image(img, ext):
+    """
+    保存設定（形式・圧縮レベル・グレースケール）に従って画像をエンコード
+    Args:
+        img: 画像データ（NumPy配列、BGR）
+        ext: 拡張子（".png" または ".webp"）
+    Returns:
+        bytes: エンコード結果
+    """
+    if img.ndim == 3 and (grayscale_mode == "always" or (grayscale_mode == "auto" and is_grayscale_image(img))):
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    if ext.lower() == ".webp":
+        # 品質に100より大きい値を指定するとロスレス
+        params = [cv2.IMWRITE_WEBP_QUALITY, 101]
+    else:
+        params = [cv2.IMWRITE_PNG_COMPRESSION, png_compression]
+    ok, buf = cv2.imencode(ext, img, params)
+    if not ok:
+        raise IOError(f"画像のエンコードに失敗しました（{ext}）")
+    return buf.tobytes()
+
+
+class AsyncImageWriter:
+    """
+    PNGエンコードとファイル書き込みをバックグラウンドで行うクラス
+    キャプチャループはフレームをキューに渡すだけで次のページめくりに進める。
+    キューは上限付きなので、書き込みが追いつかない場合はキャプチャ側が待つ
+    """
+
+    def __init__(self, num_threads=None, queue_size=None, journal=None):
+        """
+        Args:
+            num_threads: 書き込みスレッド数。省略時は writer_threads
+            queue_size: キューの上限。省略時は writer_queue_size
+            journal: 書き込み完了後にレコードを追記する CaptureJournal（省略可）
+        """
+        num_threads = num_threads if num_threads is not None else writer_threads
+        queue_size = queue_size if queue_size is not None else writer_queue_size
+        self.queue = queue.Queue()
+        # キューの上限はセマフォで管理（空き待ちの時間をレコードに記録するため）
+        self._slots = threading.BoundedSemaphore(max(1, queue_size))
+        self.journal = journal
+        self.errors = []  # (ファイルパス, 例外) のリスト
+        self.written = 0
+        self._dirs = set()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"image-writer-{i}", daemon=True)
+            for i in range(max(1, num_threads))
+        ]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, path, img, record=None):
+        """
+        画像の書き込みを予約（キューが満杯の場合は空くまで待つ）
+        Args:
+            path: 保存先パス（拡張子でフォーマットを決定）
+            img: 画像データ（NumPy配列、BGR）。渡した後は変更しないこと
+            record: 書き込み完了後にジャーナルへ追記するレコード（省略可）
+        """
+        if self._closed:
+            raise RuntimeError("AsyncImageWriter は既に終了しています")
+        t = time.perf_counter()
+        self._slots.acquire()
+        if record is not None and "timing" in record:
+            record["timing"]["submit"] = round(time.perf_counter() - t, 4)
+        self.queue.put((osp.abspath(path), img, record))
+
+    def _worker(self):
+        """キューからフレームを取り出して書き込むスレッド"""
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                path, img, record = item
+                try:
+                    t = time.perf_counter()
+                    data = self._write(path, img)
+                    if record is not None and "timing" in record:
+                        record["timing"]["encode"] = round(time.perf_counter() - t, 4)
+                    if record is not None and self.journal is not None:
+                        record["bytes"] = len(data)
+                        record["sha256"] = content_hash(data)
+                        self.journal.append(record)
+                    with self._lock:
+                        self.written += 1
+                        self._dirs.add(osp.dirname(path))
+                except Exception as e:
+                    with self._lock:
+                        self.errors.append((path, e))
+                finally:
+                    self._slots.release()
+            finally:
+                self.queue.task_done()
+
+    @staticmethod
+    def _write(path, img):
+        """
+        画像をエンコード（encode_image）して一時ファイルに書き込み、fsync後にリネーム
+        途中で中断しても壊れた画像ファイルが残らない
+        Returns:
+            bytes: 書き込んだファイルの内容
+        """
+        data = encode_image(img, osp.splitext(path)[1])
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return data
+
+    def flush(self):
+        """
+        予約済みの書き込みがすべて完了するまで待ち、ディレクトリをfsyncする
+        """
+        self.queue.join()
+        with self._lock:
+            dirs = list(self._dirs)
+        for d in dirs:
+            try:
+                fd = os.open(d, os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                os.fsync(fd)
+            except OSError:
+                pass
+            finally:
+                os.close(fd)
+
+    def close(self):
+        """
+        すべての書き込みを完了させてスレッドを終了する
+        Returns:
+            bool: 書き込みエラーがなければTrue
+        """
+        if self._closed:
+            return not self.errors
+        self.flush()
+        self._closed = True
+        for _ in self._threads:
+            self.queue.put(None)
+        for t in self._threads:
+            t.join()
+        for path, e in self.errors:
+            print(f"❌ 画像の保存に失敗しました: {path} ({e})", file=sys.stderr)
+        return not self.errors
+
+
+class PageTimer:
+    """
+    1ページ分の処理時間をフェーズごとに計測するクラス
+    wait: 待機, grab: スクリーンショット取得, convert: 取り出し・色変換,
+    compare: フィンガープリント比較, submit: 書き込みキューへの投入（満杯時の待ちを含む）,
+    encode: エンコード・書き込み（書き込みスレッド側で計測）
+    """
+
+    PHASES = ("wait", "grab", "convert", "compare", "submit", "encode")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = dict.fromkeys(self.PHASES, 0.0)
+        self.polls = 0  # スクリーンショットの取得回数
+        self.retries = 0  # ウィンドウの再解決・ちらつきによるやり直しの回数
+
+    @contextmanager
+    def measure(self, phase):
+        """with ブロックの所要時間を phase に加算"""
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[phase] += time.perf_counter() - t
+
+    def sleep(self, seconds):
+        """待機し、待機時間として記録"""
+        if seconds > 0:
+            with self.measure("wait"):
+                time.sleep(seconds)
+
+    @property
+    def elapsed(self):
+        """計測開始からの経過時間(秒)"""
+        return time.perf_counter() - self.start
+
+    def to_record(self):
+        """ジャーナルに保存する形式に変換"""
+        return {
+            "timing": {k: round(v, 4) for k, v in self.phases.items()},
+            "polls": self.polls,
+            "retries": self.retries,
+        }
+
+    def describe(self):
+        """1行表示用の文字列"""
+        p = self.phases
+        return (f"待機{p['wait']:.2f} 取得{p['grab']:.2f} 変換{p['convert']:.3f} "
+                f"比較{p['compare']:.3f} 投入{p['submit']:.3f}, 取得{self.polls}回")
+
+
+class TurnLatencyScheduler:
+    """
+    ページめくり遅延を学習する適応ポーリングのスケジューラ
+    キー押下から画面が変化するまでの時間を記録し、次のページでは
+    学習した遅延の少し手前から短い間隔でポーリングする
+    """
 
+    def __init__(self, min_samples=3, margin=0.8):
+        """
+        Args:
+            min_samples: 学習値を使い始めるまでに必要なサンプル数
+            margin: 初回取得までの待機を学習値の何倍にするか
+        """
+        self.min_samples = min_samples
+        self.margin = margin
+        self.turn_latencies = []  # キー押下から変化検出までの時間(秒)
+        self.settle_latencies = []  # キー押下から描画安定までの時間(秒)
+
+    def initial_delay(self):
+        """
+        キー押下後、最初のスクリーンショットを取るまでの待機時間(秒)
+        学習サンプルが少ない間は0（すぐにポーリング開始）
+        """
+        if len(self.turn_latencies) < self.min_samples:
+            return 0.0
+        # 速い側（10パーセンタイル）に合わせ、waitsec を上限とする
+        delay = float(np.percentile(self.turn_latencies, 10)) * self.margin
+        return min(max(delay - poll_interval, 0.0), waitsec)
+
+    def end_timeout(self):
+        """
+        画面が変化しない場合に本の終わりと判定するまでの時間(秒)
+        学習済みなら安定までの時間の90パーセンタイルの3倍（最短 end_wait_min）、
+        未学習または検出無効時は page_timeout
+        """
+        if not end_detection or len(self.settle_latencies) < self.min_samples:
+            return page_timeout
+        p90 = float(np.percentile(self.settle_latencies, 90))
+        return min(page_timeout, max(end_wait_min, p90 * 3))
+
+    def seed(self, turn_latencies, settle_latencies):
+        """
+        前回のキャプチャで学習した遅延を読み込む（キャリブレーションプロファイルから）
+        1ページ目から学習済みの待機で開始でき、以降のページの記録で更新される
+        """
+        count = min(len(turn_latencies), len(settle_latencies))
+        self.turn_latencies = [float(v) for v in turn_latencies[-count:]] if count else []
+        self.settle_latencies = [float(v) for v in settle_latencies[-count:]] if count else []
+
+    def record(self, turn_latency, settle_latency):
+        """1ページ分のめくり遅延と安定までの時間を記録"""
+        self.turn_latencies.append(turn_latency)
+        self.settle_latencies.append(settle_latency)
 
-def capture_and_save_pages(lft, rht, title, max_pages_limit=None):
+    def print_summary(self):
+        """学習しためくり遅延のサマリーを表示"""
+        if not self.turn_latencies:
+            return
+        turn = np.array(self.turn_latencies)
+        settle = np.array(self.settle_latencies)
+        print("\n⏱️  ページめくり遅延の学習結果")
+        print(f"  サンプル数: {len(turn)}ページ")
+        print(f"  めくり遅延: 最小 {turn.min():.3f}s / 中央値 {np.median(turn):.3f}s / "
+              f"90% {np.percentile(turn, 90):.3f}s / 最大 {turn.max():.3f}s")
+        print(f"  描画安定まで: 中央値 {np.median(settle):.3f}s / 90% {np.percentile(settle, 90):.3f}s")
+        print(f"  次ページの初回待機: {self.initial_delay():.3f}s（固定待機 {waitsec}s の代わり）")
+
+
+def parse_roi(value):
+    """
+    "左,上,右,下" 形式の文字列を比較領域のタプルに変換（argparse用）
+    """
+    try:
+        roi = tuple(float(v) for v in value.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"比較領域は 左,上,右,下 の数値で指定してください: {value}")
+    if len(roi) != 4 or not (0.0 <= roi[0] < roi[2] <= 1.0 and 0.0 <= roi[1] < roi[3] <= 1.0):
+        raise argparse.ArgumentTypeError(f"比較領域は 0〜1 の割合で 左<右, 上<下 となるよう指定してください: {value}")
+    return roi
+
+
+def skip_saved_page(detector, lft, rht, last_page_num, top=0, bottom=None):
+    """
+    再開時、現在の画面が最後に保存したページと同じならページ送りをする
+    (ユーザーが前回終了時のページを開いたままにしているケースに対応)
+    Args:
+        detector: 最後に保存したページのフィンガープリントを持つ PageChangeDetector
+        lft: 左端の位置
+        rht: 右端の位置
+        last_page_num: 最後に保存したページ番号
+        top: 上端の位置
+        bottom: 下端の位置（Noneなら画像の下端）
+    """
+    print("   現在のKindle画面を確認中...")
+    time.sleep(1.0) # ウィンドウアクティブ化待ち等を含める
+    curr_crop = capture_frame(top, bottom, lft, rht)
+    
+    if curr_crop is not None:
+        if not detector.is_changed(detector.fingerprint(curr_crop)):
+            print(f"   ⚠️ 現在の画面は最後に保存されたページ({last_page_num})と同じです。")
+            print(f"   ▶️ 自動でページ送りキー({page_change_key})を押して次へ進みます...")
+            press_page_key()
+            time.sleep(waitsec)
+        else:
+            print("   ✅ 画面は既に次のページに進んでいるようです。このまま続行します。")
+
+
+def capture_and_save_pages(lft, rht, title, max_pages_limit=None, top=0, bottom=None, scheduler=None):
     """
     ページをキャプチャして保存
     Args:
@@ -242,17 +1155,20 @@ def capture_and_save_pages(lft, rht, title, max_pages_limit=None):
         rht: 右端の位置
         title: 保存時のタイトル
         max_pages_limit: 最大ページ数（Noneの場合は無制限）
+        top: 上端の位置
+        bottom: 下端の位置（Noneなら画像の下端）
+        scheduler: めくり遅延のスケジューラ（省略時は未学習の状態から開始）
     Returns:
         page - 1: 保存したページ数
     """
     # 画面サイズ取得と初期化
-    first_screenshot = capture_kindle_screenshot()
-    if first_screenshot is None:
+    first_frame = capture_frame(top, bottom, lft, rht)
+    if first_frame is None:
         return 0
     
-    first_array = np.array(first_screenshot)
-    sc_h = first_array.shape[0]
-    old = np.zeros((sc_h, rht - lft, 3), np.uint8)
+    # 保存するフレームのサイズ（再開時に既存画像と照合する）
+    frame_shape = first_frame.shape
+    detector = PageChangeDetector()
     page = 1
     # 保存先フォルダの設定
     cd = os.getcwd()
@@ -260,13 +1176,44 @@ def capture_and_save_pages(lft, rht, title, max_pages_limit=None):
     target_folder = osp.join(base_save_folder, title)
     images_folder = osp.join(target_folder, "images")
     os.makedirs(images_folder, exist_ok=True)
+    journal_file = osp.abspath(journal_path(target_folder))
     os.chdir(images_folder)
 
     # ---------------------------------------------------------
     # リラン時の再開処理
     # ---------------------------------------------------------
-    existing_files = [f for f in os.listdir('.') if f.endswith('.png')]
+    last_record = read_last_record(journal_file)
+    if last_record is not None:
+        # ジャーナルの末尾だけを読んで再開（画像の読み込みは不要）
+        restart = True
+        try:
+            last_page_num = last_record["page"]
+            if not os.path.exists(last_record["file"]):
+                print(f"   ⚠️ 警告: ジャーナル上の最終ページ({last_record['file']})が見つかりません。1ページ目から上書きします。")
+            elif tuple(last_record.get("spread", {}).get("frame_shape", last_record["shape"])) != frame_shape:
+                # 見開きを分割したページは分割前の画面のサイズで照合する
+                saved_shape = tuple(last_record.get("spread", {}).get("frame_shape", last_record["shape"]))
+                print(f"   ⚠️ 警告: 既存画像のサイズ({saved_shape})と現在の設定({frame_shape})が異なります。1ページ目から上書きします。")
+            else:
+                restart = False
+                print(f"🔄 キャプチャジャーナル検出: {last_page_num}ページまで保存済み")
+                detector.push(decode_fingerprint(last_record["fingerprint"]))
+                page = last_page_num + 1
+                print(f"👉 {page}ページ目からキャプチャを再開します")
+                skip_saved_page(detector, lft, rht, last_page_num, top, bottom)
+        except Exception as e:
+            print(f"   ❌ 再開処理の準備中にエラーが発生しました（1ページ目から開始します）: {e}")
+            detector.history.clear()
+            page = 1
+            restart = True
+        if restart:
+            # 古いページの記録が残ると次回の再開で使われるため、ジャーナルを退避して新しく始める
+            backup = rotate_journal(journal_file)
+            print(f"   📒 以前のキャプチャジャーナルを退避しました: {osp.basename(backup)}")
+
+    existing_files = [] if last_record is not None else [f for f in os.listdir('.') if f.endswith('.png')]
     if existing_files:
+        # ジャーナルが無い（以前のバージョンで保存した）場合は最後の画像から再開
         try:
             # 数字のファイル名のみ抽出して最大値を探す
             page_numbers = []
@@ -281,38 +1228,20 @@ def capture_and_save_pages(lft, rht, title, max_pages_limit=None):
                 last_page_num = max(page_numbers)
                 last_file = f"{last_page_num:03d}.png"
                 
-                # 最後の画像を読み込んで old に設定
+                # 最後の画像を読み込んでフィンガープリントを復元
                 if os.path.exists(last_file):
                     print(f"🔄 既存の画像データ検出: {last_page_num}ページまで保存済み")
                     img_last = cv2.imread(last_file)
                     
                     if img_last is not None:
                         # 画像サイズが一致するか確認（トリミング設定が変わっている場合は再開しない方が安全だが、ここでは続行）
-                        if img_last.shape == old.shape:
-                            old = img_last
+                        if img_last.shape == frame_shape:
+                            detector.push(detector.fingerprint(img_last))
                             page = last_page_num + 1
                             print(f"👉 {page}ページ目からキャプチャを再開します")
-                            
-                            # 現在の画面と比較して、同じならページ送りをする
-                            # (ユーザーが前回終了時のページを開いたままにしているケースに対応)
-                            print("   現在のKindle画面を確認中...")
-                            time.sleep(1.0) # ウィンドウアクティブ化待ち等を含める
-                            current_shot = capture_kindle_screenshot()
-                            
-                            if current_shot is not None:
-                                curr_arr = np.array(current_shot)
-                                curr_bgr = cv2.cvtColor(curr_arr, cv2.COLOR_RGB2BGR)
-                                curr_crop = curr_bgr[:, lft:rht]
-                                
-                                if np.array_equal(old, curr_crop):
-                                    print(f"   ⚠️ 現在の画面は最後に保存されたページ({last_page_num})と同じです。")
-                                    print(f"   ▶️ 自動でページ送りキー({page_change_key})を押して次へ進みます...")
-                                    pag.press(page_change_key)
-                                    time.sleep(waitsec)
-                                else:
-                                    print("   ✅ 画面は既に次のページに進んでいるようです。このまま続行します。")
+                            skip_saved_page(detector, lft, rht, last_page_num, top, bottom)
                         else:
-                            print(f"   ⚠️ 警告: 既存画像のサイズ({img_last.shape})と現在の設定({old.shape})が異なります。1ページ目から上書きします。")
+                            print(f"   ⚠️ 警告: 既存画像のサイズ({img_last.shape})と現在の設定({frame_shape})が異なります。1ページ目から上書きします。")
 
         except Exception as e:
             print(f"   ❌ 再開処理の準備中にエラーが発生しました（1ページ目から開始します）: {e}")
@@ -320,57 +1249,252 @@ def capture_and_save_pages(lft, rht, title, max_pages_limit=None):
 
     # 最大ページ数（指定がなければ無制限）
     max_pages_value = max_pages_limit if max_pages_limit is not None else float('inf')
-    
-    while page <= max_pages_value:
-        # ファイル名設定と時間計測開始
-        filename = f"{page:03d}.png"
-        start = time.perf_counter()
-        while True:
-            # ページめくり後の待機
-            time.sleep(waitsec)
-            # Kindleウィンドウのスクリーンショット取得と処理
-            s = capture_kindle_screenshot()
-            if s is None:
-                os.chdir(cd)
-                return page - 1
-            
-            s = np.array(s)
-            ss = cv2.cvtColor(s, cv2.COLOR_RGB2BGR)
-            ss = ss[:, lft:rht]
-            # ページめくり完了を確認
-            if not np.array_equal(old, ss):
+    if scheduler is None:
+        scheduler = TurnLatencyScheduler()
+    journal = CaptureJournal(journal_file)
+    writer = AsyncImageWriter(journal=journal)
+    pressed = False  # 直前にページ送りキーを押したか（最初のページは遅延を学習しない）
+    skipped_fp = None  # 直前に読み飛ばした空白ページのフィンガープリント
+    skipped_blank = 0  # 読み飛ばした空白ページ数
+    unchanged_checks = 0  # 画面が変化しないため待ち直し・押し直しをした回数（ページを保存したら0に戻す）
+    last_gutter = None  # 直前に検出した見開きの綴じ目の位置
+
+    source = get_capture_source()
+    page_records = []  # 保存したページのレコード（計測サマリー用）
+    loop_start = time.perf_counter()
+
+    try:
+        while page <= max_pages_value:
+            if writer.errors:
+                # 書き込みに失敗したページがあれば、欠番を作らないよう停止する（次回はその手前から再開）
+                print("❌ 画像の保存に失敗したため、キャプチャを中断します。")
                 break
-            # タイムアウト処理
-            if time.perf_counter() - start > 10.0:
-                os.chdir(cd)
+            # 時間計測開始
+            timer = PageTimer()
+            start = timer.start
+            resolves = getattr(source, "resolve_count", 0)
+            if adaptive_wait:
+                # 学習済みのめくり遅延の少し手前までは取得しない
+                timer.sleep(scheduler.initial_delay())
+            changed_at = None
+            prev_fp = None
+            stable_count = 0
+            recheck = False  # 画面が変化しないため、待ち直す・キーを押し直す
+            while True:
+                if not adaptive_wait:
+                    # ページめくり後の待機（固定）
+                    timer.sleep(waitsec)
+                # Kindleウィンドウのスクリーンショット取得と処理
+                ss = capture_frame(top, bottom, lft, rht, timer=timer)
+                if ss is None:
+                    return page - 1
+
+                with timer.measure("compare"):
+                    fp = detector.fingerprint(ss)
+                    # ページめくり完了を確認
+                    if changed_at is None:
+                        if detector.is_changed(fp) and not detector.matches(skipped_fp, fp):
+                            changed_at = time.perf_counter()
+                            stable_count = 1
+                    elif detector.matches(prev_fp, fp):
+                        stable_count += 1
+                    else:
+                        # 描画途中でまだ変化している
+                        stable_count = 1
+                    prev_fp = fp
+                    settled = changed_at is not None and stable_count >= settle_frames
+                    if settled and not detector.is_changed(fp):
+                        # 一瞬だけ変化して元のページに戻った（ちらつき）
+                        changed_at = None
+                        settled = False
+                        timer.retries += 1
+                if changed_at is not None and not adaptive_wait:
+                    break
+                if settled:
+                    break
+                # タイムアウト処理（学習済みなら本の終わりを早めに判定）
+                timeout = page_timeout if changed_at is not None else scheduler.end_timeout()
+                if time.perf_counter() - start > timeout:
+                    if changed_at is None:
+                        # 描画の遅れ・キーの取りこぼしで終了しないよう、1回待ち直してから
+                        # キーを end_confirm_presses 回押し直し、それでも変化しなければ本の終わり
+                        if unchanged_checks < end_confirm_presses + 1 and page <= max_pages_value:
+                            unchanged_checks += 1
+                            if unchanged_checks == 1:
+                                print(f"⏳ {timeout:.1f}秒間ページが変化しません。描画を待ち直します...")
+                            else:
+                                print(f"⏳ ページが変化しません。ページ送りキーを押し直して確認します"
+                                      f"（{unchanged_checks - 1}/{end_confirm_presses}）")
+                                press_page_key()
+                            recheck = True
+                            break
+                        print(f"🔚 ページ送りキーを{end_confirm_presses}回押し直しても画面が変化しません。"
+                              f"本の終わりと判断して終了します。")
+                        return page - 1
+                    # 変化はしたが安定しない場合は最後のフレームを採用
+                    break
+                timer.sleep(poll_interval)
+            if recheck:
+                continue
+            # 重複・空白ページ・本の終わりの判定（最後のページと同じ画面は検出の設定によらず保存しない）
+            with timer.measure("compare"):
+                if end_detection:
+                    verdict = detector.classify(fp)
+                else:
+                    verdict = "same" if detector.matches(detector.last, fp) else "new"
+            if verdict == "same":
+                # ちらついて元のページに戻った・キーを取りこぼした
+                if unchanged_checks >= end_confirm_presses + 1:
+                    print("🔚 ページ送りキーを押し直しても最後に保存したページのままです。本の終わりと判断して終了します。")
+                    return page - 1
+                unchanged_checks += 1
+                print("⏭️  最後に保存したページと同じ画面のため保存せずに、ページ送りキーを押し直します")
+                press_page_key()
+                pressed = True
+                continue
+            if adaptive_wait and pressed and not unchanged_checks:
+                # 待ち直し・押し直しをしたページはキー押下からの遅延にならないため学習しない
+                scheduler.record(changed_at - start, time.perf_counter() - start)
+            if verdict == "revisit":
+                back = detector.find_revisit(fp)
+                print(f"🔚 {back}ページ前に保存したページと同じ画面に戻りました。本の終わりと判断して終了します。")
                 return page - 1
-        # 画像保存と次ページへ
-        cv2.imwrite(filename, ss)
-        old = ss
-        print(f"Page: {page}, {ss.shape}, {time.perf_counter() - start:.2f} sec")
-        page += 1
-        # 最大ページに達していなければページめくり（キーを押す）
-        if page <= max_pages_value:
-            pag.press(page_change_key)
-    
-    # ループ終了時に保存したディレクトリに戻る
-    os.chdir(cd)
+            if verdict == "blank":
+                skipped_fp = fp
+                skipped_blank += 1
+                print(f"⏭️  空白・読み込み中の画面のため保存せずに次へ進みます（{skipped_blank}回目）")
+                if page <= max_pages_value:
+                    press_page_key()
+                    pressed = True
+                continue
+            skipped_fp = None
+            unchanged_checks = 0
+            timer.retries += getattr(source, "resolve_count", 0) - resolves
+            # 見開きの画面は綴じ目で2ページに分割
+            parts = [(None, ss)]
+            if spread_mode != "off":
+                gutter = find_spread_gutter(ss)
+                if gutter is None and spread_mode == "on":
+                    gutter = last_gutter if last_gutter is not None else ss.shape[1] // 2
+                if gutter is not None:
+                    last_gutter = gutter
+                    parts = split_spread(ss, gutter)
+            detector.push(fp)
+            fingerprint = encode_fingerprint(fp)
+            captured_at = datetime.datetime.now().isoformat(timespec="seconds")
+            # 画像保存（バックグラウンドで書き込み）と次ページへ
+            # 見開きの2ページ目は途中で打ち切らない（再開時に片方だけ欠けないように）
+            for i, (side, img) in enumerate(parts):
+                filename = f"{page:03d}.{image_format}"
+                record = {
+                    "page": page,
+                    "file": filename,
+                    "shape": list(img.shape),
+                    "fingerprint": fingerprint,
+                    "turn_latency": round(changed_at - start, 4) if changed_at is not None else None,
+                    "captured_at": captured_at,
+                }
+                if side is not None:
+                    record["spread"] = {"side": side, "gutter": int(gutter), "frame_shape": list(ss.shape)}
+                if i == 0:
+                    # 計測値は画面（ページめくり）ごとに1回だけ記録する
+                    record.update(timer.to_record())
+                    record["elapsed"] = round(timer.elapsed, 4)
+                # submit がキューの空き待ち時間を record["timing"]["submit"] に記録する
+                writer.submit(filename, img, record=record)
+                if i == 0:
+                    timer.phases["submit"] = record["timing"]["submit"]
+                    page_records.append(record)
+                spread_note = f" [見開き{'右' if side == 'right' else '左'}]" if side is not None else ""
+                print(f"Page: {page}{spread_note}, {img.shape}, {timer.elapsed:.2f} sec ({timer.describe()})")
+                page += 1
+            # 最大ページに達していなければページめくり（キーを押す）
+            if page <= max_pages_value:
+                press_page_key()
+                pressed = True
+    finally:
+        # 終了時（Ctrl-Cを含む）は書き込み待ちのページをすべて保存してから戻る
+        print("💾 書き込み待ちの画像を保存しています...")
+        writer.close()
+        journal.close()
+        # ループ終了時に保存したディレクトリに戻る
+        os.chdir(cd)
+        if adaptive_wait:
+            scheduler.print_summary()
+        print_timing_summary(page_records, time.perf_counter() - loop_start)
+
     return page - 1
 
 
+def current_crop():
+    """現在のトリミング量を辞書で返す"""
+    return {"top": crop_top, "bottom": crop_bottom, "left": crop_left, "right": crop_right}
+
+
+def find_calibration(source, profile_file):
+    """
+    キャプチャ元の名前と現在の画面サイズに対応するプロファイルを探す
+    Returns:
+        (key, profile): キー（キャリブレーション無効時はNone）とプロファイル（無ければNone）
+    """
+    if not use_calibration:
+        return None, None
+    screen = source.grab()
+    if screen is None:
+        return None, None
+    key = calibration_key(source.name, screen.size)
+    if recalibrate:
+        return key, None
+    return key, load_calibration(profile_file, key)
+
+
+def apply_calibration_crop(profile):
+    """
+    プロファイルのトリミング量を適用
+    コマンドラインでトリミングを指定した場合（いずれかが0より大きい）はそちらを優先する
+    """
+    global crop_top, crop_bottom, crop_left, crop_right
+    if crop_top > 0 or crop_bottom > 0 or crop_left > 0 or crop_right > 0:
+        return
+    crop = profile.get("crop") or {}
+    crop_top = int(crop.get("top", 0))
+    crop_bottom = int(crop.get("bottom", 0))
+    crop_left = int(crop.get("left", 0))
+    crop_right = int(crop.get("right", 0))
+    if crop_top > 0 or crop_bottom > 0 or crop_left > 0 or crop_right > 0:
+        print(f"  トリミング: 上{crop_top}px, 下{crop_bottom}px, 左{crop_left}px, 右{crop_right}px（プロファイル）")
+
+
+def calibrated_content_box(profile, shape):
+    """
+    プロファイルのコンテンツ領域を返す
+    トリミング量が保存時と異なる場合や、フレームに収まらない場合はNone（再検出する）
+    """
+    if profile is None or profile.get("crop") != current_crop():
+        return None
+    box = profile.get("content_box")
+    if not box or len(box) != 4:
+        return None
+    top, bottom, lft, rht = (int(v) for v in box)
+    height, width = shape[:2]
+    if not (0 <= top < bottom <= height and 0 <= lft < rht <= width):
+        return None
+    return top, bottom, lft, rht
+
+
 def main():
     """メイン処理"""
     global base_save_folder, output_dir, output_title
-    # Kindleアプリケーションを探索
-    app = find_kindle_window()
-    if app is None:
+    # キャプチャ元（Kindleアプリまたはリプレイ）を準備
+    if not replay_dir and not MACOS_CAPTURE_AVAILABLE:
         print(
-            "エラー: Kindleアプリケーションが見つかりません。Kindle for Macが起動していることを確認してください。",
+            "エラー: Quartz/AppKit/pyautogui が利用できません。macOS以外では --replay-dir を指定してください。",
             file=sys.stderr,
         )
         return
-    # ウィンドウの設定
-    setup_kindle_window(app)
+    source = get_capture_source()
+    if not source.prepare():
+        return
     # タイトルと保存先の取得
     title = get_title(custom_title=output_title)
     base_save_folder = get_save_folder(custom_folder=output_dir)
@@ -380,23 +1504,64 @@ def main():
 
     print(f"タイトル: {title}")
     print(f"保存先: {base_save_folder}")
-    print("\n5秒後にキャプチャを開始します...")
+
+    # 同じアプリ・画面サイズのキャリブレーションがあれば、フルスクリーン待機を省略
+    profile_file = calibration_file or calibration_path(base_save_folder)
+    profile_key, profile = find_calibration(source, profile_file)
+    if profile is not None:
+        print(f"📐 キャリブレーションを読み込みました: {profile_key}")
+    wait = calibrated_startup_wait if profile is not None else source.startup_wait
+    print(f"\n{wait}秒後にキャプチャを開始します...")
 
     # Kindleウィンドウを再度アクティブにして、画面サイズを取得してマウス移動
-    setup_kindle_window(app)
-    time.sleep(kindle_fullscreen_wait)
+    source.prepare()
+    time.sleep(wait)
+    if use_calibration and profile is None:
+        # 待機中にフルスクリーン等で画面サイズが変わった場合に備えて取り直す
+        profile_key, profile = find_calibration(source, profile_file)
+        if profile is not None:
+            print(f"📐 キャリブレーションを読み込みました: {profile_key}")
+    if profile is not None:
+        apply_calibration_crop(profile)
 
     # 初期画像を取得して境界を検出
-    img = capture_kindle_screenshot()
-    if img is None:
+    imp = capture_frame()
+    if imp is None:
         print("エラー: Kindleウィンドウのスクリーンショットが取得できません", file=sys.stderr)
         return
     
-    img = np.array(img)
-    imp = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
-    lft, rht = find_content_boundaries(imp)
-    # キャプチャを実行
-    total_pages = capture_and_save_pages(lft, rht, title, max_pages_limit=max_pages)
+    box = calibrated_content_box(profile, imp.shape)
+    if box is None:
+        box = find_content_box(imp)
+    else:
+        print("  保存済みのコンテンツ領域を使用します（再検出しません）")
+    top, bottom, lft, rht = box
+    if not auto_crop:
+        # 上下は --crop-top/--crop-bottom のみでトリミング
+        top, bottom = 0, None
+    if spread_mode != "off":
+        # 最初の画面が表紙など1ページのみの場合に見開きの左右を切り落とさないよう、左右は画面全体を使う
+        lft, rht = l_margin, imp.shape[1] - r_margin
+    print(f"コンテンツ領域: 上{top}, 下{bottom if bottom is not None else imp.shape[0]}, 左{lft}, 右{rht}")
+
+    # 前回学習しためくり遅延から開始
+    scheduler = TurnLatencyScheduler()
+    if profile is not None and adaptive_wait:
+        scheduler.seed(profile.get("turn_latencies", []), profile.get("settle_latencies", []))
+    # キャプチャを実行（中断された場合もプロファイルは保存する）
+    try:
+        total_pages = capture_and_save_pages(
+            lft, rht, title, max_pages_limit=max_pages, top=top, bottom=bottom, scheduler=scheduler
+        )
+    finally:
+        if profile_key is not None:
+            save_calibration(profile_file, profile_key, {
+                "crop": current_crop(),
+                "content_box": list(box),
+                "turn_latencies": scheduler.turn_latencies,
+                "settle_latencies": scheduler.settle_latencies,
+            })
+            print(f"📐 キャリブレーションを保存しました: {profile_file} ({profile_key})")
     # 完了メッセージを表示
     print(f"\n完了: スクリーンショットの撮影が終了しました。")
     print(f"合計 {total_pages} ページを保存しました。")
@@ -435,7 +1600,87 @@ if __name__ == "__main__":
         "--wait",
         type=float,
         default=1.0,
-        help="ページめくり後の待機時間（秒）（デフォルト: 1.0）"
+        help="ページめくり後の待機時間（秒）。適応ポーリング時は初回待機の上限（デフォルト: 1.0）"
+    )
+    parser.add_argument(
+        "--no-adaptive",
+        action="store_true",
+        help="適応ポーリングを無効にし、毎回 --wait 秒の固定待機を行う"
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=poll_interval,
+        help=f"適応ポーリングの取得間隔（秒）（デフォルト: {poll_interval}）"
+    )
+    parser.add_argument(
+        "--page-timeout",
+        type=float,
+        default=page_timeout,
+        help=f"ページが変化しない場合に終了するまでの時間（秒）（デフォルト: {page_timeout}）"
+    )
+    parser.add_argument(
+        "--no-end-detect",
+        action="store_true",
+        help="重複・空白ページ・本の終わりの検出を無効にする（タイムアウトのみで終了）"
+    )
+    parser.add_argument(
+        "--end-confirm-presses",
+        type=int,
+        default=end_confirm_presses,
+        help=f"画面が変化しないとき、本の終わりと判定する前にページ送りキーを押し直す回数（デフォルト: {end_confirm_presses}）"
+    )
+    parser.add_argument(
+        "--writer-threads",
+        type=int,
+        default=writer_threads,
+        help=f"PNGエンコード・書き込みのスレッド数（デフォルト: {writer_threads}）"
+    )
+    parser.add_argument(
+        "--replay-dir",
+        type=str,
+        default=None,
+        help="Kindleの代わりにこのフォルダの画像を再生してキャプチャ（ベンチマーク・検証用）"
+    )
+    parser.add_argument(
+        "--replay-latency",
+        type=float,
+        default=replay_latency,
+        help=f"再生時のページめくり遅延（秒）（デフォルト: {replay_latency}）"
+    )
+    parser.add_argument(
+        "--replay-jitter",
+        type=float,
+        default=replay_jitter,
+        help=f"再生時のページめくり遅延のゆらぎ（秒）（デフォルト: {replay_jitter}）"
+    )
+    parser.add_argument(
+        "--replay-duplicate-every",
+        type=int,
+        default=replay_duplicate_every,
+        help="再生時、N枚ごとに同じ画像を2回表示する（デフォルト: 0=無効）"
+    )
+    parser.add_argument(
+        "--image-format",
+        type=str,
+        default=image_format,
+        choices=["png", "webp"],
+        help="保存形式（png: PNG, webp: ロスレスWebP）（デフォルト: png）"
+    )
+    parser.add_argument(
+        "--png-compression",
+        type=int,
+        default=png_compression,
+        choices=range(10),
+        metavar="0-9",
+        help=f"PNGの圧縮レベル（0-9）（デフォルト: {png_compression}）"
+    )
+    parser.add_argument(
+        "--grayscale",
+        type=str,
+        default=grayscale_mode,
+        choices=["auto", "always", "never"],
+        help="グレースケールで保存（auto: 色が無いページのみ）（デフォルト: auto）"
     )
     parser.add_argument(
         "--output-dir",
@@ -480,6 +1725,64 @@ if __name__ == "__main__":
         choices=["right", "left"],
         help="ページ送りキー（right: 横書き用, left: 縦書き用）（デフォルト: right）"
     )
+    parser.add_argument(
+        "--auto-crop",
+        action="store_true",
+        help="検出したコンテンツ領域の上下も自動でトリミングする（左右は常に自動）"
+    )
+    parser.add_argument(
+        "--change-roi",
+        type=parse_roi,
+        default=change_roi,
+        help="ページ変化の比較領域（左,上,右,下 の割合）（デフォルト: 0,0.05,1,0.95）"
+    )
+    parser.add_argument(
+        "--change-threshold",
+        type=float,
+        default=change_threshold,
+        help=f"ページ変化と判定するフィンガープリントの平均輝度差（デフォルト: {change_threshold}）"
+    )
+    parser.add_argument(
+        "--change-cell-threshold",
+        type=float,
+        default=change_cell_threshold,
+        help=f"変化したセルとみなすフィンガープリントの1セルの輝度差（デフォルト: {change_cell_threshold}）"
+    )
+    parser.add_argument(
+        "--change-min-cells",
+        type=int,
+        default=change_min_cells,
+        help=f"ページ変化と判定する変化したセルの数（デフォルト: {change_min_cells}）"
+    )
+    parser.add_argument(
+        "--fingerprint-history",
+        type=int,
+        default=fingerprint_history,
+        help=f"保持するフィンガープリントの数（デフォルト: {fingerprint_history}）"
+    )
+    parser.add_argument(
+        "--spread",
+        type=str,
+        default=spread_mode,
+        choices=["off", "auto", "on"],
+        help="見開き画面を綴じ目で2ページに分割（auto: 綴じ目が見つかった画面のみ, on: 常に）（デフォルト: off）"
+    )
+    parser.add_argument(
+        "--recalibrate",
+        action="store_true",
+        help="保存済みのキャリブレーションを使わずに計測し直す（結果は保存する）"
+    )
+    parser.add_argument(
+        "--no-calibration",
+        action="store_true",
+        help="キャリブレーションプロファイルを読み込み・保存しない"
+    )
+    parser.add_argument(
+        "--calibration-file",
+        type=str,
+        default=None,
+        help="キャリブレーションプロファイルのファイル（省略時は保存先ベースフォルダの calibration.json）"
+    )
     parser.add_argument(
         "--app-title",
         type=str,
@@ -492,6 +1795,19 @@ if __name__ == "__main__":
     # グローバル変数を設定
     max_pages = args.max_pages
     waitsec = args.wait
+    adaptive_wait = not args.no_adaptive
+    poll_interval = args.poll_interval
+    page_timeout = args.page_timeout
+    writer_threads = args.writer_threads
+    end_detection = not args.no_end_detect
+    end_confirm_presses = max(0, args.end_confirm_presses)
+    image_format = args.image_format
+    png_compression = args.png_compression
+    grayscale_mode = args.grayscale
+    replay_dir = args.replay_dir
+    replay_latency = args.replay_latency
+    replay_jitter = args.replay_jitter
+    replay_duplicate_every = args.replay_duplicate_every
     page_change_key = args.page_key
     kindle_window_title = args.app_title
     crop_top = args.crop_top
@@ -500,15 +1816,36 @@ if __name__ == "__main__":
     crop_right = args.crop_right
     output_dir = args.output_dir
     output_title = args.title
+    auto_crop = args.auto_crop
+    change_roi = args.change_roi
+    change_threshold = args.change_threshold
+    change_cell_threshold = args.change_cell_threshold
+    change_min_cells = max(1, args.change_min_cells)
+    fingerprint_history = args.fingerprint_history
+    spread_mode = args.spread
+    use_calibration = not args.no_calibration
+    recalibrate = args.recalibrate
+    calibration_file = args.calibration_file
     
     print(f"🚀 キャプチャツール起動")
-    print(f"  対象アプリ: {kindle_window_title}")
-    print(f"  待機時間: {waitsec}秒")
+    if replay_dir:
+        print(f"  リプレイ: {replay_dir}（遅延{replay_latency}秒±{replay_jitter}秒）")
+    else:
+        print(f"  対象アプリ: {kindle_window_title}")
+    if adaptive_wait:
+        print(f"  待機方式: 適応ポーリング（間隔{poll_interval}秒, 上限{waitsec}秒）")
+    else:
+        print(f"  待機時間: {waitsec}秒")
     print(f"  ページ送りキー: {page_change_key}")
+    print(f"  変化検出: 領域{change_roi}, 閾値{change_threshold}")
+    if spread_mode != "off":
+        order = "右→左" if page_change_key == "left" else "左→右"
+        print(f"  見開き分割: {spread_mode}（{order}の順に保存）")
     if max_pages is not None:
         print(f"  最大ページ数: {max_pages}ページ")
     if crop_top > 0 or crop_bottom > 0 or crop_left > 0 or crop_right > 0:
         print(f"  トリミング: 上{crop_top}px, 下{crop_bottom}px, 左{crop_left}px, 右{crop_right}px")
+    print(f"  保存形式: {image_format}（グレースケール: {grayscale_mode}）")
     if output_dir:
         print(f"  保存先ベース: {output_dir}")
     if output_title:
@@ -7,13 +7,58 @@ import os
 import glob
 import argparse
 import json
+import multiprocessing
+import queue
 import re
-import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from yomitoku import DocumentAnalyzer
-from PIL import Image
-import numpy as np
 from html.parser import HTMLParser
+from capture_journal import check_journal, print_check_report
+from ocr_cache import DEFAULT_CACHE_DIR, DEFAULT_CACHE_SIZE_MB, OCRCache, cache_version
+from ocr_store import STALE_REASONS, OCRStore, store_path
+from page_classifier import PAGE_KIND_LABELS, classified_result, classify_page, format_counts, format_kind_pages
+from ocr_scaling import ocr_scale, parse_max_side, resize_for_ocr, scale_result
+from ocr_server import DEFAULT_SOCKET_PATH, OCRClient, RemoteAnalyzer
+from ocr_onnx import OCR_BACKENDS, use_onnx_backend
+from figure_assets import (
+    DEFAULT_FIGURE_MAX_KB,
+    DEFAULT_FIGURE_MAX_SIDE,
+    DEFAULT_FIGURE_QUALITY,
+    FIGURE_ASSET_DIR,
+    FIGURE_FORMATS,
+    FigureAssetStore,
+)
+from page_html import load_page_image, page_body_html, write_index_html, write_page_file, write_page_html
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+# DocumentAnalyzer の設定（結果に影響するため、OCRキャッシュのバージョンにも含める）
+ANALYZER_OPTIONS = {"reading_order": "auto", "ignore_meta": False, "split_text_across_cells": False}
+
+
+def analyzer_settings(ocr_backend="torch"):
+    """モデルの設定（OCRキャッシュ・OCRサーバーのバージョンに使う。torch なら従来どおり）"""
+    settings = dict(ANALYZER_OPTIONS)
+    if ocr_backend != "torch":
+        settings["ocr_backend"] = ocr_backend
+    return settings
+
+
+def load_analyzer(device, ocr_backend="torch", threads=None):
+    """
+    DocumentAnalyzer を読み込む
+    ocr_backend が onnx / onnx-int8 ならCPUで読み込み、テキスト検出・文字認識をONNX Runtimeに差し替える
+    （yomitoku は torch を読み込むため、OCRサーバーを使う場合に読み込まないようここで読み込む）
+    """
+    from yomitoku import DocumentAnalyzer
+
+    if ocr_backend == "torch":
+        return DocumentAnalyzer(device=device, **ANALYZER_OPTIONS)
+    model = DocumentAnalyzer(device="cpu", **ANALYZER_OPTIONS)
+    use_onnx_backend(model, ocr_backend, threads=threads)
+    return model
+
 
 class _TextExtractor(HTMLParser):
     def __init__(self):
@@ -40,18 +85,504 @@ def extract_text_from_html_file(html_path, max_chars=None):
     except Exception:
         return ""
 
-def process_kindle_captures_to_html(input_dir, output_dir=None):
+def select_device():
+    """推論デバイスを自動選択（Metal が使えれば mps, なければ cpu）"""
+    try:
+        import torch
+        if torch.backends.mps.is_available():
+            print("  デバイス: Metal (GPU) 🚀")
+            return "mps"
+    except:
+        pass
+    print("  デバイス: CPU")
+    return "cpu"
+
+
+def analyze_pages(model, batcher, images):
+    """
+    ページ画像を解析
+    batcher があればまとめて推論し、失敗した場合は1ページずつやり直す
+    model が None の場合は batcher（OCRサーバー）だけで解析する
+    Returns:
+        list: ページごとの DocumentAnalyzerSchema（OCRサーバーの場合は model_dump() の辞書。
+        失敗したページは例外オブジェクト）
+    """
+    if batcher is not None and (len(images) > 1 or model is None):
+        try:
+            return batcher(images)
+        except Exception as e:
+            if model is None:
+                return [e] * len(images)
+            print(f"  ⚠️ バッチ推論に失敗したため1ページずつ処理します: {e}")
+    results = []
+    for image_array in images:
+        try:
+            # タプルの最初の要素がDocumentAnalyzerSchemaオブジェクト
+            results.append(model(image_array)[0])
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def prepare_ocr_input(image_array, max_side):
+    """
+    OCRに渡す画像を作成（--ocr-max-side に合わせて縮小）
+    Returns:
+        (ocr_input, scale): 縮小した画像と縮小率
+    """
+    scale = ocr_scale(image_array, max_side)
+    return resize_for_ocr(image_array, scale), scale
+
+
+def result_dict(result):
+    """解析結果を model_dump() の辞書にする（OCRサーバーの結果は辞書のまま）"""
+    return result if isinstance(result, dict) else result.model_dump()
+
+
+def restore_scale(result, scale):
+    """縮小して解析した結果の座標を元の画像に戻す（辞書はその場で書き換え、DocumentAnalyzerSchema は作り直す）"""
+    if isinstance(result, Exception) or scale >= 1.0:
+        return result
+    if isinstance(result, dict):
+        return scale_result(result, 1 / scale)
+    from yomitoku.schemas import DocumentAnalyzerSchema
+
+    return DocumentAnalyzerSchema.model_validate(scale_result(result.model_dump(), 1 / scale))
+
+
+class StageTimer:
+    """
+    パイプラインの段ごとの処理時間・入力待ち時間・処理件数を集計するクラス（スレッドセーフ）
+    """
+
+    def __init__(self, name, workers=1, unit="スレッド"):
+        """
+        Args:
+            name: 表示名
+            workers: この段のスレッド（プロセス）数（稼働率の計算に使う）
+            unit: workers の単位（表示用）
+        """
+        self.name = name
+        self.workers = workers
+        self.unit = unit
+        self.busy = 0.0  # 処理していた時間(秒)
+        self.wait = 0.0  # 入力を待っていた時間(秒)
+        self.items = 0  # 処理したページ数
+        self._lock = threading.Lock()
+
+    def add(self, busy=0.0, wait=0.0, items=0):
+        """計測値を加算"""
+        with self._lock:
+            self.busy += busy
+            self.wait += wait
+            self.items += items
+
+    def describe(self, wall_time):
+        """1行表示用の文字列"""
+        utilization = self.busy / max(wall_time * self.workers, 1e-9) * 100
+        workers = f"（{self.workers}{self.unit}）" if self.workers > 1 else ""
+        return (f"{self.name}{workers}: 処理 {self.busy:.1f}s / 入力待ち {self.wait:.1f}s / "
+                f"稼働率 {utilization:.0f}% / {self.items}ページ")
+
+
+def _put(q, item, stop):
+    """上限付きキューに入れる（停止が指示されたら諦める）"""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def run_ocr_pipeline(targets, total, model, batcher, output_path,
+                     batch_size=1, decode_workers=2, prefetch=4, cache=None, store=None, assets=None,
+                     ocr_max_side=None, classify=False, log=print):
+    """
+    デコード → OCR → HTML書き込みを上限付きキューでつないだパイプラインで処理
+    画像のデコードはスレッドプールで先読みし、HTMLの書き込みは別スレッドで行うため、
+    モデルは入出力を待たずに続けて推論できる
+    Args:
+        targets: (通し番号, 画像ファイル) のリスト
+        total: 全ページ数（表示用）
+        model: DocumentAnalyzer
+        batcher: BatchDocumentAnalyzer（batch_size が1ならNone）
+        output_path: HTMLの出力ディレクトリ
+        batch_size: まとめてOCRするページ数
+        decode_workers: デコードのスレッド数
+        prefetch: 先読みする（書き込み待ちにできる）ページ数の上限
+        cache: OCRCache（省略時はキャッシュを使わない）
+        store: 解析結果を保存する OCRStore（省略時は保存しない）
+        assets: 図を保存する FigureAssetStore
+        ocr_max_side: OCRに渡す画像の長辺の上限（parse_max_side の値）
+        classify: Trueなら空白・画像だけのページをOCRせずに出力
+        log: 進行状況を1行ずつ受け取る関数（書き込みのスレッドからも呼ぶ）
+    Returns:
+        (stages, wall_time): 段ごとの StageTimer のリストと経過時間(秒)
+    """
+    decode_stage = StageTimer("デコード", decode_workers)
+    ocr_stage = StageTimer("OCR")
+    write_stage = StageTimer("HTML書き込み")
+    queue_size = max(prefetch, batch_size)
+    decode_queue = queue.Queue(maxsize=queue_size)
+    write_queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+
+    def decode(image_file):
+        # ページの分類・キャッシュの照合・縮小もデコードと同じスレッドで行い、OCRの段を空けておく
+        t = time.perf_counter()
+        try:
+            image_array = load_page_image(image_file)
+            if classify:
+                kind, stats = classify_page(image_array)
+                if kind != "ocr":
+                    return image_array, None, 1.0, None, classified_result(kind, stats), kind
+            key, cached = None, None
+            if cache is not None:
+                key = cache.key(image_array)
+                data = cache.get(key)
+                if data is not None:
+                    return image_array, None, 1.0, key, data, "ocr"
+            ocr_input, scale = prepare_ocr_input(image_array, ocr_max_side)
+            return image_array, ocr_input, scale, key, cached, "ocr"
+        finally:
+            decode_stage.add(busy=time.perf_counter() - t, items=1)
+
+    def feed(executor):
+        # キューが満杯になるまでデコードを予約（先読み）
+        for idx, image_file in targets:
+            if not _put(decode_queue, (idx, image_file, executor.submit(decode, image_file)), stop):
+                return
+        _put(decode_queue, None, stop)
+
+    def write():
+        while True:
+            t = time.perf_counter()
+            item = write_queue.get()
+            write_stage.add(wait=time.perf_counter() - t)
+            if item is None:
+                return
+            image_file, image_array, result, kind = item
+            t = time.perf_counter()
+            if isinstance(result, Exception):
+                log(f"  ✗ エラー（{image_file.name}）: {result}")
+            else:
+                try:
+                    data = result_dict(result)
+                    output_file = write_page_html(data, image_array, image_file, output_path, assets)
+                    if store is not None:
+                        store.put(image_file, image_array.shape, data, output_file, kind)
+                    log(f"  ✓ 保存完了: {output_file.name}")
+                except Exception as e:
+                    log(f"  ✗ エラー（{image_file.name}）: {e}")
+            write_stage.add(busy=time.perf_counter() - t, items=1)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, decode_workers)) as executor:
+        feeder = threading.Thread(target=feed, args=(executor,), name="ocr-decode-feeder", daemon=True)
+        writer = threading.Thread(target=write, name="ocr-html-writer", daemon=True)
+        feeder.start()
+        writer.start()
+        try:
+            done = False
+            while not done:
+                # batch_size ページ分のデコード結果を受け取る
+                batch = []
+                while len(batch) < batch_size:
+                    t = time.perf_counter()
+                    item = decode_queue.get()
+                    if item is None:
+                        done = True
+                        break
+                    idx, image_file, future = item
+                    try:
+                        image_array, ocr_input, scale, key, cached, kind = future.result()
+                    except Exception as e:
+                        log(f"  ✗ エラー（{image_file.name}）: {e}")
+                        continue
+                    finally:
+                        ocr_stage.add(wait=time.perf_counter() - t)
+                    if cached is not None:
+                        # キャッシュにあるページ・空白や画像だけのページはOCRせずに書き込みへ
+                        if kind == "ocr":
+                            log(f"[{idx}/{total}] キャッシュ使用: {image_file.name}")
+                        else:
+                            log(f"[{idx}/{total}] {PAGE_KIND_LABELS[kind]}のページ（OCR省略）: {image_file.name}")
+                        write_queue.put((image_file, image_array, cached, kind))
+                        continue
+                    log(f"[{idx}/{total}] 処理中: {image_file.name}")
+                    batch.append((image_file, image_array, ocr_input, scale, key))
+                if not batch:
+                    continue
+
+                # 画像を解析
+                t = time.perf_counter()
+                results = analyze_pages(model, batcher, [item[2] for item in batch])
+                results = [restore_scale(result, item[3]) for item, result in zip(batch, results)]
+                ocr_stage.add(busy=time.perf_counter() - t, items=len(batch))
+
+                for (image_file, image_array, _, _, key), result in zip(batch, results):
+                    if cache is not None and not isinstance(result, Exception):
+                        cache.put(key, result_dict(result))
+                    write_queue.put((image_file, image_array, result, "ocr"))
+        finally:
+            # 中断時も書き込み待ちのページは保存してから戻る
+            stop.set()
+            write_queue.put(None)
+            writer.join()
+            feeder.join()
+    return [decode_stage, ocr_stage, write_stage], time.perf_counter() - start
+
+
+# ワーカープロセスごとのモデル（_init_ocr_worker で作成）
+_worker_model = None
+_worker_batcher = None
+_worker_cache = None
+_worker_max_side = None
+_worker_classify = False
+_worker_assets = None
+
+
+def _init_ocr_worker(torch_threads, batch_size, cache_dir=None, cache_version=None, ocr_max_side=None,
+                     classify=False, ocr_backend="torch", asset_args=None):
+    """ワーカープロセスの初期化（torchのスレッド数を固定してからモデルを読み込む）"""
+    global _worker_model, _worker_batcher, _worker_cache, _worker_max_side, _worker_classify, _worker_assets
+    _worker_max_side = ocr_max_side
+    _worker_classify = classify
+    # 図はワーカーが切り出して同じフォルダに保存する（内容のハッシュが名前なので重複しても同じファイル）
+    _worker_assets = FigureAssetStore(*asset_args)
+    if cache_dir is not None:
+        # キャッシュの削除（容量の管理）はメインプロセスだけが行う
+        _worker_cache = OCRCache(cache_dir, max_bytes=None, version=cache_version)
+    import torch
+    torch.set_num_threads(torch_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+    _worker_model = load_analyzer("cpu", ocr_backend, threads=torch_threads)
+    if batch_size > 1:
+        from ocr_batch import BatchDocumentAnalyzer
+        _worker_batcher = BatchDocumentAnalyzer(_worker_model, batch_size=batch_size)
+
+
+def _ocr_worker_task(image_paths):
+    """
+    ワーカープロセスで画像を読み込んでOCRし、HTMLの本文まで作成
+    （画像を読み込むのはワーカーだけで、メインプロセスは本文をファイルに書き込むだけにする）
+    Returns:
+        (outputs, kinds, pages, decode_time, ocr_time, cache_stats, asset_stats):
+        outputs はページごとの model_dump() の辞書（失敗したページは {"error": メッセージ}）、
+        kinds はページの分類、pages はページごとの (画像の形, HTMLの本文)、
+        decode_time は画像の読み込みと図の切り出しの時間、
+        cache_stats はキャッシュの (ヒット, ミス, 保存) 件数、
+        asset_stats は図の (保存, 再利用, 切り出した画素のバイト数, 書き込んだバイト数)
+    """
+    t = time.perf_counter()
+    outputs = [None] * len(image_paths)
+    kinds = ["ocr"] * len(image_paths)
+    arrays = [None] * len(image_paths)
+    pages = [None] * len(image_paths)
+    images = []
+    scales = []
+    keys = []
+    positions = []
+    for i, path in enumerate(image_paths):
+        try:
+            image_array = load_page_image(path)
+        except Exception as e:
+            outputs[i] = {"error": str(e)}
+            continue
+        arrays[i] = image_array
+        if _worker_classify:
+            kind, stats = classify_page(image_array)
+            if kind != "ocr":
+                outputs[i] = classified_result(kind, stats)
+                kinds[i] = kind
+                continue
+        key = None
+        if _worker_cache is not None:
+            key = _worker_cache.key(image_array)
+            outputs[i] = _worker_cache.get(key)
+            if outputs[i] is not None:
+                continue
+        ocr_input, scale = prepare_ocr_input(image_array, _worker_max_side)
+        images.append(ocr_input)
+        scales.append(scale)
+        keys.append(key)
+        positions.append(i)
+    decode_time = time.perf_counter() - t
+
+    t = time.perf_counter()
+    results = analyze_pages(_worker_model, _worker_batcher, images) if images else []
+    for i, scale, key, result in zip(positions, scales, keys, results):
+        if isinstance(result, Exception):
+            outputs[i] = {"error": str(result)}
+            continue
+        outputs[i] = result_dict(result)
+        if scale < 1.0:
+            scale_result(outputs[i], 1 / scale)
+        if _worker_cache is not None:
+            _worker_cache.put(key, outputs[i])
+    ocr_time = time.perf_counter() - t
+
+    t = time.perf_counter()
+    for i, output in enumerate(outputs):
+        if "error" in output:
+            continue
+        try:
+            pages[i] = (arrays[i].shape, page_body_html(output, arrays[i], _worker_assets))
+        except Exception as e:
+            outputs[i] = {"error": str(e)}
+    decode_time += time.perf_counter() - t
+
+    cache_stats = (0, 0, 0)
+    if _worker_cache is not None:
+        cache_stats = (_worker_cache.hits, _worker_cache.misses, _worker_cache.stores)
+        _worker_cache.hits = _worker_cache.misses = _worker_cache.stores = 0
+    assets = _worker_assets
+    asset_stats = (assets.saved, assets.reused, assets.raw_bytes, assets.saved_bytes)
+    assets.saved = assets.reused = assets.raw_bytes = assets.saved_bytes = 0
+    return outputs, kinds, pages, decode_time, ocr_time, cache_stats, asset_stats
+
+
+def default_torch_threads(workers):
+    """ワーカー数からプロセスごとのtorchのスレッド数を決める（コア数を等分）"""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def run_ocr_workers(targets, total, output_path, workers, torch_threads=None, batch_size=1,
+                    cache=None, store=None, assets=None, ocr_max_side=None, classify=False,
+                    ocr_backend="torch", log=print):
+    """
+    複数のプロセスでOCRを行う（CPU用）
+    各プロセスが自分のモデルを持ち、空いたプロセスから次のページを受け取る。
+    画像の読み込みと図の切り出しもワーカーで行い、メインプロセスは
+    ページ順に受け取ったHTMLの本文を書き込むだけにする（画像を2回デコードしない）
+    Args:
+        targets: (通し番号, 画像ファイル) のリスト
+        total: 全ページ数（表示用）
+        output_path: HTMLの出力ディレクトリ
+        workers: プロセス数
+        torch_threads: プロセスごとのtorchのスレッド数（省略時はコア数を等分）
+        batch_size: 1回の受け渡しでまとめてOCRするページ数
+        cache: OCRCache（ワーカーは同じフォルダを読み書きし、統計と削除はこのオブジェクトで行う）
+        store: 解析結果を保存する OCRStore（省略時は保存しない）
+        assets: 図を保存する FigureAssetStore
+        ocr_max_side: OCRに渡す画像の長辺の上限（parse_max_side の値）
+        classify: Trueなら空白・画像だけのページをOCRせずに出力
+        ocr_backend: 推論のバックエンド（torch, onnx, onnx-int8）
+        log: 進行状況を1行ずつ受け取る関数
+    Returns:
+        (stages, wall_time): 段ごとの StageTimer のリストと経過時間(秒)
+    """
+    torch_threads = torch_threads or default_torch_threads(workers)
+    cores = os.cpu_count() or 1
+    log(f"  ワーカー: {workers}プロセス × torch {torch_threads}スレッド（CPUコア数: {cores}）")
+    if workers * torch_threads > cores:
+        log(f"  ⚠️ 警告: スレッド数の合計（{workers * torch_threads}）がCPUコア数（{cores}）を超えています。"
+            f"--workers か --torch-threads を減らしてください。")
+
+    decode_stage = StageTimer("デコード", workers, unit="プロセス")
+    ocr_stage = StageTimer("OCR", workers, unit="プロセス")
+    write_stage = StageTimer("HTML書き込み")
+    chunks = [targets[i:i + batch_size] for i in range(0, len(targets), batch_size)]
+    tasks = [[str(image_file) for _, image_file in chunk] for chunk in chunks]
+
+    start = time.perf_counter()
+    # torchはfork後のスレッドと相性が悪いため、macOSと同じくspawnでプロセスを作成
+    ctx = multiprocessing.get_context("spawn")
+    cache_args = (cache.cache_dir, cache.version) if cache is not None else (None, None)
+    if assets is None:
+        assets = FigureAssetStore(output_path / FIGURE_ASSET_DIR)
+    asset_args = (assets.asset_dir, assets.image_format, assets.max_side, assets.quality, assets.max_bytes // 1024)
+    with ctx.Pool(workers, initializer=_init_ocr_worker,
+                  initargs=(torch_threads, batch_size) + cache_args
+                  + (ocr_max_side, classify, ocr_backend, asset_args)) as pool:
+        # imap は空いたプロセスに順に割り当て、結果は投入した順に返す
+        for chunk, (outputs, kinds, pages, decode_time, ocr_time, cache_stats, asset_stats) in zip(
+                chunks, pool.imap(_ocr_worker_task, tasks)):
+            if cache is not None:
+                cache.hits += cache_stats[0]
+                cache.misses += cache_stats[1]
+                cache.stores += cache_stats[2]
+            assets.saved += asset_stats[0]
+            assets.reused += asset_stats[1]
+            assets.raw_bytes += asset_stats[2]
+            assets.saved_bytes += asset_stats[3]
+            decode_stage.add(busy=decode_time, items=len(chunk))
+            ocr_stage.add(busy=ocr_time, items=len(chunk))
+            t = time.perf_counter()
+            for (idx, image_file), output, kind, page in zip(chunk, outputs, kinds, pages):
+                if kind == "ocr":
+                    log(f"[{idx}/{total}] OCR完了: {image_file.name}")
+                else:
+                    log(f"[{idx}/{total}] {PAGE_KIND_LABELS[kind]}のページ（OCR省略）: {image_file.name}")
+                if "error" in output:
+                    log(f"  ✗ エラー（{image_file.name}）: {output['error']}")
+                    continue
+                try:
+                    shape, body_content = page
+                    output_file = write_page_file(body_content, image_file, output_path)
+                    if store is not None:
+                        store.put(image_file, shape, output, output_file, kind)
+                    log(f"  ✓ 保存完了: {output_file.name}")
+                except Exception as e:
+                    log(f"  ✗ エラー（{image_file.name}）: {e}")
+            write_stage.add(busy=time.perf_counter() - t, items=len(chunk))
+    if cache is not None:
+        cache.evict()
+    return [decode_stage, ocr_stage, write_stage], time.perf_counter() - start
+
+
+def print_pipeline_stats(stages, wall_time, log=print):
+    """パイプラインの段ごとの稼働率を表示"""
+    log(f"\n📊 パイプラインの稼働率（経過 {wall_time:.1f}s）")
+    for stage in stages:
+        log(f"  {stage.describe(wall_time)}")
+    ocr_stage = stages[1]
+    if ocr_stage.items:
+        log(f"  OCR: {ocr_stage.items / max(ocr_stage.busy / ocr_stage.workers, 1e-9):.2f} ページ/秒（推論時間あたり）, "
+            f"{ocr_stage.items / max(wall_time, 1e-9):.2f} ページ/秒（経過時間あたり）")
+
+
+def process_kindle_captures_to_html(input_dir, output_dir=None, batch_size=1,
+                                    decode_workers=2, prefetch=4, workers=1, torch_threads=None,
+                                    cache_dir=DEFAULT_CACHE_DIR, cache_size_mb=DEFAULT_CACHE_SIZE_MB,
+                                    figure_format="auto", figure_max_side=DEFAULT_FIGURE_MAX_SIDE,
+                                    figure_quality=DEFAULT_FIGURE_QUALITY, figure_max_kb=DEFAULT_FIGURE_MAX_KB,
+                                    ocr_max_side=None, classify=False, ocr_server=DEFAULT_SOCKET_PATH,
+                                    model=None, batcher=None, ocr_backend="torch", log=print):
     """
     Kindleキャプチャ画像を1ページごとのHTMLファイルに変換
     
     Args:
         input_dir: 入力画像のディレクトリ
         output_dir: 出力ディレクトリ（指定なしの場合は input_dir/html を使用）
+        batch_size: まとめてOCRするページ数（1なら1ページずつ）
+        decode_workers: 画像デコード（先読み）のスレッド数
+        prefetch: 先読みするページ数の上限
+        workers: OCRのプロセス数（2以上ならCPUで並列に処理）
+        torch_threads: プロセスごとのtorchのスレッド数（省略時はコア数を等分）
+        cache_dir: OCRキャッシュのフォルダ（Noneならキャッシュを使わない）
+        cache_size_mb: OCRキャッシュのディスク使用量の上限（MB）
+        figure_format: 図の保存形式（auto, png, jpeg, webp）
+        figure_max_side: 図の長辺の上限（ピクセル）
+        figure_quality: 図を非可逆で保存するときの画質
+        figure_max_kb: 図1つのファイルサイズの上限（KB）
+        ocr_max_side: OCRに渡す画像の長辺の上限（ピクセル）、"auto"（文字の大きさから決める）、Noneなら縮小しない
+        classify: Trueなら事前の分類で空白・画像だけと判定したページをOCRしない
+        ocr_server: OCRサーバーのソケットのパス。起動していればモデルを読み込まずにサーバーでOCRする（Noneなら使わない）
+        model: 読み込み済みの DocumentAnalyzer（OCRサーバーから呼ぶ場合）
+        batcher: model と一緒に使う BatchDocumentAnalyzer
+        ocr_backend: 推論のバックエンド（torch, onnx, onnx-int8）。onnx ではテキスト検出・文字認識をONNX RuntimeでCPU推論
+        log: 進行状況を1行ずつ受け取る関数（OCRサーバーはクライアントへ送る関数を渡す。標準出力は書き換えない）
     """
     input_path = Path(input_dir)
     
     if not input_path.exists():
-        print(f"エラー: 入力ディレクトリが存在しません: {input_dir}")
+        log(f"エラー: 入力ディレクトリが存在しません: {input_dir}")
         return
     
     # 出力ディレクトリの設定
@@ -62,162 +593,148 @@ def process_kindle_captures_to_html(input_dir, output_dir=None):
     
     output_path.mkdir(parents=True, exist_ok=True)
     
-    # 画像ファイルを取得（*.png, *.jpg, *.jpeg）
+    # 画像ファイルを取得（*.png, *.jpg, *.jpeg, *.webp）
     # input_dir/images フォルダが存在する場合はそこから取得、なければ input_dir (後方互換)
     images_dir = input_path / "images"
     if not images_dir.exists():
         images_dir = input_path
 
-    image_files = []
-    for ext in ['*.png', '*.jpg', '*.jpeg']:
-        image_files.extend(sorted(images_dir.glob(ext)))
+    image_files = sorted(
+        f for f in images_dir.iterdir()
+        if f.suffix.lower() in IMAGE_EXTENSIONS and not f.name.startswith(".")
+    )
     
     if not image_files:
-        print(f"エラー: 画像ファイルが見つかりません: {images_dir}")
+        log(f"エラー: 画像ファイルが見つかりません: {images_dir}")
         return
     
-    print("=" * 60)
-    print(f"📚 Kindleキャプチャ → HTML変換")
-    print("=" * 60)
-    print(f"入力ディレクトリ: {images_dir}")
-    print(f"出力ディレクトリ: {output_path}")
-    print(f"処理対象ファイル数: {len(image_files)}ファイル")
-    print()
+    log("=" * 60)
+    log(f"📚 Kindleキャプチャ → HTML変換")
+    log("=" * 60)
+    log(f"入力ディレクトリ: {images_dir}")
+    log(f"出力ディレクトリ: {output_path}")
+    log(f"処理対象ファイル数: {len(image_files)}ファイル")
+    # キャプチャジャーナルがあれば、画像をデコードせずに欠番・重複をチェック
+    if images_dir != input_path:
+        print_check_report(check_journal(str(input_path)), log)
+    log("")
     
-    # YomiTokuの初期化（Metal/MPS対応）
-    print("YomiTokuを初期化しています...")
+    # 解析結果は本のフォルダにまとめて保存（ocr_store.py render でOCRせずに再出力できる）
+    # 縮小の設定も結果に影響するため、キャッシュ・ページの記録のバージョンに含める（縮小しない場合は従来どおり）
+    # ONNX Runtime の推論は結果がわずかに異なるため、バックエンドもバージョンに含める
+    settings = analyzer_settings(ocr_backend)
+    if ocr_backend != "torch":
+        log(f"OCRバックエンド: {ocr_backend}（テキスト検出・文字認識を ONNX Runtime で推論）\n")
+    if ocr_max_side is not None:
+        settings["ocr_max_side"] = ocr_max_side
+        log(f"OCR入力の縮小: 長辺 {ocr_max_side}{'' if ocr_max_side == 'auto' else 'px'} まで\n")
+    version = cache_version(settings)
+    # 分類はOCRするページの結果を変えないため、キャッシュではなくページの記録のバージョンにだけ含める
+    store_version = cache_version({**settings, "page_classifier": True}) if classify else version
+    store = OCRStore(store_path(input_path), version=store_version)
+
     try:
-        # デバイスを自動選択（Metal が使えれば mps, なければ cpu）
-        import torch
-        if torch.backends.mps.is_available():
-            device = "mps"
-            print("  デバイス: Metal (GPU) 🚀")
-        else:
-            device = "cpu"
-            print("  デバイス: CPU")
-    except:
-        device = "cpu"
-        print("  デバイス: CPU")
-    
-    model = DocumentAnalyzer(device=device)
-    print("✓ YomiToku準備完了\n")
-    
-    # リラン時処理：既存のHTMLから再開位置を特定
-    # 最後に処理されたと思われるHTMLファイル（ファイル名順）を探す
-    resume_target_stem = None
-    existing_htmls = sorted([
-        f for f in output_path.glob("*.html") 
-        if "index.html" not in f.name and "temp" not in f.name
-    ])
-    
-    if existing_htmls:
-        last_html = existing_htmls[-1]
-        resume_target_stem = last_html.stem
-        print(f"🔄 既存の進行状況を検出: 最後のファイルは {last_html.name}")
-        print(f"👉 {last_html.name} に対応する画像から処理を再開・再生成します。")
-        print(f"   (それ以前のファイルはスキップされます)")
-        print()
-
-    # 各画像を処理
-    for idx, image_file in enumerate(image_files, 1):
-        # スキップ判定
-        if resume_target_stem:
-            # 現在の画像ファイル名(拡張子なし)が、最後に処理したファイルより辞書順で小さい場合はスキップ
-            if image_file.stem < resume_target_stem:
-                continue
-        
-        print(f"[{idx}/{len(image_files)}] 処理中: {image_file.name}")
-        
-        try:
-            # 画像を読み込んでnumpy配列に変換
-            image = Image.open(image_file)
-            image_array = np.array(image)
-            
-            # 画像を解析（タプルの最初の要素がDocumentAnalyzerSchemaオブジェクト）
-            result_tuple = model(image_array)
-            result = result_tuple[0]
-            
-            # 一時ファイルにHTMLを出力
-            temp_file = output_path / f"{image_file.stem}_temp.html"
-            result.to_html(out_path=str(temp_file), img=image_array)
-            
-            # 一時ファイルを読み込んで、完全なHTMLとして再保存
-            with open(temp_file, 'r', encoding='utf-8') as f:
-                body_content = f.read()
-            
-            # 最終的なHTMLファイルを生成
-            output_file = output_path / f"{image_file.stem}.html"
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write('<!DOCTYPE html>\n')
-                f.write('<html lang="ja">\n')
-                f.write('<head>\n')
-                f.write('  <meta charset="UTF-8">\n')
-                f.write('  <meta name="viewport" content="width=device-width, initial-scale=1.0">\n')
-                f.write(f'  <title>Kindle - {image_file.stem}</title>\n')
-                f.write('  <script src="https://cdn.tailwindcss.com"></script>\n')
-                f.write('  <style>\n')
-                f.write('    body { font-family: "Hiragino Sans", "Yu Gothic", "Meiryo", sans-serif; }\n')
-                f.write('  </style>\n')
-                f.write('</head>\n')
-                f.write('<body class="bg-gradient-to-br from-slate-50 to-slate-100 min-h-screen py-8">\n')
-                f.write('  <div class="max-w-4xl mx-auto px-4">\n')
-                f.write('    <div class="bg-white rounded-xl shadow-lg p-8 mb-4">\n')
-                f.write('      <div class="prose prose-slate max-w-none">\n')
-                # body_contentのdivタグを処理してTailwindクラスを追加
-                styled_content = body_content.replace('<div>', '', 1).replace('</div>', '', 1)
-                styled_content = styled_content.replace('<h1>', '<h1 class="text-2xl font-bold text-slate-800 mt-8 mb-4 pb-2 border-b-2 border-blue-500">')
-                styled_content = styled_content.replace('<p>', '<p class="text-slate-700 leading-relaxed mb-3">')
-                styled_content = styled_content.replace('<table', '<div class="overflow-x-auto my-6"><table class="min-w-full border border-slate-300 rounded-lg overflow-hidden"')
-                styled_content = styled_content.replace('</table>', '</table></div>')
-                styled_content = styled_content.replace('<td', '<td class="border border-slate-300 px-4 py-3 text-sm"')
-                styled_content = styled_content.replace('<th', '<th class="border border-slate-300 px-4 py-3 text-sm font-semibold bg-slate-100"')
-                styled_content = styled_content.replace('<img ', '<img class="rounded-lg shadow-md my-4 mx-auto" ')
-                f.write(styled_content)
-                f.write('      </div>\n')
-                f.write('    </div>\n')
-                f.write('  </div>\n')
-                f.write('</body>\n')
-                f.write('</html>\n')
-            
-            # 一時ファイルを削除
+        # 中断時に残った一時ファイルを削除（*_temp.html は以前のバージョンのもの）
+        for temp_file in [*output_path.glob("*_temp.html"), *output_path.glob("*.html.tmp")]:
             temp_file.unlink()
-            
-            print(f"  ✓ 保存完了: {output_file.name}")
-            
-        except Exception as e:
-            print(f"  ✗ エラー: {e}")
-            
+
+        # リラン時処理：ページごとの記録（元画像・バージョン・HTMLのハッシュ）と比べて、
+        # 変わったページだけを処理する
+        removed = store.remove_missing(image_files)
+        for stem in removed:
+            # 元画像が無くなったページのHTMLも step3 に渡らないよう削除
+            (output_path / f"{stem}.html").unlink(missing_ok=True)
+        stale = store.stale_pages(image_files, output_path)
+        targets = [(idx, image_file) for idx, image_file in enumerate(image_files, 1) if image_file in stale]
+        if len(targets) < len(image_files) or removed:
+            reasons = {}
+            for reason in stale.values():
+                reasons[reason] = reasons.get(reason, 0) + 1
+            detail = ", ".join(f"{STALE_REASONS[k]} {v}" for k, v in reasons.items())
+            log(f"🔄 既存の進行状況を検出: {len(image_files) - len(targets)}ページは最新のためスキップします")
+            if targets:
+                log(f"👉 再処理するページ: {len(targets)}ページ（{detail}）")
+            if removed:
+                log(f"   画像が無くなったページのHTMLと記録を削除: {len(removed)}ページ")
+            log("")
+
+        # OCRサーバーが起動していて、同じ設定でモデルを読み込んでいればサーバーでOCRする
+        client = None
+        if targets and workers <= 1 and model is None and ocr_server:
+            client = OCRClient.connect(ocr_server)
+            if client is not None:
+                server_version = client.status()["version"]
+                if server_version == cache_version(analyzer_settings(ocr_backend)):
+                    batcher = RemoteAnalyzer(client)
+                    log(f"🛰️  OCRサーバーを使用します: {ocr_server}\n")
+                else:
+                    log(f"⚠️ OCRサーバーのモデル・設定が異なるため使用しません: {ocr_server}")
+                    client.close()
+                    client = None
+
+        # YomiTokuの初期化（Metal/MPS対応）
+        # 複数プロセスの場合はワーカーごとにCPUでモデルを読み込む。処理するページが無ければ読み込まない
+        if targets and workers <= 1 and model is None and client is None:
+            log("YomiTokuを初期化しています...")
+            if ocr_backend == "torch":
+                device = select_device()
+            else:
+                device = "cpu"
+                log(f"  デバイス: CPU（ONNX Runtime, {ocr_backend}）")
+
+            model = load_analyzer(device, ocr_backend)
+            if batch_size > 1:
+                from ocr_batch import BatchDocumentAnalyzer
+                batcher = BatchDocumentAnalyzer(model, batch_size=batch_size)
+                log(f"  バッチサイズ: {batch_size}ページ")
+            log("✓ YomiToku準備完了\n")
+
+        # 同じ画素のページはOCR結果のキャッシュを使う
+        cache = None
+        if cache_dir is not None:
+            cache = OCRCache(cache_dir, max_bytes=cache_size_mb * 1024 * 1024,
+                             version=version)
+
+        # 図は内容のハッシュで output_path/assets に1回だけ保存し、全ページから参照する
+        assets = FigureAssetStore(output_path / FIGURE_ASSET_DIR, figure_format,
+                                  max_side=figure_max_side, quality=figure_quality, max_kb=figure_max_kb)
+
+        # 各画像を処理（デコード・OCR・HTML書き込みを並行して実行）
+        if targets and workers > 1:
+            stages, wall_time = run_ocr_workers(
+                targets, len(image_files), output_path, workers,
+                torch_threads=torch_threads, batch_size=batch_size, cache=cache, store=store,
+                assets=assets, ocr_max_side=ocr_max_side, classify=classify, ocr_backend=ocr_backend, log=log,
+            )
+            print_pipeline_stats(stages, wall_time, log)
+        elif targets:
+            stages, wall_time = run_ocr_pipeline(
+                targets, len(image_files), model, batcher, output_path,
+                batch_size=batch_size, decode_workers=decode_workers, prefetch=prefetch,
+                cache=cache, store=store, assets=assets, ocr_max_side=ocr_max_side,
+                classify=classify, log=log,
+            )
+            print_pipeline_stats(stages, wall_time, log)
+        if classify:
+            log(f"\n📄 ページの分類（全ページ）: {format_counts(store.kind_counts())}")
+            for line in format_kind_pages(store.kind_pages()):
+                log(f"  {line}")
+    finally:
+        store.close()
+        if client is not None:
+            client.close()
+    if targets and cache is not None:
+        cache.print_stats(log)
+    if targets:
+        assets.print_stats(log)
+
     # index.htmlを生成
-    html_files = sorted([f.name for f in output_path.glob("*.html") if "temp" not in f.name and f.name != "index.html"])
-
-    if html_files:
-        index_file = output_path / "index.html"
-        template_src = Path(__file__).parent / "templates" / "index_template.html"
-        template_dst = output_path / "index.template.html"
-        server_src = Path(__file__).parent / "templates" / "server_template.py"
-        server_dst = output_path / "server.py"
-        print(f"\n📑 index.htmlを生成しています...")
-
-        if not template_src.exists():
-            print(f"  ✗ テンプレートが見つかりません: {template_src}")
-        else:
-            shutil.copyfile(template_src, template_dst)
-            template = template_dst.read_text(encoding="utf-8")
-            rendered = template.replace("__TOTAL_PAGES__", str(len(html_files)))
-            index_file.write_text(rendered, encoding="utf-8")
-            print(f"  ✓ index.html生成完了: {index_file}")
-            print(f"  ✓ テンプレート配置: {template_dst}")
-
-        if not server_src.exists():
-            print(f"  ✗ サーバーテンプレートが見つかりません: {server_src}")
-        else:
-            shutil.copyfile(server_src, server_dst)
-            print(f"  ✓ server.py配置: {server_dst}")
-    
-    print("\n" + "=" * 60)
-    print(f"✅ 変換完了: {len(image_files)}ファイル")
-    print(f"📁 出力先: {output_path}")
-    print("=" * 60)
+    write_index_html(output_path, log)
+
+    log("\n" + "=" * 60)
+    log(f"✅ 変換完了: {len(image_files)}ファイル")
+    log(f"📁 出力先: {output_path}")
+    log("=" * 60)
 
 
 if __name__ == "__main__":
@@ -233,8 +750,130 @@ if __name__ == "__main__":
         help="出力ディレクトリ（省略時は input_dir/html）",
         default=None,
     )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="まとめてOCRするページ数（デフォルト: 1）",
+    )
+    parser.add_argument(
+        "--decode-workers",
+        type=int,
+        default=2,
+        help="画像デコード（先読み）のスレッド数（デフォルト: 2）",
+    )
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=4,
+        help="先読み・書き込み待ちにできるページ数の上限（デフォルト: 4）",
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="OCRのプロセス数。2以上ならプロセスごとにモデルを読み込みCPUで並列処理（デフォルト: 1）",
+    )
+    parser.add_argument(
+        "--torch-threads",
+        type=int,
+        default=None,
+        help="--workers 使用時のプロセスごとのtorchのスレッド数（省略時はCPUコア数を等分）",
+    )
+
+    parser.add_argument(
+        "--ocr-cache",
+        default=DEFAULT_CACHE_DIR,
+        help=f"OCR結果のキャッシュフォルダ（デフォルト: {DEFAULT_CACHE_DIR}）",
+    )
+    parser.add_argument(
+        "--ocr-cache-size",
+        type=int,
+        default=DEFAULT_CACHE_SIZE_MB,
+        help=f"OCRキャッシュのディスク使用量の上限（MB）。超えると古いものから削除（デフォルト: {DEFAULT_CACHE_SIZE_MB}）",
+    )
+    parser.add_argument(
+        "--no-ocr-cache",
+        action="store_true",
+        help="OCR結果のキャッシュを使わない",
+    )
+
+    parser.add_argument(
+        "--ocr-max-side",
+        type=parse_max_side,
+        default=None,
+        help="OCRに渡す画像の長辺の上限（ピクセル）。auto なら文字の大きさから認識精度を保てる大きさに縮小（デフォルト: 縮小しない）",
+    )
+
+    parser.add_argument(
+        "--page-classifier",
+        action="store_true",
+        help="OCR前にページを分類し、空白・画像だけと判定したページをOCRしない（デフォルト: すべてのページをOCR）",
+    )
+
+    parser.add_argument(
+        "--ocr-backend",
+        choices=OCR_BACKENDS,
+        default="torch",
+        help="推論のバックエンド。onnx / onnx-int8 はテキスト検出・文字認識を ONNX Runtime でCPU推論（デフォルト: torch）",
+    )
+
+    parser.add_argument(
+        "--ocr-server",
+        default=DEFAULT_SOCKET_PATH,
+        help=f"OCRサーバー（ocr_server.py）のソケットのパス。起動していればモデルを読み込まずに使う（デフォルト: {DEFAULT_SOCKET_PATH}）",
+    )
+    parser.add_argument(
+        "--no-ocr-server",
+        action="store_true",
+        help="OCRサーバーが起動していても使わず、このプロセスでモデルを読み込む",
+    )
+
+    parser.add_argument(
+        "--figure-format",
+        choices=FIGURE_FORMATS,
+        default="auto",
+        help="図の保存形式。auto は色数の少ない図をPNG、写真のような図をJPEGで保存（デフォルト: auto）",
+    )
+    parser.add_argument(
+        "--figure-max-side",
+        type=int,
+        default=DEFAULT_FIGURE_MAX_SIDE,
+        help=f"図の長辺の上限（ピクセル）。超える図は縮小（デフォルト: {DEFAULT_FIGURE_MAX_SIDE}）",
+    )
+    parser.add_argument(
+        "--figure-quality",
+        type=int,
+        default=DEFAULT_FIGURE_QUALITY,
+        help=f"図をJPEG・WebPで保存するときの画質（デフォルト: {DEFAULT_FIGURE_QUALITY}）",
+    )
+    parser.add_argument(
+        "--figure-max-kb",
+        type=int,
+        default=DEFAULT_FIGURE_MAX_KB,
+        help=f"図1つのファイルサイズの上限（KB）。超える場合は画質を下げる。0で上限なし（デフォルト: {DEFAULT_FIGURE_MAX_KB}）",
+    )
 
     args = parser.parse_args()
 
     # 実行
-    process_kindle_captures_to_html(args.input_dir, args.output_dir)
+    process_kindle_captures_to_html(
+        args.input_dir,
+        args.output_dir,
+        batch_size=max(1, args.batch_size),
+        decode_workers=max(1, args.decode_workers),
+        prefetch=max(1, args.prefetch),
+        workers=max(1, args.workers),
+        torch_threads=args.torch_threads,
+        cache_dir=None if args.no_ocr_cache else args.ocr_cache,
+        cache_size_mb=args.ocr_cache_size,
+        figure_format=args.figure_format,
+        figure_max_side=max(1, args.figure_max_side),
+        figure_quality=args.figure_quality,
+        figure_max_kb=max(0, args.figure_max_kb),
+        ocr_max_side=args.ocr_max_side,
+        classify=args.page_classifier,
+        ocr_server=None if args.no_ocr_server else args.ocr_server,
+        ocr_backend=args.ocr_backend,
+    )
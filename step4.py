@@ -30,7 +30,7 @@ def convert_images_to_pdf(input_dir, output_filename="merged_book.pdf", colors=1
     # 画像ファイルの取得
     image_files = sorted([
         f for f in images_dir.glob("*") 
-        if f.suffix.lower() in ['.png', '.jpg', '.jpeg']
+        if f.suffix.lower() in ['.png', '.jpg', '.jpeg', '.webp']
         and not f.name.startswith(".")
     ])
     
@@ -43,7 +43,8 @@ def collect_pages(query=None):
 
     image_files = {img.stem: img for img in images_dir.glob("*.png")} | \
                   {img.stem: img for img in images_dir.glob("*.jpg")} | \
-                  {img.stem: img for img in images_dir.glob("*.jpeg")}
+                  {img.stem: img for img in images_dir.glob("*.jpeg")} | \
+                  {img.stem: img for img in images_dir.glob("*.webp")}
 
     pages = []
     q = (query or "").lower().strip()
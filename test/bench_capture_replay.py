@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+リプレイキャプチャで step1 のキャプチャループをベンチマークするスクリプト
+macOS以外（Linux等）でも、変化検出・トリミング・保存を含む
+capture_and_save_pages 全体の所要時間を計測できる
+
+使用例:
+    uv run python test/bench_capture_replay.py --pages 30 --latency 0.2
+    uv run python test/bench_capture_replay.py --frames-dir capture/my-book/images
+    uv run python test/bench_capture_replay.py --sparse --pages 12   # 章扉・数行だけのページ
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import step1  # noqa: E402
+from capture_journal import journal_path, read_journal  # noqa: E402
+
+
+def generate_frames(frames_dir, pages, width, height, seed=0, sparse=False):
+    """
+    文字を模した黒い矩形を並べた擬似ページ画像を生成
+    Args:
+        frames_dir: 出力先フォルダ
+        pages: ページ数
+        width, height: 画像サイズ
+        seed: 乱数シード
+        sparse: Trueなら章扉（中央に数文字）と数行だけのページを交互に生成
+            （平均輝度差がほとんど変わらないページが続いても検出できるかの確認用）
+    """
+    rng = np.random.default_rng(seed)
+    for page in range(1, pages + 1):
+        img = np.full((height, width, 3), 250, np.uint8)
+        # ヘッダー（時計や進捗バーに相当）
+        img[: height // 30, :] = 230
+        if sparse and page % 2 == 1:
+            # 章扉: 中央に大きな文字を数文字
+            x = width // 2 - 120
+            for _ in range(int(rng.integers(3, 7))):
+                w = int(rng.integers(50, 70))
+                img[height // 3 : height // 3 + 70, x : x + w] = 20
+                x += w + int(rng.integers(10, 20))
+            Image.fromarray(img).save(os.path.join(frames_dir, f"{page:03d}.png"))
+            continue
+        lines = range(height // 10, height - height // 10, 40)
+        if sparse:
+            # 数行だけのページ（行数を1行ずつ増やす）
+            lines = lines[: page // 2 % 3 + 1]
+        for line in lines:
+            x = width // 10
+            while x < width - width // 10:
+                w = int(rng.integers(8, 24))
+                img[line : line + 20, x : x + w] = 20
+                x += w + int(rng.integers(4, 12))
+        Image.fromarray(img).save(os.path.join(frames_dir, f"{page:03d}.png"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="リプレイキャプチャで step1 のキャプチャループを計測します")
+    parser.add_argument("--frames-dir", default=None, help="再生する画像フォルダ（省略時は擬似ページを生成）")
+    parser.add_argument("--pages", type=int, default=20, help="生成する擬似ページ数（デフォルト: 20）")
+    parser.add_argument("--width", type=int, default=1600, help="擬似ページの幅（デフォルト: 1600）")
+    parser.add_argument("--height", type=int, default=2400, help="擬似ページの高さ（デフォルト: 2400）")
+    parser.add_argument("--latency", type=float, default=0.2, help="ページめくり遅延（秒）（デフォルト: 0.2）")
+    parser.add_argument("--jitter", type=float, default=0.05, help="ページめくり遅延のゆらぎ（秒）（デフォルト: 0.05）")
+    parser.add_argument("--sparse", action="store_true", help="章扉・数行だけの擬似ページを生成する")
+    parser.add_argument("--duplicate-every", type=int, default=0, help="N枚ごとに同じ画像を2回表示（デフォルト: 0）")
+    parser.add_argument("--no-adaptive", action="store_true", help="固定待機（--wait）で計測する")
+    parser.add_argument("--wait", type=float, default=1.0, help="固定待機時間（秒）（デフォルト: 1.0）")
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix="bench_capture_"))
+    try:
+        frames_dir = args.frames_dir
+        if frames_dir is None:
+            frames_dir = str(work_dir / "frames")
+            os.makedirs(frames_dir)
+            print(f"擬似ページを生成しています: {args.pages}ページ ({args.width}x{args.height})")
+            generate_frames(frames_dir, args.pages, args.width, args.height, sparse=args.sparse)
+
+        source = step1.ReplayCaptureSource(
+            frames_dir,
+            latency=args.latency,
+            jitter=args.jitter,
+            duplicate_every=args.duplicate_every,
+        )
+        step1.capture_source = source
+        step1.base_save_folder = str(work_dir / "capture")
+        step1.adaptive_wait = not args.no_adaptive
+        step1.waitsec = args.wait
+        step1.page_timeout = max(2.0, args.latency * 5)
+
+        first = np.array(source.grab())
+        lft, rht = 0, first.shape[1]
+
+        start = time.perf_counter()
+        total_pages = step1.capture_and_save_pages(lft, rht, "bench")
+        elapsed = time.perf_counter() - start
+
+        # 最後のページ以降は本の終わりの判定待ちなので、ページごとの計測値の合計も表示
+        records = read_journal(journal_path(str(work_dir / "capture" / "bench")))
+        capture_time = max(sum(r.get("elapsed", 0.0) for r in records), 1e-9)
+        print("\n" + "=" * 60)
+        print(f"保存ページ数: {total_pages}ページ（再生画像 {len(source.frames)}枚）")
+        if total_pages != len(source.frames):
+            print(f"⚠️ 保存したページ数が再生画像の枚数と一致しません（{total_pages - len(source.frames):+d}ページ）")
+        print(f"所要時間: {elapsed:.2f}秒（本の終わりの判定待ちを含む）")
+        print(f"ページ処理時間の合計: {capture_time:.2f}秒")
+        print(f"スループット: {total_pages / capture_time * 60:.1f} ページ/分")
+        print(f"スクリーンショット取得回数: {source.grab_count}回, キー押下: {source.press_count}回")
+        print("=" * 60)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
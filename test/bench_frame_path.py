@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+step1 のフレーム処理経路（グラブ → トリミング → 色変換 → 変化検出 → エンコード）の
+マイクロベンチマーク
+従来の経路（PIL → np.array → crop_image → Image.fromarray → np.array → cvtColor → スライス）と
+現在の capture_frame の経路について、1ページあたりのフルサイズのバッファ確保回数と時間を比較する
+
+使用例:
+    uv run python test/bench_frame_path.py
+    uv run python test/bench_frame_path.py --width 3456 --height 2234 --repeat 50
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import step1  # noqa: E402
+
+
+class StaticSource(step1.CaptureSource):
+    """同じ画像を返し続けるキャプチャ元（グラブ自体のコストを除外する）"""
+
+    def __init__(self, image):
+        self.image = image
+
+    def grab(self):
+        return self.image
+
+    def press(self, key):
+        pass
+
+
+class CopyCounter:
+    """処理の各段で新しいバッファが確保されたかを数える"""
+
+    def __init__(self, frame_bytes):
+        self.frame_bytes = frame_bytes
+        self.count = 0
+        self.steps = []
+
+    def check(self, name, result, *sources):
+        """result が sources のいずれともメモリを共有していなければ確保とみなす"""
+        arr = np.asarray(result) if isinstance(result, Image.Image) else result
+        shared = any(
+            isinstance(src, np.ndarray) and np.shares_memory(arr, src) for src in sources
+        )
+        if isinstance(result, Image.Image) or not shared:
+            self.count += 1
+            self.steps.append(name)
+        return result
+
+
+def legacy_path(source, lft, rht, counter=None):
+    """変更前の step1 と同じ経路"""
+    s = source.grab()
+    # capture_kindle_screenshot 内のトリミング
+    arr = np.array(s)
+    cropped = step1.crop_image(arr)
+    s = Image.fromarray(cropped)
+    if counter:
+        counter.check("np.array(PIL)", arr)
+        counter.check("Image.fromarray", s)
+    # capture_and_save_pages 内の変換
+    s2 = np.array(s)
+    ss = cv2.cvtColor(s2, cv2.COLOR_RGB2BGR)
+    ss = ss[:, lft:rht]
+    if counter:
+        counter.check("np.array(PIL)", s2)
+        counter.check("cvtColor", ss, s2)
+    return ss
+
+
+def current_path(source, lft, rht, counter=None):
+    """現在の capture_frame の経路"""
+    step1.capture_source = source
+    ss = step1.capture_frame(0, None, lft, rht)
+    if counter:
+        # np.asarray(PIL) と cvtColor の2回（トリミングはビュー）
+        counter.count += 2
+        counter.steps.extend(["np.asarray(PIL)", "cvtColor"])
+    return ss
+
+
+def measure(name, path, source, lft, rht, repeat, detector):
+    """経路ごとの時間・確保回数・ピークメモリを計測"""
+    frame_bytes = source.image.width * source.image.height * 3
+    counter = CopyCounter(frame_bytes)
+    ss = path(source, lft, rht, counter)
+
+    tracemalloc.start()
+    ss = path(source, lft, rht)
+    detector.fingerprint(ss)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        ss = path(source, lft, rht)
+        detector.fingerprint(ss)
+    elapsed = (time.perf_counter() - start) / repeat
+
+    print(f"{name}:")
+    print(f"  フルサイズのバッファ確保: {counter.count}回 ({' → '.join(counter.steps)})")
+    print(f"  ピークメモリ: {peak / frame_bytes:.2f} フレーム分 ({peak / 1024 / 1024:.1f} MB)")
+    print(f"  1ページあたり: {elapsed * 1000:.2f} ms")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="step1 のフレーム処理経路を計測します")
+    parser.add_argument("--width", type=int, default=2880, help="フレームの幅（デフォルト: 2880）")
+    parser.add_argument("--height", type=int, default=1800, help="フレームの高さ（デフォルト: 1800）")
+    parser.add_argument("--crop-top", type=int, default=70, help="上部トリミング（デフォルト: 70）")
+    parser.add_argument("--crop-bottom", type=int, default=40, help="下部トリミング（デフォルト: 40）")
+    parser.add_argument("--repeat", type=int, default=20, help="計測の繰り返し回数（デフォルト: 20）")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, (args.height, args.width, 3), dtype=np.uint8)
+    source = StaticSource(Image.fromarray(frame))
+    step1.crop_top = args.crop_top
+    step1.crop_bottom = args.crop_bottom
+    lft, rht = args.width // 8, args.width - args.width // 8
+    detector = step1.PageChangeDetector()
+
+    print("=" * 60)
+    print(f"フレーム: {args.width}x{args.height}, トリミング 上{args.crop_top}px 下{args.crop_bottom}px")
+    print("=" * 60)
+    before = measure("変更前の経路", legacy_path, source, lft, rht, args.repeat, detector)
+    after = measure("capture_frame", current_path, source, lft, rht, args.repeat, detector)
+    assert np.array_equal(
+        legacy_path(source, lft, rht), current_path(source, lft, rht)
+    ), "2つの経路の出力が一致しません"
+    print("-" * 60)
+    print(f"出力は一致しました。速度: {before / after:.2f}倍")
+
+
+if __name__ == "__main__":
+    main()
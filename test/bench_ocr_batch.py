@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+step2 のOCRをバッチサイズごとに計測するスクリプト
+同じページをバッチサイズを変えて解析し、ページ/秒と、1ページずつ処理した場合と
+解析結果（DocumentAnalyzerSchema）が一致するかを表示する
+
+使用例:
+    uv run python test/bench_ocr_batch.py capture/20260207181042
+    uv run python test/bench_ocr_batch.py capture/20260207181042 --pages 16 --batch-sizes 1,4,8
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ocr_batch import BatchDocumentAnalyzer  # noqa: E402
+from step2 import IMAGE_EXTENSIONS, load_page_image, select_device  # noqa: E402
+from yomitoku import DocumentAnalyzer  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="step2 のOCRをバッチサイズごとに計測します")
+    parser.add_argument("input_dir", help="入力ディレクトリ（例: capture/20260207181042）")
+    parser.add_argument("--pages", type=int, default=8, help="計測に使うページ数（デフォルト: 8）")
+    parser.add_argument("--batch-sizes", default="1,2,4,8", help="計測するバッチサイズ（デフォルト: 1,2,4,8）")
+    args = parser.parse_args()
+
+    images_dir = Path(args.input_dir) / "images"
+    if not images_dir.exists():
+        images_dir = Path(args.input_dir)
+    image_files = sorted(
+        f for f in images_dir.iterdir()
+        if f.suffix.lower() in IMAGE_EXTENSIONS and not f.name.startswith(".")
+    )[: args.pages]
+    if not image_files:
+        print(f"エラー: 画像ファイルが見つかりません: {images_dir}")
+        return
+    images = [load_page_image(f) for f in image_files]
+    batch_sizes = [int(v) for v in args.batch_sizes.split(",")]
+
+    model = DocumentAnalyzer(device=select_device())
+    # 初回呼び出しの初期化コストを計測から除く
+    model(images[0])
+
+    print("=" * 60)
+    print(f"ページ数: {len(images)}ページ ({images_dir})")
+    print("=" * 60)
+    reference = [model(img)[0].model_dump() for img in images]
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        if batch_size == 1:
+            results = [model(img)[0] for img in images]
+        else:
+            results = BatchDocumentAnalyzer(model, batch_size=batch_size)(images)
+        elapsed = time.perf_counter() - start
+        mismatched = [
+            f.name for f, result, ref in zip(image_files, results, reference)
+            if result.model_dump() != ref
+        ]
+        status = "一致" if not mismatched else f"不一致 {len(mismatched)}ページ: {', '.join(mismatched)}"
+        print(f"バッチサイズ {batch_size:>2}: {elapsed:6.2f}秒, {len(images) / elapsed:5.2f} ページ/秒, 結果: {status}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+OCR入力の縮小（--ocr-max-side）ごとの速度と精度を計測するスクリプト
+元の解像度でのOCR結果を基準に、縮小した場合の文字単位の一致率とページ/秒を表示する
+
+使用例:
+    uv run python test/bench_ocr_scale.py capture/20260207181042
+    uv run python test/bench_ocr_scale.py capture/20260207181042 --pages 16 --max-sides auto,2400,2000,1600
+"""
+
+import argparse
+import difflib
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ocr_scaling import parse_max_side  # noqa: E402
+from ocr_store import page_text  # noqa: E402
+from step2 import (  # noqa: E402
+    ANALYZER_OPTIONS,
+    IMAGE_EXTENSIONS,
+    load_page_image,
+    prepare_ocr_input,
+    restore_scale,
+    select_device,
+)
+from yomitoku import DocumentAnalyzer  # noqa: E402
+
+
+def char_agreement(reference, text):
+    """
+    文字単位の一致率（difflib で対応づけた文字数 × 2 / 両方の文字数）
+    Returns:
+        float: 0.0〜1.0（両方とも空なら1.0）
+    """
+    if not reference and not text:
+        return 1.0
+    return difflib.SequenceMatcher(None, reference, text, autojunk=False).ratio()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR入力の縮小ごとの速度と精度を計測します")
+    parser.add_argument("input_dir", help="入力ディレクトリ（例: capture/20260207181042）")
+    parser.add_argument("--pages", type=int, default=8, help="計測に使うページ数（デフォルト: 8）")
+    parser.add_argument("--max-sides", default="auto,2400,2000,1600,1280",
+                        help="計測する長辺の上限（デフォルト: auto,2400,2000,1600,1280）")
+    args = parser.parse_args()
+
+    images_dir = Path(args.input_dir) / "images"
+    if not images_dir.exists():
+        images_dir = Path(args.input_dir)
+    image_files = sorted(
+        f for f in images_dir.iterdir()
+        if f.suffix.lower() in IMAGE_EXTENSIONS and not f.name.startswith(".")
+    )[: args.pages]
+    if not image_files:
+        print(f"エラー: 画像ファイルが見つかりません: {images_dir}")
+        return
+    images = [load_page_image(f) for f in image_files]
+
+    model = DocumentAnalyzer(device=select_device(), **ANALYZER_OPTIONS)
+    # 初回呼び出しの初期化コストを計測から除く
+    model(images[0])
+
+    def run(max_side):
+        start = time.perf_counter()
+        texts = []
+        for img in images:
+            ocr_input, scale = prepare_ocr_input(img, max_side)
+            result = restore_scale(model(ocr_input)[0], scale)
+            texts.append(page_text(result.model_dump()))
+        return texts, time.perf_counter() - start
+
+    print("=" * 60)
+    print(f"ページ数: {len(images)}ページ ({images_dir}), 画像サイズ: {images[0].shape[1]}x{images[0].shape[0]}")
+    print("=" * 60)
+    reference, elapsed = run(None)
+    print(f"{'元の解像度':>10}: {elapsed:6.2f}秒, {len(images) / elapsed:5.2f} ページ/秒, "
+          f"{sum(len(t) for t in reference)}文字")
+    for value in args.max_sides.split(","):
+        max_side = parse_max_side(value)
+        texts, elapsed = run(max_side)
+        scores = [char_agreement(ref, text) for ref, text in zip(reference, texts)]
+        worst = min(range(len(scores)), key=scores.__getitem__)
+        print(f"{value:>10}: {elapsed:6.2f}秒, {len(images) / elapsed:5.2f} ページ/秒, "
+              f"一致率 平均 {sum(scores) / len(scores) * 100:.2f}% / "
+              f"最低 {scores[worst] * 100:.2f}%（{image_files[worst].name}）")
+
+
+if __name__ == "__main__":
+    main()
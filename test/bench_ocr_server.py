@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+OCRサーバーの本の変換ジョブが --batch-size のページ数ずつまとめてOCRしているかを確認するスクリプト
+一時フォルダにコピーした本をバッチサイズを変えてサーバーで変換し、サーバーが推論したバッチの数・
+ページ数と、ページ/秒を表示する（キャッシュは使わない）
+
+使用例:
+    uv run python test/bench_ocr_server.py capture/20260207181042
+    uv run python test/bench_ocr_server.py capture/20260207181042 --pages 16 --batch-sizes 1,4
+"""
+
+import argparse
+import math
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ocr_server import OCRClient, OCRServer  # noqa: E402
+from step2 import IMAGE_EXTENSIONS  # noqa: E402
+
+
+def run(image_files, batch_size, work_dir):
+    """サーバーを起動して本を1冊変換し、(OCRしたページ数, バッチ数, バッチのページ数, 秒) を返す"""
+    book_dir = work_dir / f"book-{batch_size}"
+    (book_dir / "images").mkdir(parents=True)
+    for f in image_files:
+        shutil.copy(f, book_dir / "images" / f.name)
+    socket_path = str(work_dir / f"ocr-{batch_size}.sock")
+    server = OCRServer(socket_path, batch_size=batch_size)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    client = OCRClient.connect(socket_path)
+    try:
+        before = client.status()
+        start = time.perf_counter()
+        lines = []
+        client.submit(str(book_dir), {"cache_dir": None}, log=lines.append)
+        elapsed = time.perf_counter() - start
+        after = client.status()
+    finally:
+        client.close()
+        server.stop()
+        thread.join()
+        server.server_close()
+    ocr_pages = sum("処理中:" in line for line in lines)
+    return (ocr_pages, after["batches"] - before["batches"],
+            after["batched_pages"] - before["batched_pages"], elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCRサーバーの本の変換がバッチでOCRしているかを確認します")
+    parser.add_argument("input_dir", help="入力ディレクトリ（例: capture/20260207181042）")
+    parser.add_argument("--pages", type=int, default=8, help="使うページ数（デフォルト: 8）")
+    parser.add_argument("--batch-sizes", default="1,4", help="確認するバッチサイズ（デフォルト: 1,4）")
+    args = parser.parse_args()
+
+    images_dir = Path(args.input_dir) / "images"
+    if not images_dir.exists():
+        images_dir = Path(args.input_dir)
+    image_files = sorted(
+        f for f in images_dir.iterdir()
+        if f.suffix.lower() in IMAGE_EXTENSIONS and not f.name.startswith(".")
+    )[: args.pages]
+    if not image_files:
+        print(f"エラー: 画像ファイルが見つかりません: {images_dir}")
+        return
+
+    print("=" * 60)
+    print(f"ページ数: {len(image_files)}ページ ({images_dir})")
+    print("=" * 60)
+    failed = False
+    with tempfile.TemporaryDirectory() as work_dir:
+        for batch_size in [int(v) for v in args.batch_sizes.split(",")]:
+            ocr_pages, batches, batched_pages, elapsed = run(image_files, batch_size, Path(work_dir))
+            # バッチサイズが1ならバッチ推論は使わない。それ以外は batch_size ページずつで、
+            # 最後に1ページだけ余った場合は analyze_pages がバッチにせずにOCRする
+            single = 1 if batch_size == 1 or ocr_pages % batch_size == 1 else 0
+            expected = 0 if batch_size == 1 else math.ceil((ocr_pages - single) / batch_size)
+            ok = batches == expected and batched_pages == (0 if batch_size == 1 else ocr_pages - single)
+            failed |= not ok
+            print(f"バッチサイズ {batch_size:>2}: OCR {ocr_pages}ページ, バッチ推論 {batches}回"
+                  f"（期待値 {expected}回）, {batched_pages}ページ, "
+                  f"{len(image_files) / elapsed:5.2f} ページ/秒 {'✓' if ok else '✗'}")
+    if failed:
+        print("✗ 本の変換ジョブがバッチサイズどおりにOCRしていません")
+        sys.exit(1)
+    print("✓ 本の変換ジョブはバッチサイズどおりにOCRしています")
+
+
+if __name__ == "__main__":
+    main()
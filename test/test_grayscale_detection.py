@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+step1 のグレースケール判定（--grayscale auto）のテスト
+白いページに小さな色の図形があるページをカラーのまま保存するか、
+アンチエイリアスのにじみ程度の色はグレースケールにするかを確認する
+
+使用例:
+    uv run python test/test_grayscale_detection.py
+"""
+
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import step1  # noqa: E402
+
+HEIGHT, WIDTH = 3000, 2000
+
+
+def blank_page():
+    """白い3000×2000のページ（BGR）"""
+    return np.full((HEIGHT, WIDTH, 3), 255, np.uint8)
+
+
+def text_page():
+    """灰色の文字だけのページ"""
+    img = blank_page()
+    for y in range(200, HEIGHT - 200, 80):
+        cv2.putText(img, "Kindle grayscale test " * 3, (100, y), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (40, 40, 40), 2)
+    return img
+
+
+def test_text_page_is_grayscale():
+    assert step1.is_grayscale_image(text_page())
+
+
+def test_small_saturated_icon_is_color():
+    # 70×70 の赤いアイコン（ページの0.1%未満）
+    img = text_page()
+    img[1000:1070, 1500:1570] = (0, 0, 255)
+    assert not step1.is_grayscale_image(img)
+
+
+def test_thin_colored_line_is_color():
+    # 1ピクセル幅・100ピクセルの青い下線
+    img = text_page()
+    img[2000, 300:400] = (255, 0, 0)
+    assert not step1.is_grayscale_image(img)
+
+
+def test_antialias_fringe_is_grayscale():
+    # 文字の縁に数画素だけ色がにじんだページ
+    img = text_page()
+    ys, xs = np.nonzero(img[:, :, 0] < 128)
+    for y, x in list(zip(ys, xs))[:: max(1, len(ys) // step1.grayscale_max_color_pixels)][:step1.grayscale_max_color_pixels]:
+        img[y, x] = (60, 40, 40)
+    assert step1.is_grayscale_image(img)
+
+
+def main():
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_")]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except AssertionError:
+            failed += 1
+            print(f"✗ {test.__name__}")
+    print(f"\n{len(tests) - failed}/{len(tests)} 件成功")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()